@@ -0,0 +1,36 @@
+"""add orders.client_id for offline terminal sync
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bancos novos já nascem com a coluna via Base.metadata.create_all
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("orders")}
+    if "client_id" in columns:
+        return
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.add_column(sa.Column("client_id", sa.String(length=36), nullable=True))
+        batch_op.create_index("ix_orders_client_id", ["client_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_index("ix_orders_client_id")
+        batch_op.drop_column("client_id")
@@ -0,0 +1,52 @@
+"""add sharded time-slot capacity tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "capacity_slots" not in tables:
+        op.create_table(
+            "capacity_slots",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("slot_start", sa.DateTime(), nullable=False),
+            sa.Column("shard", sa.Integer(), nullable=False),
+            sa.Column("capacity", sa.Integer(), nullable=False),
+            sa.Column("reserved", sa.Integer(), nullable=False, server_default="0"),
+            sa.UniqueConstraint("slot_start", "shard", name="uq_capacity_slot_shard"),
+            sa.CheckConstraint("reserved >= 0 AND reserved <= capacity", name="ck_capacity_slot_bounds"),
+        )
+        op.create_index("ix_capacity_slots_id", "capacity_slots", ["id"])
+        op.create_index("ix_capacity_slots_slot_start", "capacity_slots", ["slot_start"])
+    if "capacity_allocations" not in tables:
+        op.create_table(
+            "capacity_allocations",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+            sa.Column("slot_id", sa.Integer(), sa.ForeignKey("capacity_slots.id"), nullable=False),
+            sa.Column("qty", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_capacity_allocations_id", "capacity_allocations", ["id"])
+        op.create_index("ix_capacity_allocations_order_id", "capacity_allocations", ["order_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("capacity_allocations")
+    op.drop_table("capacity_slots")
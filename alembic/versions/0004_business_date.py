@@ -0,0 +1,69 @@
+"""add business_date to orders and group_visits
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.business_date import business_date
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# (tabela, coluna de origem, horário local?)
+TABLES = (("orders", "created_at", False), ("group_visits", "date", True))
+
+
+def _backfill(bind, table: str, source: str, local: bool) -> None:
+    """Fill business_date in id order, a batch at a time, from the same rule the models apply"""
+    rows = sa.table(table, sa.column("id"), sa.column(source, sa.DateTime()), sa.column("business_date", sa.Date()))
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(rows.c.id, rows.c[source])
+            .where(rows.c.id > last_id, rows.c.business_date.is_(None))
+            .order_by(rows.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            return
+        bind.execute(
+            rows.update().where(rows.c.id == sa.bindparam("row_id")).values(business_date=sa.bindparam("day")),
+            [{"row_id": row_id, "day": business_date(ts, local=local)} for row_id, ts in batch],
+        )
+        last_id = batch[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table, source, local in TABLES:
+        # Bancos novos já nascem com a coluna via Base.metadata.create_all
+        if "business_date" in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column("business_date", sa.Date(), nullable=True))
+        _backfill(bind, table, source, local)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("business_date", existing_type=sa.Date(), nullable=False)
+            batch_op.create_index(f"ix_{table}_business_date", ["business_date"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, _source, _local in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(f"ix_{table}_business_date")
+            batch_op.drop_column("business_date")
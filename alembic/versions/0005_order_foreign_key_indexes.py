@@ -0,0 +1,35 @@
+"""index order_items.order_id and groups.order_id
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Sem eles todo join de pedidos com itens/grupos varria a tabela inteira
+INDEXES = (("ix_order_items_order_id", "order_items"), ("ix_groups_order_id", "groups"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table in INDEXES:
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, ["order_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table in INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,39 @@
+"""add ticket_redemptions table for gate entries
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "ticket_redemptions" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "ticket_redemptions",
+        sa.Column("ticket", sa.String(length=64), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("used_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_ticket_redemptions_day", "ticket_redemptions", ["day"])
+    op.create_index("ix_ticket_redemptions_order_id", "ticket_redemptions", ["order_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("ticket_redemptions")
@@ -45,7 +45,19 @@ class Settings(BaseSettings):
         env="PORT",
         description="Port to bind the application"
     )
-    
+
+    # Business day
+    venue_timezone: str = Field(
+        default="America/Recife",
+        env="VENUE_TIMEZONE",
+        description="IANA timezone of the venue; sales are bucketed into days of this zone"
+    )
+    business_day_cutoff_hour: int = Field(
+        default=0,
+        env="BUSINESS_DAY_CUTOFF_HOUR",
+        description="Local hour at which a business day starts (sales before it count for the previous day)"
+    )
+
     # Admin credentials (NO DEFAULTS - must be set via environment)
     admin_username: str = Field(
         default="",
@@ -88,6 +100,16 @@ class Settings(BaseSettings):
         env="LOG_LEVEL",
         description="Logging level"
     )
+    log_queue_size: int = Field(
+        default=10000,
+        env="LOG_QUEUE_SIZE",
+        description="Log records waiting for the writer thread at most; further records are dropped and counted"
+    )
+    log_sampling: str = Field(
+        default="",
+        env="LOG_SAMPLING",
+        description="Keep 1 in N INFO/DEBUG records per logger, e.g. 'bilheteria.queries=10,app.middleware=5'"
+    )
     
     # Performance
     max_upload_size: int = Field(
@@ -95,7 +117,201 @@ class Settings(BaseSettings):
         env="MAX_UPLOAD_SIZE",
         description="Maximum upload size in bytes"
     )
-    
+
+    # Bulk ingest
+    ingest_batch_size: int = Field(
+        default=500,
+        env="INGEST_BATCH_SIZE",
+        description="Orders committed per transaction by the bulk ingest API"
+    )
+    ingest_max_record_bytes: int = Field(
+        default=64 * 1024,  # 64KB
+        env="INGEST_MAX_RECORD_BYTES",
+        description="Maximum size of a single order record in a bulk payload"
+    )
+
+    # Sales journal (store-and-forward while the database is unavailable)
+    journal_path: str = Field(
+        default="./journal/sales.ndjson",
+        env="JOURNAL_PATH",
+        description="Append-only journal file for sales accepted during database outages"
+    )
+    journal_replay_interval: float = Field(
+        default=5.0,
+        env="JOURNAL_REPLAY_INTERVAL",
+        description="Seconds between journal replay attempts"
+    )
+
+    # Visitor capacity
+    capacity_per_slot: int = Field(
+        default=0,
+        env="CAPACITY_PER_SLOT",
+        description="Maximum visitors per time slot (0 disables capacity control)"
+    )
+    capacity_slot_minutes: int = Field(
+        default=60,
+        env="CAPACITY_SLOT_MINUTES",
+        description="Length of each visiting time slot in minutes"
+    )
+    capacity_shards: int = Field(
+        default=8,
+        env="CAPACITY_SHARDS",
+        description="Counter rows per slot; more shards mean less lock contention"
+    )
+
+    # Tickets
+    ticket_signing_key: str = Field(
+        default="",
+        env="TICKET_SIGNING_KEY",
+        description="HMAC key for ticket ids (defaults to SECRET_KEY; must match across workers)"
+    )
+
+    # Export delivery
+    export_spool_max_bytes: int = Field(
+        default=8 * 1024 * 1024,  # 8MB
+        env="EXPORT_SPOOL_MAX_BYTES",
+        description="Exports up to this size are kept in memory; larger ones spill to an unlinked temp file"
+    )
+    export_temp_dir: str = Field(
+        default="",
+        env="EXPORT_TEMP_DIR",
+        description="Directory for spilled export files (empty = system temp dir)"
+    )
+
+    # Background export jobs
+    export_jobs_dir: str = Field(
+        default="./exports",
+        env="EXPORT_JOBS_DIR",
+        description="Directory holding finished export job artifacts"
+    )
+    export_job_workers: int = Field(
+        default=2,
+        env="EXPORT_JOB_WORKERS",
+        description="Export jobs generated concurrently"
+    )
+    export_job_queue_limit: int = Field(
+        default=20,
+        env="EXPORT_JOB_QUEUE_LIMIT",
+        description="Maximum queued plus running export jobs before new ones are refused"
+    )
+    export_job_ttl_hours: float = Field(
+        default=24.0,
+        env="EXPORT_JOB_TTL_HOURS",
+        description="Hours a finished export stays available for download"
+    )
+
+    # Workbook rendering
+    bordero_template: str = Field(
+        default="borderô.xlsx",
+        env="BORDERO_TEMPLATE",
+        description="Official borderô workbook used as the template for generated borderôs"
+    )
+    render_pool_workers: int = Field(
+        default=2,
+        env="RENDER_POOL_WORKERS",
+        description="Processes rendering workbooks off the event loop (0 = render in the thread pool)"
+    )
+    render_pool_queue_limit: int = Field(
+        default=8,
+        env="RENDER_POOL_QUEUE_LIMIT",
+        description="Renders allowed to wait for a free worker before new ones get 503"
+    )
+    bordero_cache_dir: str = Field(
+        default="./exports/bordero_cache",
+        env="BORDERO_CACHE_DIR",
+        description="Rendered borderô periods reused by batch generation while their data is unchanged"
+    )
+    bordero_cache_max_mb: int = Field(
+        default=200,
+        env="BORDERO_CACHE_MAX_MB",
+        description="Size cap of BORDERO_CACHE_DIR; least recently used periods are removed first (0 = no cap)"
+    )
+
+    # Analytics
+    analytics_engine: bool = Field(
+        default=False,
+        env="ANALYTICS_ENGINE",
+        description="Answer the by-state, by-reason and by-payment reports from an in-memory columnar snapshot"
+    )
+    analytics_refresh_seconds: float = Field(
+        default=5.0,
+        env="ANALYTICS_REFRESH_SECONDS",
+        description="Minimum interval between incremental refreshes of the columnar snapshot"
+    )
+
+    # Sales cube (/reports/api/cube)
+    cube_max_dimensions: int = Field(
+        default=4,
+        env="CUBE_MAX_DIMENSIONS",
+        description="Dimensions allowed in one cube request"
+    )
+    cube_max_days: int = Field(
+        default=731,
+        env="CUBE_MAX_DAYS",
+        description="Longest date range, in days, a cube request may cover"
+    )
+    cube_max_rows: int = Field(
+        default=5000,
+        env="CUBE_MAX_ROWS",
+        description="Rows returned by a cube request at most (larger answers are truncated)"
+    )
+    cube_cache_ttl_seconds: float = Field(
+        default=60.0,
+        env="CUBE_CACHE_TTL_SECONDS",
+        description="Seconds a cube answer is served from the cache"
+    )
+
+    # Compression
+    compression_enabled: bool = Field(
+        default=True,
+        env="COMPRESSION_ENABLED",
+        description="Compress HTML, JSON and CSV responses when the client accepts gzip or brotli"
+    )
+    compression_min_size: int = Field(
+        default=500,
+        env="COMPRESSION_MIN_SIZE",
+        description="Bodies smaller than this many bytes are sent uncompressed"
+    )
+    gzip_level: int = Field(
+        default=6,
+        env="GZIP_LEVEL",
+        description="zlib level for gzip responses (1 = fastest, 9 = smallest)"
+    )
+    brotli_quality: int = Field(
+        default=4,
+        env="BROTLI_QUALITY",
+        description="Brotli quality for br responses (0-11); needs the brotli package"
+    )
+
+    # Request metrics
+    request_metrics_enabled: bool = Field(
+        default=True,
+        env="REQUEST_METRICS_ENABLED",
+        description="Record latency histograms, status counts and in-flight requests per route"
+    )
+    slow_request_seconds: float = Field(
+        default=0.0,
+        env="SLOW_REQUEST_SECONDS",
+        description="Log a warning for requests slower than this many seconds (0 disables)"
+    )
+    metrics_token: str = Field(
+        default="",
+        env="METRICS_TOKEN",
+        description="Bearer token for scraping /metrics and /metrics/requests (empty: admin session only)"
+    )
+
+    # SQL per request
+    query_stats_enabled: bool = Field(
+        default=True,
+        env="QUERY_STATS_ENABLED",
+        description="Count and time the SQL of each request (Server-Timing header and request logs)"
+    )
+    n_plus_one_threshold: int = Field(
+        default=5,
+        env="N_PLUS_ONE_THRESHOLD",
+        description="Identical statements within one request that are reported as an N+1 (0 disables)"
+    )
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
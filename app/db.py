@@ -3,6 +3,7 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import StaticPool
+from .services.query_stats import instrument_engine
 
 # Database URL - defaults to SQLite for development, PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./bilheteria.db")
@@ -22,6 +23,9 @@ else:
         pool_recycle=300,
     )
 
+# Conta e cronometra as consultas de cada requisição (Server-Timing, logs, N+1)
+instrument_engine(engine)
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,13 +1,20 @@
 """
 Logging configuration for the application
 """
+import copy
 import logging
+import queue
 import sys
-from typing import Dict, Any
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
 from datetime import datetime
 import json
 from app.config import get_settings
 
+# Loggers da aplicação: get_logger() ("bilheteria.*") e logging.getLogger(__name__) ("app.*")
+APP_LOGGERS = ("bilheteria", "app")
+
 
 class JSONFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging"""
@@ -27,6 +34,8 @@ class JSONFormatter(logging.Formatter):
         # Add exception info if present
         if record.exc_info:
             log_entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_entry["exception"] = record.exc_text
         
         # Add extra fields
         if hasattr(record, "user_id"):
@@ -35,25 +44,100 @@ class JSONFormatter(logging.Formatter):
             log_entry["request_id"] = record.request_id
         if hasattr(record, "ip_address"):
             log_entry["ip_address"] = record.ip_address
+        # Request log lines (method, path, status, SQL summary) and user/security events
+        for key in ("method", "path", "status", "db", "action", "security_event", "username", "role"):
+            if hasattr(record, key):
+                log_entry[key] = getattr(record, key)
         
         return json.dumps(log_entry, ensure_ascii=False)
 
 
+def parse_sampling(spec: str) -> Dict[str, int]:
+    """``"bilheteria.queries=10,app.middleware=5"`` -> ``{logger: keep 1 in N}``"""
+    rates: Dict[str, int] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, every = entry.partition("=")
+        try:
+            rates[name.strip()] = int(every)
+        except ValueError:
+            raise ValueError(f"Invalid LOG_SAMPLING entry: {entry!r} (expected logger=N)")
+    return {name: every for name, every in rates.items() if every > 1}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records below WARNING of the configured loggers and their children"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        # O prefixo mais específico vence
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, every in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                with self._lock:
+                    seen = self._seen.get(name, 0)
+                    self._seen[name] = seen + 1
+                    if seen % every == 0:
+                        return True
+                    self.sampled_out += 1
+                    return False
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to the writer thread; drops and counts them when the queue is full"""
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self._drop_lock = threading.Lock()
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só junta mensagem e argumentos na thread de quem loga; o formatador roda na thread de escrita
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Espera vaga na fila cheia em vez de falhar: a thread de escrita continua esvaziando
+        self.queue.put(self._sentinel)
+
+
+_exception_formatter = logging.Formatter()
+_handler: Optional[BoundedQueueHandler] = None
+_sampling: Optional[SamplingFilter] = None
+_listener: Optional[QueueListener] = None
+
+
 def setup_logging() -> None:
-    """Setup application logging"""
+    """Route the application loggers through a bounded queue to a writer thread"""
+    global _handler, _sampling, _listener
+    shutdown_logging()
     settings = get_settings()
+    level = getattr(logging, settings.log_level.upper())
     
-    # Create logger
-    logger = logging.getLogger("bilheteria")
-    logger.setLevel(getattr(logging, settings.log_level.upper()))
-    
-    # Remove existing handlers
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
-    
-    # Create console handler
+    # Create console handler (runs on the listener thread)
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, settings.log_level.upper()))
+    console_handler.setLevel(level)
     
     # Use JSON formatter in production, simple formatter in development
     if settings.debug:
@@ -64,10 +148,47 @@ def setup_logging() -> None:
         formatter = JSONFormatter()
     
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # Prevent duplicate logs
-    logger.propagate = False
+
+    _sampling = SamplingFilter(parse_sampling(settings.log_sampling))
+    _handler = BoundedQueueHandler(settings.log_queue_size)
+    _handler.addFilter(_sampling)
+    for name in APP_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        
+        # Remove existing handlers
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        logger.addHandler(_handler)
+        
+        # Prevent duplicate logs
+        logger.propagate = False
+
+    _listener = _Listener(_handler.queue, console_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write out the queued records and detach the pipeline (the loggers propagate again)"""
+    global _handler, _sampling, _listener
+    if _handler is None:
+        return
+    for name in APP_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.removeHandler(_handler)
+        logger.propagate = True
+    _listener.stop()
+    _handler, _sampling, _listener = None, None, None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Records waiting for the writer thread, dropped on a full queue and left out by sampling"""
+    handler, sampling = _handler, _sampling
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "sampled_out": sampling.sampled_out if sampling else 0,
+    }
 
 
 def get_logger(name: str) -> logging.Logger:
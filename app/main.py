@@ -7,10 +7,24 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import RedirectResponse
-from .db import engine, Base, get_db
+from .config import settings
+from .logging_config import setup_logging, shutdown_logging, get_logger
+from .db import engine, Base, SessionLocal, get_db
+from .middleware import CompressionMiddleware, QueryStatsMiddleware, TimingMiddleware
 from .models import User, Order, OrderItem, Group, OrderEvent, Sale
 from .auth import get_user_info, require_auth
-from .routes import auth, dashboard, sales, groups, reports, admin
+from .routes import auth, dashboard, sales, groups, reports, admin, ingest, tickets, exports, metrics, health
+from .services.journal import get_journal, get_replayer
+from .services.delivery import export_metrics
+from .services.export_jobs import get_export_jobs
+from .services.render_pool import get_render_pool
+from .services.analytics import analytics_enabled, get_analytics
+from .services.cube import get_cube_cache
+from .services.tickets import load_ticket_index, signing_key
+
+# Structured logging: formatting and output on a background thread
+setup_logging()
+logger = get_logger("main")
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -44,11 +58,14 @@ if not SECRET_KEY:
     if os.getenv("DEBUG", "true").lower() == "true":
         import secrets
         SECRET_KEY = secrets.token_urlsafe(32)
-        print(f"⚠️  WARNING: Using auto-generated SECRET_KEY (development only)")
-        print(f"    Set SECRET_KEY environment variable for production!")
+        logger.warning("Using auto-generated SECRET_KEY (development only); "
+                       "set the SECRET_KEY environment variable for production")
     else:
         raise ValueError("SECRET_KEY environment variable is required in production!")
 
+# Ingressos impressos precisam continuar válidos após restarts e entre workers
+signing_key()
+
 app.add_middleware(
     SessionMiddleware,
     secret_key=SECRET_KEY,
@@ -57,6 +74,26 @@ app.add_middleware(
     session_cookie="session",
 )
 
+# Response compression (gzip/brotli, per-chunk flush for streamed reports)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_min_size,
+        gzip_level=settings.gzip_level,
+        brotli_quality=settings.brotli_quality,
+    )
+
+# SQL per request: Server-Timing header, request log line, N+1 warnings
+if settings.query_stats_enabled:
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=settings.n_plus_one_threshold)
+
+# Request metrics (outermost: times the whole stack, compression included)
+if settings.request_metrics_enabled:
+    app.add_middleware(
+        TimingMiddleware,
+        slow_seconds=settings.slow_request_seconds,
+    )
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -70,6 +107,32 @@ app.include_router(sales.router, tags=["sales"])
 app.include_router(groups.router, tags=["groups"])
 app.include_router(reports.router, prefix="/reports", tags=["reports"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
+app.include_router(ingest.router, prefix="/api", tags=["ingest"])
+app.include_router(tickets.router, tags=["tickets"])
+app.include_router(exports.router, prefix="/exports", tags=["exports"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(health.router, tags=["health"])
+
+# Background workers
+@app.on_event("startup")
+async def start_background_workers():
+    """Start the sales journal replayer, the render pool and the export job pool, and load the gate index"""
+    get_replayer().start()
+    get_render_pool().start()
+    get_export_jobs().start()
+    try:
+        load_ticket_index(SessionLocal)
+    except Exception:
+        # O índice volta a ser carregado na primeira validação da catraca
+        logger.exception("Could not load the ticket index at startup")
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop the sales journal replayer, the export job pool and the render pool, then flush the logs"""
+    get_replayer().stop()
+    get_export_jobs().stop()
+    get_render_pool().stop()
+    shutdown_logging()
 
 # Root redirect
 @app.get("/")
@@ -84,14 +147,16 @@ async def root(request: Request):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "version": "1.0.0"}
-
-# Template context processor
-@app.middleware("http")
-async def add_template_context(request: Request, call_next):
-    """Add common context to all templates"""
-    response = await call_next(request)
-    return response
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "journal": get_journal().stats(),
+        "exports": export_metrics.stats(),
+        "export_jobs": get_export_jobs().stats(),
+        "render_pool": get_render_pool().stats(),
+        "analytics": get_analytics().stats() if analytics_enabled() else None,
+        "cube_cache": get_cube_cache().stats(),
+    }
 
 # Template helper functions
 def get_template_context(request: Request, **kwargs):
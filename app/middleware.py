@@ -0,0 +1,339 @@
+"""
+ASGI middleware
+
+:class:`CompressionMiddleware` negotiates ``br`` or ``gzip`` from
+``Accept-Encoding`` and compresses text responses (HTML, JSON, CSV, JS,
+CSS, XML) as they are sent. Every body chunk is compressed and flushed on
+its own, so a ``StreamingResponse`` keeps streaming instead of being
+buffered until the end. Formats that are already compressed (XLSX, ZIP,
+Parquet, Arrow, images) and bodies below ``minimum_size`` go out as they
+are. Brotli is used only when the ``brotli`` package is installed.
+
+:class:`TimingMiddleware` records latency, status and in-flight requests
+per route template into :mod:`app.services.request_metrics` and logs the
+requests slower than ``slow_seconds``.
+
+:class:`QueryStatsMiddleware` attributes the SQL executed while serving a
+request to it (see :mod:`app.services.query_stats`), reports it in a
+``Server-Timing`` header and a request log line, and warns about probable
+N+1 queries.
+"""
+import logging
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .logging_config import get_logger
+from .services.query_stats import begin_request, end_request
+from .services.request_metrics import RequestMetrics, request_metrics
+
+logger = logging.getLogger(__name__)
+query_logger = get_logger("queries")
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def parse_accept_encoding(value: str) -> List[Tuple[str, float]]:
+    """Encodings of an ``Accept-Encoding`` header with their q-values"""
+    accepted = []
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted.append((name.strip().lower(), q))
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, brotli_enabled: bool = True) -> Optional[str]:
+    """Best supported encoding the client accepts (brotli wins ties)"""
+    preferences = {"br": 2, "gzip": 1}
+    best, best_key = None, (0.0, 0)
+    for name, q in parse_accept_encoding(accept_encoding):
+        if name == "*":
+            candidates = ["br", "gzip"]
+        else:
+            candidates = [name]
+        for encoding in candidates:
+            if encoding not in preferences or q <= 0:
+                continue
+            if encoding == "br" and not (brotli_enabled and brotli is not None):
+                continue
+            key = (q, preferences[encoding])
+            if key > best_key:
+                best, best_key = encoding, key
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.finish()
+
+
+class CompressionMiddleware:
+    """Pure ASGI gzip/brotli compression that flushes per chunk"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, gzip_level: int = 6,
+                 brotli_quality: int = 4, brotli_enabled: bool = True) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli_enabled = brotli_enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.brotli_enabled)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.app = middleware.app
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            return _Brotli(self.middleware.brotli_quality)
+        return _Gzip(self.middleware.gzip_level)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if ("content-encoding" in headers or message["status"] in (204, 304)
+                    or not is_compressible(headers.get("content-type", ""))):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                # Só decide ao ver o primeiro pedaço do corpo (tamanho, streaming)
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            # p.ex. http.response.pathsend: segue sem compressão
+            self.passthrough = True
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = self._new_compressor()
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+            if not more_body:
+                data = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(data))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": data, "more_body": False})
+                return
+            await self.send(start)
+
+        if more_body:
+            data = self.compressor.chunk(body)
+            if data:
+                await self.send({"type": "http.response.body", "body": data, "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.compressor.finish(body),
+                             "more_body": False})
+
+
+class _RouteTemplates:
+    """Route template of a request (``/orders/{order_id}/delete``)
+
+    The router records the matched route and its path parameters in the
+    scope, so the template is known once the request has been routed: the
+    path with each parameter value put back as ``{name}``. Templates seen
+    before are also matched up front (literal paths exactly, templates with
+    parameters as patterns) so the in-flight gauge can be per route.
+    """
+
+    def __init__(self, max_paths: int = 4096) -> None:
+        self.max_paths = max_paths
+        self._paths: Dict[str, str] = {}
+        self._patterns: Dict[str, Pattern] = {}
+
+    def guess(self, path: str) -> Optional[str]:
+        template = self._paths.get(path)
+        if template is None:
+            for candidate, pattern in self._patterns.items():
+                if pattern.fullmatch(path):
+                    return candidate
+        return template
+
+    def learn(self, scope: Scope) -> str:
+        if "endpoint" not in scope:
+            return "unmatched"  # 404 não vira uma série por caminho
+        if "route" not in scope:
+            # Mount (arquivos estáticos): o prefixo fica em root_path
+            return scope.get("root_path", "") + "/{path}"
+        params = scope.get("path_params") or {}
+        segments = scope["path"].split("/")
+        for name, value in params.items():
+            for i in range(len(segments) - 1, 0, -1):
+                if segments[i] == str(value):
+                    segments[i] = "{%s}" % name
+                    break
+        template = "/".join(segments)
+        if params:
+            if template not in self._patterns:
+                regex = "/".join("[^/]+" if part.startswith("{") else re.escape(part) for part in segments)
+                self._patterns[template] = re.compile(regex)
+        elif len(self._paths) < self.max_paths:
+            self._paths[scope["path"]] = template
+        return template
+
+
+class TimingMiddleware:
+    """Pure ASGI latency histograms, status counts and in-flight gauges per route template"""
+
+    def __init__(self, app: ASGIApp, metrics: Optional[RequestMetrics] = None, slow_seconds: float = 0.0) -> None:
+        self.app = app
+        self.templates = _RouteTemplates()
+        self.metrics = metrics
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics or request_metrics
+        method = scope["method"]
+        # Em andamento conta na rota prevista; o histograma usa a rota de fato roteada
+        in_flight = metrics.started(method, self.templates.guess(scope["path"]))
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = self.templates.learn(scope)
+            metrics.finished(in_flight, method, route, status, elapsed)
+            if self.slow_seconds and elapsed >= self.slow_seconds:
+                logger.warning("Slow request: %s %s (%s) -> %d in %.3f s",
+                               method, scope["path"], route, status, elapsed)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI per-request SQL count and time, as Server-Timing and a log line"""
+
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = 5) -> None:
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries, token = begin_request()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if queries.count:
+                    # Consultas feitas durante o streaming do corpo só entram no log
+                    MutableHeaders(scope=message)["Server-Timing"] = queries.server_timing()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            if queries.count:
+                self._log(scope, status, queries)
+
+    def _log(self, scope: Scope, status: int, queries) -> None:
+        summary = queries.summary(self.n_plus_one_threshold)
+        extra = {"db": summary, "method": scope["method"], "path": scope["path"], "status": status}
+        if summary["repeated"]:
+            top = summary["repeated"][0]
+            query_logger.warning("Probable N+1 in %s %s: %d identical statements: %s",
+                                 scope["method"], scope["path"], top["count"], top["sql"], extra=extra)
+        else:
+            query_logger.info("%s %s: %d queries in %.1f ms", scope["method"], scope["path"],
+                              summary["queries"], summary["db_ms"], extra=extra)
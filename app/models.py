@@ -1,8 +1,18 @@
 """SQLAlchemy models for the bilheteria system"""
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, Boolean, ForeignKey, Text, UniqueConstraint, CheckConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .db import Base
+from .services.business_date import business_date
+
+
+def _order_business_date(context):
+    # Também vale para inserts em lote (Core): calculado por linha a partir de created_at
+    return business_date(context.get_current_parameters().get("created_at"))
+
+
+def _visit_business_date(context):
+    return business_date(context.get_current_parameters().get("date"), local=True)
 
 class User(Base):
     """User model with roles and permissions"""
@@ -24,13 +34,15 @@ class Order(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    business_date = Column(Date, nullable=False, index=True, default=_order_business_date)  # dia local do museu
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    channel = Column(String(20), nullable=False, default="balcao")  # balcao, grupo, online
+    channel = Column(String(20), nullable=False, default="balcao")  # balcao, grupo, online, parceiro
     payment_method = Column(String(20), nullable=False)  # credito, debito, pix
     state = Column(String(2))  # UF
     city = Column(String(100))
     note = Column(Text)
     deleted_at = Column(DateTime, nullable=True)
+    client_id = Column(String(36), unique=True, index=True, nullable=True)  # id gerado no terminal (sync offline)
     
     # Relationships
     user = relationship("User", back_populates="orders")
@@ -43,7 +55,7 @@ class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     ticket_type = Column(String(20), nullable=False)  # inteira, meia, gratuita
     qty = Column(Integer, nullable=False)
     unit_price_cents = Column(Integer, nullable=False)
@@ -57,7 +69,7 @@ class Group(Base):
     __tablename__ = "groups"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     visit_type = Column(String(20), nullable=False)  # agendada, espontanea
     has_oficio = Column(Boolean, default=False, nullable=False)
     institution_name = Column(String(200))
@@ -111,6 +123,7 @@ class GroupVisit(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False)  # data da visita
+    business_date = Column(Date, nullable=False, index=True, default=_visit_business_date)
     institution = Column(String(160))  # escola/instituição
     size = Column(Integer, nullable=False)  # nº pessoas
     state = Column(String(2))  # UF
@@ -122,3 +135,55 @@ class GroupVisit(Base):
     created_at = Column(DateTime, server_default=func.now())
     
     # Relationships - removed for now as it's not needed for basic functionality
+
+class CapacitySlot(Base):
+    """One shard of the visitor capacity of a time slot"""
+    __tablename__ = "capacity_slots"
+    __table_args__ = (
+        UniqueConstraint("slot_start", "shard", name="uq_capacity_slot_shard"),
+        CheckConstraint("reserved >= 0 AND reserved <= capacity", name="ck_capacity_slot_bounds"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    slot_start = Column(DateTime, nullable=False, index=True)  # início do horário (hora local)
+    shard = Column(Integer, nullable=False)  # contador particionado para evitar disputa numa única linha
+    capacity = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False, default=0)
+
+class CapacityAllocation(Base):
+    """Seats taken by an order from a capacity shard (released on delete)"""
+    __tablename__ = "capacity_allocations"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    slot_id = Column(Integer, ForeignKey("capacity_slots.id"), nullable=False)
+    qty = Column(Integer, nullable=False)
+
+class TicketRedemption(Base):
+    """A ticket let through the gate; the primary key stops a second entry from any worker"""
+    __tablename__ = "ticket_redemptions"
+    
+    ticket = Column(String(64), primary_key=True)  # id sem assinatura: <AAAAMMDD>-<pedido>-<item>-<seq>
+    day = Column(Date, nullable=False, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    used_at = Column(DateTime, nullable=False)
+
+class ExportJob(Base):
+    """Background export: parameters, progress and the finished artifact on disk"""
+    __tablename__ = "export_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    kind = Column(String(30), nullable=False)  # bordero, report
+    params = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, done, failed, expired
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    filename = Column(String(200))
+    path = Column(String(500))
+    size_bytes = Column(Integer)
+    error = Column(Text)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    expires_at = Column(DateTime, index=True)
@@ -9,6 +9,7 @@ from typing import Optional
 from ..db import get_db
 from ..models import Order, OrderItem, Group, OrderEvent, User
 from ..auth import require_auth, get_user_info, can_view_admin, can_delete, can_edit, set_csrf_token
+from ..services import capacity
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -52,11 +53,11 @@ async def admin_orders(
     # Apply filters
     if start_date:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
-        query = query.filter(func.date(Order.created_at) >= start_dt)
+        query = query.filter(Order.business_date >= start_dt)
     
     if end_date:
         end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        query = query.filter(func.date(Order.created_at) <= end_dt)
+        query = query.filter(Order.business_date <= end_dt)
     
     if state:
         query = query.filter(Order.state == state.upper())
@@ -118,11 +119,11 @@ async def admin_groups(
     # Apply filters
     if start_date:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
-        query = query.filter(func.date(Order.created_at) >= start_dt)
+        query = query.filter(Order.business_date >= start_dt)
     
     if end_date:
         end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        query = query.filter(func.date(Order.created_at) <= end_dt)
+        query = query.filter(Order.business_date <= end_dt)
     
     if state:
         query = query.filter(Group.state == state.upper())
@@ -187,6 +188,7 @@ async def admin_delete_order(
     try:
         # Soft delete
         order.deleted_at = datetime.now()
+        capacity.release(db, order.id)
         
         # Log the event
         event = OrderEvent(
@@ -239,6 +241,7 @@ async def admin_delete_group(
     try:
         # Soft delete the order (which will affect the group)
         order.deleted_at = datetime.now()
+        capacity.release(db, order.id)
         
         # Log the event
         event = OrderEvent(
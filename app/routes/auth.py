@@ -7,8 +7,10 @@ from ..db import get_db
 from ..models import User
 from ..auth import authenticate_user, create_user_session, clear_user_session, get_user_info, set_csrf_token
 from ..schemas import LoginRequest, UserResponse
+from ..logging_config import get_logger, log_security_event, log_user_action
 
 router = APIRouter()
+logger = get_logger("auth")
 templates = Jinja2Templates(directory="templates")
 
 @router.get("/login", response_class=HTMLResponse)
@@ -30,38 +32,36 @@ def login(
     db: Session = Depends(get_db),
 ):
     """Process login"""
-    # Debug CSRF
-    csrf_session = request.session.get("csrf_token")
-    print(f"DBG csrf_session={csrf_session}, csrf_form={csrf_token}")
-    
-    # CSRF validation
+    ip_address = request.client.host if request.client else None
+
+    # CSRF validation (os tokens não vão para o log)
     if request.session.get("csrf_token") != csrf_token:
-        print(f"CSRF validation failed: session={csrf_session}, form={csrf_token}")
+        log_security_event(logger, "csrf_mismatch", ip_address=ip_address)
         raise HTTPException(status_code=400, detail="Invalid CSRF")
 
     # Find user
     user = db.query(User).filter(User.username == username).first()
     if not user:
-        print(f"User not found: {username}")
+        log_security_event(logger, "unknown_user", ip_address=ip_address, details={"username": username})
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # Verify password using the auth module
     try:
         from ..auth import verify_password
         ok = verify_password(password, user.password_hash)
-        print(f"Password verify result: {ok}")
-    except Exception as e:
-        print(f"DBG verify error: {e}, type: {type(user.password_hash)}")
+    except Exception:
+        logger.exception("Password verification error for user %s", username)
         raise HTTPException(status_code=500, detail="Password verify error")
 
     if not ok:
-        print(f"Password verification failed for user: {username}")
+        log_security_event(logger, "login_failed", ip_address=ip_address, user_id=str(user.id),
+                           details={"username": username})
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     # Create session using the correct structure
     from ..auth import create_user_session
     create_user_session(request, user)
-    print(f"Session created for user: {username} (role: {user.role})")
+    log_user_action(logger, "login", user_id=str(user.id), details={"username": username, "role": user.role})
     
     # Redirect to dashboard
     return RedirectResponse("/dashboard", status_code=status.HTTP_303_SEE_OTHER)
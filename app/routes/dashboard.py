@@ -2,12 +2,13 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import func, and_, desc
 from datetime import datetime, date
 from ..db import get_db
 from ..models import Order, OrderItem, User
 from ..auth import require_auth, get_user_info
+from ..services import business_date
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -22,18 +23,18 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     """Main dashboard"""
     user = require_auth(request)
     
-    # Get today's date
-    today = date.today()
+    # Dia de operação do museu (fuso e virada configuráveis)
+    today = business_date.today()
     
     # Total tickets today
     tickets_today = db.query(func.sum(OrderItem.qty)).join(Order).filter(
-        func.date(Order.created_at) == today,
+        Order.business_date == today,
         Order.deleted_at.is_(None)
     ).scalar() or 0
     
     # Revenue today
     revenue_today = db.query(func.sum(OrderItem.qty * OrderItem.unit_price_cents)).join(Order).filter(
-        func.date(Order.created_at) == today,
+        Order.business_date == today,
         Order.deleted_at.is_(None)
     ).scalar() or 0
     revenue_today = revenue_today / 100
@@ -43,7 +44,7 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
         OrderItem.ticket_type,
         func.sum(OrderItem.qty).label('total')
     ).join(Order).filter(
-        func.date(Order.created_at) == today,
+        Order.business_date == today,
         Order.deleted_at.is_(None)
     ).group_by(OrderItem.ticket_type).all()
     
@@ -52,13 +53,13 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
         Order.payment_method,
         func.sum(OrderItem.qty * OrderItem.unit_price_cents).label('total')
     ).join(OrderItem).filter(
-        func.date(Order.created_at) == today,
+        Order.business_date == today,
         Order.deleted_at.is_(None)
     ).group_by(Order.payment_method).all()
     
-    # Recent orders
-    recent_orders = db.query(Order).filter(
-        func.date(Order.created_at) == today,
+    # Recent orders (itens numa consulta só: o template mostra a quantidade de cada pedido)
+    recent_orders = db.query(Order).options(selectinload(Order.items)).filter(
+        Order.business_date == today,
         Order.deleted_at.is_(None)
     ).order_by(Order.created_at.desc()).limit(10).all()
     
@@ -90,12 +91,12 @@ async def get_reports_summary(request: Request, db: Session = Depends(get_db)):
     
     # Query para resumo dos últimos 30 dias
     results = db.query(
-        func.date(Order.created_at).label('dia'),
+        Order.business_date.label('dia'),
         func.sum(OrderItem.qty).label('ingressos'),
         func.sum(OrderItem.qty * OrderItem.unit_price_cents).label('total_reais')
     ).join(OrderItem).filter(
         Order.deleted_at.is_(None)
-    ).group_by(func.date(Order.created_at)).order_by(desc('dia')).limit(30).all()
+    ).group_by(Order.business_date).order_by(desc('dia')).limit(30).all()
     
     # Converter para formato esperado pelo frontend
     data = []
@@ -123,12 +124,12 @@ async def get_dashboard_summary_html(request: Request, db: Session = Depends(get
     try:
         # Query para resumo dos últimos 7 dias
         results = db.query(
-            func.date(Order.created_at).label('dia'),
+            Order.business_date.label('dia'),
             func.sum(OrderItem.qty).label('ingressos'),
             func.sum(OrderItem.qty * OrderItem.unit_price_cents).label('total_reais')
         ).join(OrderItem).filter(
             Order.deleted_at.is_(None)
-        ).group_by(func.date(Order.created_at)).order_by(desc('dia')).limit(7).all()
+        ).group_by(Order.business_date).order_by(desc('dia')).limit(7).all()
         
         # Gerar HTML
         if not results:
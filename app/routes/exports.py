@@ -0,0 +1,93 @@
+"""Background export job routes"""
+from datetime import datetime
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.orm import Session
+from ..db import get_db
+from ..models import ExportJob
+from ..auth import require_auth, can_export
+from ..schemas import ExportJobCreate
+from ..services.export_jobs import get_export_jobs, job_to_dict, ExportQueueFull, EXPORT_KINDS
+
+router = APIRouter()
+
+
+def _get_job(db: Session, job_id: str, user: dict) -> ExportJob:
+    job = db.get(ExportJob, job_id)
+    if not job or (job.user_id != user["id"] and user["role"] != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Exportação não encontrada"
+        )
+    return job
+
+
+def _links(job: ExportJob) -> dict:
+    return {
+        "status_url": f"/exports/jobs/{job.id}",
+        "download_url": f"/exports/jobs/{job.id}/download",
+    }
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(payload: ExportJobCreate, request: Request, db: Session = Depends(get_db)):
+    """Queue an export; poll the status URL and download once it is done"""
+    user = require_auth(request)
+
+    if not can_export(user["role"]):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+
+    try:
+        job = get_export_jobs().enqueue(db, payload.kind.value, {
+            "start_date": payload.start_date.isoformat(),
+            "end_date": payload.end_date.isoformat(),
+        }, user["id"])
+    except ExportQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de exportações cheia, tente novamente em instantes",
+            headers={"Retry-After": "30"}
+        )
+
+    return {**job_to_dict(job), **_links(job)}
+
+
+@router.get("/jobs")
+def list_export_jobs(request: Request, db: Session = Depends(get_db)):
+    """Most recent export jobs of the current user"""
+    user = require_auth(request)
+    jobs = (db.query(ExportJob)
+              .filter(ExportJob.user_id == user["id"])
+              .order_by(ExportJob.created_at.desc())
+              .limit(20)
+              .all())
+    return [{**job_to_dict(job), **_links(job)} for job in jobs]
+
+
+@router.get("/jobs/{job_id}")
+def export_job_status(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Status and progress of an export job"""
+    user = require_auth(request)
+    job = _get_job(db, job_id, user)
+    return {**job_to_dict(job), **_links(job)}
+
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Finished artifact of an export job, until its retention expires"""
+    user = require_auth(request)
+    job = _get_job(db, job_id, user)
+
+    if job.status == "expired" or (job.expires_at and job.expires_at < datetime.utcnow()):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Exportação expirada, gere novamente"
+        )
+    if job.status != "done":
+        return JSONResponse(job_to_dict(job), status_code=status.HTTP_409_CONFLICT)
+
+    _, media_type = EXPORT_KINDS[job.kind]
+    return FileResponse(job.path, filename=job.filename, media_type=media_type)
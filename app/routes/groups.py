@@ -4,11 +4,12 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime
+from datetime import datetime, time
 from typing import Optional
 from ..db import get_db
 from ..models import Order, OrderItem, Group, OrderEvent
 from ..auth import require_auth, get_user_info, set_csrf_token
+from ..services import business_date, capacity
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -127,12 +128,41 @@ async def create_group(
         )
         db.add(event)
         
+        # Reserve seats in the visiting time slot (walk-ins: now, in venue wall-clock time)
+        capacity.reserve(db, order.id, scheduled_dt or business_date.local_time(),
+                         qtd_inteira + qtd_meia + qtd_gratuita)
+        
         db.commit()
         return RedirectResponse("/dashboard", status_code=status.HTTP_303_SEE_OTHER)
         
+    except capacity.CapacityExceeded as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao criar grupo: {str(e)}"
         )
+
+@router.get("/api/capacity")
+async def capacity_availability(
+    request: Request,
+    day: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Capacity and reservations per time slot for a day (default: today)"""
+    require_auth(request)
+    
+    try:
+        when = datetime.strptime(day, "%Y-%m-%d") if day else datetime.combine(business_date.today(), time.min)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data inválida (use AAAA-MM-DD)"
+        )
+    
+    return {
+        "enabled": capacity.is_enabled(),
+        "slots": capacity.availability(db, when)
+    }
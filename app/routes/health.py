@@ -2,12 +2,18 @@
 Health check endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.config import get_settings
-import psutil
+from app.services.journal import get_journal
+from app.services.delivery import export_metrics
+from app.routes.metrics import require_metrics_access
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/health")
 
 
@@ -22,25 +28,29 @@ async def health_check():
 
 
 @router.get("/ready")
-async def readiness_check(db: Session = Depends(get_db)):
+def readiness_check(db: Session = Depends(get_db)):
     """Readiness check - verifies database connectivity"""
     try:
         # Test database connection
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         return {
             "status": "ready",
             "database": "connected"
         }
-    except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Database not ready: {str(e)}")
+    except Exception:
+        # Detalhes do erro só no log: a rota é pública
+        logger.exception("Readiness check failed")
+        raise HTTPException(status_code=503, detail="Database not ready")
 
 
-@router.get("/live")
+# Dados do servidor: mesma proteção de /metrics
+@router.get("/live", dependencies=[Depends(require_metrics_access)])
 async def liveness_check():
     """Liveness check - verifies application is running"""
     settings = get_settings()
     
-    # Get system metrics
+    # Get system metrics (psutil só é carregado quando alguém consulta)
+    import psutil
     memory = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
     
@@ -64,9 +74,10 @@ async def liveness_check():
     }
 
 
-@router.get("/metrics")
+@router.get("/metrics", dependencies=[Depends(require_metrics_access)])
 async def metrics():
     """Application metrics for monitoring"""
+    import psutil
     memory = psutil.virtual_memory()
     disk = psutil.disk_usage('/')
     
@@ -74,5 +85,9 @@ async def metrics():
         "memory_usage_percent": memory.percent,
         "disk_usage_percent": (disk.used / disk.total) * 100,
         "cpu_count": psutil.cpu_count(),
+        "journal": get_journal().stats(),
+        "journal_depth": get_journal().depth(),
+        "journal_replay_rate_per_s": get_journal().replay_rate(),
+        "exports": export_metrics.stats(),
         "load_average": os.getloadavg() if hasattr(os, 'getloadavg') else None
     }
@@ -0,0 +1,102 @@
+"""Bulk ingest API routes"""
+import json
+import tempfile
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from ..db import get_db
+from ..auth import require_auth
+from ..config import get_settings
+from ..services.ingest import IngestError, iter_records, validate_record, insert_batch
+
+router = APIRouter()
+
+# Resultados acima deste tamanho vão para disco em vez de ficar em memória
+RESULTS_SPOOL_BYTES = 1024 * 1024
+
+
+@router.post("/orders/bulk")
+async def bulk_create_orders(request: Request, db: Session = Depends(get_db)):
+    """
+    Create orders in bulk from a JSON array or NDJSON body.
+
+    Each record follows the ``OrderCreate`` schema. The response is NDJSON
+    with one result line per input record (``index``, ``status`` and either
+    ``order_id`` or ``errors``), in input order.
+    """
+    user = require_auth(request)
+    settings = get_settings()
+
+    content_type = request.headers.get("content-type", "")
+    ndjson = "ndjson" in content_type or "jsonlines" in content_type
+    if not ndjson and "json" not in content_type:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Use application/json ou application/x-ndjson"
+        )
+
+    ip_address = request.client.host if request.client else None
+    results = tempfile.SpooledTemporaryFile(max_size=RESULTS_SPOOL_BYTES, mode="w+b")
+    counts = {"created": 0, "error": 0}
+
+    def write_results(batch_results):
+        for result in batch_results:
+            counts[result["status"]] += 1
+            results.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    # Cada entrada do lote: (índice, pedido validado ou None, erros)
+    pending = []
+
+    # Grava o lote numa thread: flush/commit do ORM não podem travar o event loop
+    def flush_pending():
+        valid = [(index, order) for index, order, _ in pending if order is not None]
+        created = {r["index"]: r for r in insert_batch(db, user["id"], valid, ip_address)}
+        write_results(
+            created[index] if order is not None
+            else {"index": index, "status": "error", "errors": errors}
+            for index, order, errors in pending
+        )
+        pending.clear()
+
+    index = 0
+    try:
+        async for record, parse_error in iter_records(
+            request.stream(), ndjson, settings.ingest_max_record_bytes
+        ):
+            if parse_error:
+                pending.append((index, None, [parse_error]))
+            else:
+                order, errors = validate_record(record)
+                pending.append((index, order, errors))
+            index += 1
+            if len(pending) >= settings.ingest_batch_size:
+                await run_in_threadpool(flush_pending)
+        await run_in_threadpool(flush_pending)
+    except IngestError as e:
+        # Registros anteriores ao erro já foram gravados; informa até onde foi
+        await run_in_threadpool(flush_pending)
+        write_results([{"index": index, "status": "error", "errors": [str(e)]}])
+    except Exception:
+        results.close()
+        raise
+
+    results.seek(0)
+
+    def iter_results():
+        while True:
+            chunk = results.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        iter_results(),
+        media_type="application/x-ndjson",
+        headers={
+            "X-Ingest-Created": str(counts["created"]),
+            "X-Ingest-Failed": str(counts["error"]),
+        },
+        background=BackgroundTask(results.close),
+    )
@@ -0,0 +1,139 @@
+"""
+Application metrics endpoints
+"""
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response
+
+from ..auth import can_view_admin, get_current_user
+from ..config import get_settings
+from ..db import engine
+from ..logging_config import logging_stats
+from ..services.analytics import analytics_enabled, get_analytics
+from ..services.bordero_batch import get_bordero_cache
+from ..services.cube import get_cube_cache
+from ..services.delivery import export_metrics
+from ..services.export_jobs import get_export_jobs
+from ..services.journal import get_journal
+from ..services.prometheus import CONTENT_TYPE, Exposition
+from ..services.render_pool import get_render_pool
+from ..services.request_metrics import request_metrics
+from ..services.sales_counters import sales_counters
+
+
+async def require_metrics_access(request: Request) -> None:
+    """Allow scrapers with the METRICS_TOKEN bearer token and logged-in admins"""
+    token = get_settings().metrics_token
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if token and scheme.lower() == "bearer" and secrets.compare_digest(credentials.strip().encode(), token.encode()):
+        return
+    user = get_current_user(request)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not can_view_admin(user.get("role")):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions"
+        )
+
+
+# Receita e volume de vendas não são públicos
+router = APIRouter(dependencies=[Depends(require_metrics_access)])
+
+
+@router.get("/metrics/requests")
+async def requests_metrics():
+    """Latency histogram, status counts and in-flight requests per route template"""
+    # async de propósito: lê os contadores na mesma thread que os atualiza
+    return {"in_flight": request_metrics.in_flight, "routes": request_metrics.snapshot()}
+
+
+def _request_series(out: Exposition) -> None:
+    routes = sorted(request_metrics.routes.values(), key=lambda s: (s.route, s.method))
+    out.histogram("bilheteria_http_request_duration_seconds", "Request latency per route template",
+                  request_metrics.buckets,
+                  (({"method": s.method, "route": s.route}, s.bucket_counts, s.sum, s.count) for s in routes))
+    out.counter("bilheteria_http_requests", "Finished requests per route template and status",
+                (({"method": s.method, "route": s.route, "status": str(code)}, n)
+                 for s in routes for code, n in sorted(s.statuses.items())))
+    out.gauge("bilheteria_http_requests_in_flight", "Requests being served",
+              [(None, request_metrics.in_flight)])
+
+
+def _pool_series(out: Exposition) -> None:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return  # StaticPool (SQLite): uma única conexão compartilhada
+    out.gauge("bilheteria_db_pool_size", "Connections kept open by the pool", [(None, pool.size())])
+    out.gauge("bilheteria_db_pool_checked_out", "Connections in use", [(None, pool.checkedout())])
+    out.gauge("bilheteria_db_pool_overflow", "Connections open beyond the pool size", [(None, pool.overflow())])
+
+
+def _export_series(out: Exposition) -> None:
+    jobs = get_export_jobs()
+    out.histogram("bilheteria_export_job_duration_seconds", "Export job generation time per kind and outcome",
+                  jobs.durations.buckets, jobs.durations.series())
+    out.gauge("bilheteria_export_jobs_active", "Export jobs queued or running", [(None, jobs.stats()["active"])])
+    exports = export_metrics.stats()
+    out.counter("bilheteria_exports", "Exports delivered, by where they were buffered",
+                (({"mode": mode}, n) for mode, n in sorted(exports["exports"].items())))
+    out.counter("bilheteria_export_bytes", "Bytes of exports produced", [(None, exports["bytes_produced"])])
+    render = get_render_pool().stats()
+    out.gauge("bilheteria_render_pool_pending", "Workbook renders running or waiting", [(None, render["pending"])])
+    out.counter("bilheteria_render_pool_rejected", "Workbook renders refused with 503", [(None, render["rejected"])])
+
+
+def _cache_series(out: Exposition) -> None:
+    caches = {"cube": get_cube_cache().stats(), "bordero": get_bordero_cache().stats()}
+    out.counter("bilheteria_cache_hits", "Cache lookups answered from the cache",
+                (({"cache": name}, stats["hits"]) for name, stats in caches.items()))
+    out.counter("bilheteria_cache_misses", "Cache lookups that had to compute the answer",
+                (({"cache": name}, stats["misses"]) for name, stats in caches.items()))
+    out.gauge("bilheteria_cache_hit_ratio", "Hits over lookups since start (0 before the first lookup)",
+              (({"cache": name}, stats["hits"] / ((stats["hits"] + stats["misses"]) or 1))
+               for name, stats in caches.items()))
+    if analytics_enabled():
+        analytics = get_analytics().stats()
+        out.gauge("bilheteria_analytics_rows", "Orders in the columnar snapshot", [(None, analytics["rows"])])
+        out.gauge("bilheteria_analytics_refresh_seconds", "Duration of the last snapshot refresh",
+                  [(None, analytics["last_refresh_ms"] / 1000)])
+
+
+def _sales_series(out: Exposition) -> None:
+    sales = sales_counters.snapshot()
+    labels = [({"payment_method": pm, "ticket_type": tt}, counts) for (pm, tt), counts in sales["sold"].items()]
+    out.counter("bilheteria_tickets_sold", "Tickets sold since start",
+                ((label, counts[0]) for label, counts in labels))
+    out.counter("bilheteria_revenue_reais", "Revenue of the tickets sold since start, in reais",
+                ((label, counts[1] / 100) for label, counts in labels))
+    out.counter("bilheteria_orders_voided", "Orders soft-deleted since start", [(None, sales["voided_orders"])])
+    out.gauge("bilheteria_journal_depth", "Sales waiting in the journal for the database",
+              [(None, get_journal().depth())])
+
+
+def _logging_series(out: Exposition) -> None:
+    logs = logging_stats()
+    out.gauge("bilheteria_log_queue_depth", "Log records waiting for the writer thread", [(None, logs["queued"])])
+    out.counter("bilheteria_log_records_dropped", "Log records dropped because the queue was full",
+                [(None, logs["dropped"])])
+    out.counter("bilheteria_log_records_sampled_out", "INFO/DEBUG records left out by LOG_SAMPLING",
+                [(None, logs["sampled_out"])])
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of request, database, export, cache and sales metrics"""
+    # Nada aqui consulta o banco: só contadores em memória
+    out = Exposition()
+    _request_series(out)
+    _pool_series(out)
+    _export_series(out)
+    _cache_series(out)
+    _sales_series(out)
+    _logging_series(out)
+    return Response(out.text(), media_type=CONTENT_TYPE)
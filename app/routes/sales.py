@@ -1,15 +1,21 @@
 """Sales routes"""
 from fastapi import APIRouter, Request, Depends, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime
 from typing import Optional
+from pydantic import ValidationError
+import uuid
 from ..db import get_db
 from ..models import Order, OrderItem, User, OrderEvent
-from ..auth import require_auth, get_user_info, can_delete, set_csrf_token
-from ..schemas import OrderCreate, OrderItemCreate, TicketType, PaymentMethod
+from ..auth import require_auth, get_user_info, can_delete, set_csrf_token, validate_csrf_token
+from ..schemas import OrderCreate, OrderItemCreate, TicketType, PaymentMethod, SyncRequest, CounterSale
+from ..services.ingest import add_order
+from ..services import capacity, business_date
+from ..services.journal import get_journal, get_replayer, make_entry, is_db_unavailable
+from ..services.sync import sync_sales
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -23,7 +29,8 @@ async def sell_page(request: Request):
     return templates.TemplateResponse("sell.html", {
         "request": request,
         "user": get_user_info(request),
-        "csrf_token": csrf_token
+        "csrf_token": csrf_token,
+        "journaled": request.query_params.get("journaled") == "1"
     })
 
 @router.post("/sell")
@@ -58,55 +65,87 @@ async def create_sale(
         return RedirectResponse("/sell", status_code=status.HTTP_303_SEE_OTHER)
     
     try:
-        # Create order
-        order = Order(
-            user_id=user["id"],
-            channel="balcao",
+        sale = CounterSale(
+            client_id=str(uuid.uuid4()),
+            sold_at=datetime.utcnow(),
+            qtd_inteira=qtd_inteira,
+            qtd_meia=qtd_meia,
+            qtd_gratuita=qtd_gratuita,
+            reason_meia=reason_meia,
+            reason_gratuita=reason_gratuita,
             payment_method=payment_method,
-            state=state.upper() if state else None,
+            state=state,
             city=city,
             note=note
         )
-        db.add(order)
-        db.flush()  # Get the ID
-        
-        # Create order items
-        items = [
-            ("inteira", qtd_inteira, 1000, None),
-            ("meia", qtd_meia, 500, reason_meia),
-            ("gratuita", qtd_gratuita, 0, reason_gratuita),
-        ]
-        
-        for ticket_type, qty, price, reason in items:
-            if qty > 0:
-                item = OrderItem(
-                    order_id=order.id,
-                    ticket_type=ticket_type,
-                    qty=qty,
-                    unit_price_cents=price,
-                    discount_reason=reason
-                )
-                db.add(item)
-        
-        # Log the event
-        event = OrderEvent(
-            order_id=order.id,
-            action="created",
-            user_id=user["id"],
-            ip_address=request.client.host if request.client else None
+        payload = sale.to_order()
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Venda inválida: {e.errors()[0]['msg']}"
         )
-        db.add(event)
-        
+    
+    ip_address = request.client.host if request.client else None
+    try:
+        order = add_order(db, user["id"], payload, ip_address=ip_address, client_id=sale.client_id)
+        db.flush()  # Get the ID
+        capacity.reserve_order(db, order, sale.sold_at)
         db.commit()
         return RedirectResponse("/dashboard", status_code=status.HTTP_303_SEE_OTHER)
         
+    except capacity.CapacityExceeded as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
         db.rollback()
+        if is_db_unavailable(e):
+            # Banco fora do ar: guarda no journal local e reenvia quando voltar
+            get_journal().append(make_entry(payload, user["id"], sale.client_id, sale.sold_at, ip_address))
+            get_replayer().wake()
+            return RedirectResponse("/sell?journaled=1", status_code=status.HTTP_303_SEE_OTHER)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao criar venda: {str(e)}"
         )
 
+@router.get("/sw.js")
+async def service_worker():
+    """Service worker for the offline sales outbox (served at root for full scope)"""
+    return FileResponse(
+        "static/sw.js",
+        media_type="application/javascript",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.get("/sync/token")
+async def sync_token(request: Request):
+    """Issue a fresh CSRF token for the terminal outbox"""
+    require_auth(request)
+    return {"csrf_token": set_csrf_token(request)}
+
+@router.post("/sync/sales")
+async def sync_terminal_sales(
+    request: Request,
+    payload: SyncRequest,
+    db: Session = Depends(get_db)
+):
+    """Receive a batch of sales queued by a terminal outbox (idempotent by client_id)"""
+    user = require_auth(request)
+    
+    if not validate_csrf_token(request, request.headers.get("X-CSRF-Token", "")):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid CSRF token"
+        )
+    
+    results = sync_sales(
+        db,
+        user["id"],
+        payload.sales,
+        ip_address=request.client.host if request.client else None
+    )
+    return {"results": results}
+
 @router.post("/orders/{order_id}/delete")
 async def delete_order(
     order_id: int,
@@ -134,8 +173,7 @@ async def delete_order(
         )
     
     # Check if it's from today (optional security measure)
-    today = datetime.now().date()
-    if order.created_at.date() != today:
+    if order.business_date != business_date.today():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Só é possível excluir pedidos do dia atual"
@@ -144,6 +182,7 @@ async def delete_order(
     try:
         # Soft delete
         order.deleted_at = datetime.now()
+        capacity.release(db, order.id)
         
         # Log the event
         event = OrderEvent(
@@ -0,0 +1,97 @@
+"""Ticket issuance and gate validation routes"""
+import io
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from ..db import get_db
+from ..models import Order
+from ..auth import require_auth
+from ..services.tickets import ticket_index, mint_tickets, verify_ticket
+from ..services import business_date
+
+router = APIRouter()
+
+
+class GateValidation(BaseModel):
+    ticket: str = Field(..., min_length=10, max_length=120)
+
+
+@router.get("/orders/{order_id}/tickets")
+async def order_tickets(order_id: int, request: Request, db: Session = Depends(get_db)):
+    """Per-person ticket ids of an order"""
+    require_auth(request)
+
+    order = db.query(Order).filter(
+        Order.id == order_id,
+        Order.deleted_at.is_(None)
+    ).first()
+
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pedido não encontrado"
+        )
+
+    return {"order_id": order.id, "tickets": mint_tickets(order)}
+
+
+@router.get("/tickets/{ticket}/qr.svg")
+async def ticket_qr(ticket: str, request: Request):
+    """QR code (SVG) encoding a ticket id"""
+    require_auth(request)
+
+    if verify_ticket(ticket) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ingresso inválido"
+        )
+
+    try:
+        import qrcode
+        import qrcode.image.svg
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Geração de QR code indisponível (instale o pacote qrcode)"
+        )
+
+    buffer = io.BytesIO()
+    qrcode.make(ticket, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    return Response(
+        buffer.getvalue(),
+        media_type="image/svg+xml",
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+
+@router.post("/gate/validate")
+async def gate_validate(payload: GateValidation, request: Request, db: Session = Depends(get_db)):
+    """
+    Validate a ticket at an entry gate.
+
+    The signature is checked without touching the database; issued/used
+    state comes from the in-memory index of the day. A valid ticket is
+    marked as used and the entry is written to ``ticket_redemptions``, so a
+    second scan answers ``used`` even after a restart or on another worker.
+    Rejections are answered on the event loop; the index load and the
+    redemption write go to the threadpool.
+    """
+    user = require_auth(request)
+
+    today = business_date.today()
+    if ticket_index.day != today:
+        await run_in_threadpool(ticket_index.ensure_day, db, today)
+
+    result = ticket_index.validate(payload.ticket, today)
+    if result["status"] != "ok":
+        return result
+    return await run_in_threadpool(ticket_index.record_use, db, result, user.get("id"))
+
+
+@router.get("/gate/stats")
+async def gate_stats(request: Request):
+    """Issued and used tickets in the gate index"""
+    require_auth(request)
+    return ticket_index.stats()
@@ -1,7 +1,7 @@
 """Pydantic schemas for request/response validation"""
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
-from datetime import datetime
+from typing import Any, ClassVar, Optional, List, Type
+from datetime import date, datetime
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -24,6 +24,27 @@ class Channel(str, Enum):
     BALCAO = "balcao"
     GRUPO = "grupo"
     ONLINE = "online"
+    PARCEIRO = "parceiro"
+
+class ExportKind(str, Enum):
+    BORDERO = "bordero"
+    REPORT = "report"
+
+class BorderoPeriod(str, Enum):
+    WEEK = "week"
+    MONTH = "month"
+    QUARTER = "quarter"
+    YEAR = "year"
+
+class RawDataset(str, Enum):
+    ORDERS = "orders"
+    ITEMS = "items"
+    GROUPS = "groups"
+    GROUP_VISITS = "group_visits"
+
+class RawFormat(str, Enum):
+    PARQUET = "parquet"
+    ARROW = "arrow"
 
 class VisitType(str, Enum):
     AGENDADA = "agendada"
@@ -83,6 +104,66 @@ class OrderCreate(BaseModel):
             raise ValueError('State must be 2 characters (UF)')
         return v.upper() if v else v
 
+# Counter (balcão) sales: the sell form never capped quantities per ticket type
+class CounterOrderItemCreate(OrderItemCreate):
+    qty: int = Field(..., ge=0)
+
+class CounterOrderCreate(OrderCreate):
+    items: List[CounterOrderItemCreate] = Field(..., min_items=1)
+
+# Offline terminal sync schemas
+class TerminalSale(BaseModel):
+    """A sale recorded by a terminal outbox, possibly while offline"""
+    client_id: str = Field(..., min_length=8, max_length=36)
+    sold_at: datetime
+    qtd_inteira: int = Field(0, ge=0, le=100)
+    qtd_meia: int = Field(0, ge=0, le=100)
+    qtd_gratuita: int = Field(0, ge=0, le=100)
+    reason_meia: Optional[str] = Field(None, max_length=50)
+    reason_gratuita: Optional[str] = Field(None, max_length=50)
+    payment_method: PaymentMethod
+    state: Optional[str] = Field(None, max_length=2)
+    city: Optional[str] = Field(None, max_length=100)
+    note: Optional[str] = Field(None, max_length=500)
+
+    @field_validator('state', 'reason_meia', 'reason_gratuita', 'city', 'note', mode='before')
+    @classmethod
+    def empty_to_none(cls, v):
+        return v or None
+
+    item_model: ClassVar[Type[OrderItemCreate]] = OrderItemCreate
+    order_model: ClassVar[Type[OrderCreate]] = OrderCreate
+
+    def to_order(self) -> "OrderCreate":
+        items = [
+            self.item_model(ticket_type=TicketType.INTEIRA, qty=self.qtd_inteira),
+            self.item_model(ticket_type=TicketType.MEIA, qty=self.qtd_meia,
+                            discount_reason=self.reason_meia),
+            self.item_model(ticket_type=TicketType.GRATUITA, qty=self.qtd_gratuita,
+                            discount_reason=self.reason_gratuita),
+        ]
+        return self.order_model(
+            channel=Channel.BALCAO,
+            payment_method=self.payment_method,
+            state=self.state,
+            city=self.city,
+            note=self.note,
+            items=[item for item in items if item.qty > 0],
+        )
+
+class CounterSale(TerminalSale):
+    """A sale posted by the counter form (and journaled during outages), without the per-type cap"""
+    qtd_inteira: int = Field(0, ge=0)
+    qtd_meia: int = Field(0, ge=0)
+    qtd_gratuita: int = Field(0, ge=0)
+
+    item_model: ClassVar[Type[OrderItemCreate]] = CounterOrderItemCreate
+    order_model: ClassVar[Type[OrderCreate]] = CounterOrderCreate
+
+class SyncRequest(BaseModel):
+    # Validadas uma a uma em sync_sales: uma venda inválida não derruba o lote
+    sales: List[Any] = Field(..., min_length=1, max_length=200)
+
 class OrderResponse(BaseModel):
     id: int
     created_at: datetime
@@ -160,6 +241,22 @@ class DailyReport(BaseModel):
     by_ticket_type: dict
     by_payment_method: dict
 
+# Export job schemas
+class ExportJobCreate(BaseModel):
+    kind: ExportKind
+    start_date: date
+    end_date: date
+
+    @field_validator('end_date')
+    @classmethod
+    def validate_range(cls, v, info):
+        start = info.data.get('start_date')
+        if start and v < start:
+            raise ValueError('end_date must not be before start_date')
+        if start and (v - start).days > 366 * 5:
+            raise ValueError('range must not exceed 5 years')
+        return v
+
 # Audit schemas
 class AuditLogResponse(BaseModel):
     id: int
@@ -0,0 +1,201 @@
+"""
+Columnar in-memory analytics engine (opt-in with ``ANALYTICS_ENGINE=true``)
+
+Keeps a snapshot of every live order item as NumPy arrays: quantity and
+amount in cents as ``int64``, and the sale date, ticket type, payment
+method, state and discount reason dictionary-encoded (an ``int32`` code per
+row into a small list of distinct values). A report over a date range is
+then a boolean mask over the date dictionary, a gather by code and one
+``np.bincount`` per measure: no SQL, no per-row Python.
+
+The snapshot is refreshed incrementally and at most every
+``ANALYTICS_REFRESH_SECONDS``: orders with ids above the last one loaded
+(minus a small overlap for transactions that committed out of order) and
+orders touched by an order event (edits, deletions) are reloaded; their
+previous rows are marked dead and compacted away once they pile up.
+"""
+import logging
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Order, OrderItem, OrderEvent
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("day", "ticket_type", "payment_method", "state", "discount_reason")
+# Pedidos recentes relidos a cada atualização: ids atribuídos antes podem ser gravados depois
+ID_OVERLAP = 200
+COMPACT_DEAD_RATIO = 0.25
+
+
+class _Dictionary:
+    """Distinct values of a column; rows store the value's code"""
+
+    def __init__(self):
+        self.values: List = []
+        self._codes: Dict = {}
+
+    def encode(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ColumnarSnapshot:
+    """Order items as column arrays, refreshed incrementally from the database"""
+
+    def __init__(self, refresh_seconds: float = 5.0):
+        import numpy as np
+
+        self._np = np
+        self.refresh_seconds = refresh_seconds
+        self.dictionaries = {dim: _Dictionary() for dim in DIMENSIONS}
+        self.codes = {dim: np.empty(0, dtype=np.int32) for dim in DIMENSIONS}
+        self.order_id = np.empty(0, dtype=np.int64)
+        self.qty = np.empty(0, dtype=np.int64)
+        self.cents = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.max_order_id = 0
+        self.max_event_id = 0
+        self.refreshed_at: Optional[float] = None
+        self.last_refresh_ms = 0.0
+        self._lock = threading.Lock()
+
+    # Carga ----------------------------------------------------------------
+
+    def _load(self, db: Session, order_filter) -> Tuple:
+        np = self._np
+        stmt = (select(OrderItem.order_id, Order.business_date, OrderItem.ticket_type, Order.payment_method,
+                       Order.state, OrderItem.discount_reason, OrderItem.qty, OrderItem.unit_price_cents)
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(Order.deleted_at.is_(None), order_filter))
+        rows = db.execute(stmt).all()
+        n = len(rows)
+        order_id = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        qty = np.fromiter((r[6] for r in rows), dtype=np.int64, count=n)
+        price = np.fromiter((r[7] for r in rows), dtype=np.int64, count=n)
+        codes = {}
+        for position, dim in enumerate(DIMENSIONS, start=1):
+            encode = self.dictionaries[dim].encode
+            if dim == "day":
+                codes[dim] = np.fromiter((encode(str(r[position])) for r in rows), dtype=np.int32, count=n)
+            else:
+                codes[dim] = np.fromiter((encode(r[position]) for r in rows), dtype=np.int32, count=n)
+        return order_id, codes, qty, qty * price
+
+    def refresh(self, db: Session, force: bool = False) -> bool:
+        """Load new and changed orders; returns whether the database was queried"""
+        np = self._np
+        with self._lock:
+            if not force and self.refreshed_at is not None and \
+                    time.monotonic() - self.refreshed_at < self.refresh_seconds:
+                return False
+            started = time.perf_counter()
+
+            max_event_id = db.execute(select(func.max(OrderEvent.id))).scalar() or 0
+            if self.refreshed_at is None:
+                changed, since = set(), 0
+            else:
+                changed = set(db.execute(select(OrderEvent.order_id)
+                                         .where(OrderEvent.id > self.max_event_id)).scalars())
+                since = max(0, self.max_order_id - ID_OVERLAP)
+            recent = Order.id > since
+            order_filter = recent | Order.id.in_(sorted(changed)) if changed and since else recent
+            order_id, codes, qty, cents = self._load(db, order_filter)
+
+            # Linhas antigas dos pedidos relidos deixam de valer
+            reloaded = np.union1d(np.fromiter(changed, dtype=np.int64, count=len(changed)),
+                                  self.order_id[self.order_id > since])
+            if reloaded.size:
+                self.alive[np.isin(self.order_id, reloaded)] = False
+
+            self.order_id = np.concatenate([self.order_id, order_id])
+            self.qty = np.concatenate([self.qty, qty])
+            self.cents = np.concatenate([self.cents, cents])
+            self.alive = np.concatenate([self.alive, np.ones(len(order_id), dtype=bool)])
+            for dim in DIMENSIONS:
+                self.codes[dim] = np.concatenate([self.codes[dim], codes[dim]])
+            if len(self.alive) and (~self.alive).sum() > COMPACT_DEAD_RATIO * len(self.alive):
+                self._compact()
+
+            if order_id.size:
+                self.max_order_id = max(self.max_order_id, int(order_id.max()))
+            self.max_event_id = max(self.max_event_id, max_event_id)
+            self.refreshed_at = time.monotonic()
+            self.last_refresh_ms = (time.perf_counter() - started) * 1000
+            logger.debug("Columnar snapshot: %d rows loaded, %d orders reloaded in %.1f ms",
+                         order_id.size, reloaded.size, self.last_refresh_ms)
+            return True
+
+    def _compact(self) -> None:
+        keep = self.alive
+        self.order_id, self.qty, self.cents = self.order_id[keep], self.qty[keep], self.cents[keep]
+        for dim in DIMENSIONS:
+            self.codes[dim] = self.codes[dim][keep]
+        self.alive = self.alive[keep]
+
+    # Consultas ------------------------------------------------------------
+
+    def group_by(self, dim: str, start_dt: date, end_dt: date, skip_none: bool = False) -> List[Tuple]:
+        """``[(value, qty, cents), ...]`` summed per value of ``dim`` over ``start_dt..end_dt``"""
+        np = self._np
+        with self._lock:
+            days = self.dictionaries["day"].values
+            in_range = np.array([start_dt.isoformat() <= d <= end_dt.isoformat() for d in days], dtype=bool)
+            rows = self.alive & in_range[self.codes["day"]]
+            codes = self.codes[dim][rows]
+            qty, cents = self.qty[rows], self.cents[rows]
+            values = list(self.dictionaries[dim].values)
+
+        size = len(values)
+        count = np.bincount(codes, minlength=size)
+        qty_sum = np.bincount(codes, weights=qty, minlength=size).astype(np.int64)
+        cents_sum = np.bincount(codes, weights=cents, minlength=size).astype(np.int64)
+        return [(values[code], int(qty_sum[code]), int(cents_sum[code]))
+                for code in np.flatnonzero(count)
+                if not (skip_none and values[code] is None)]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "rows": int(self.alive.sum()),
+                "dead_rows": int((~self.alive).sum()),
+                "max_order_id": self.max_order_id,
+                "last_refresh_ms": round(self.last_refresh_ms, 1),
+                "dictionary_sizes": {dim: len(d) for dim, d in self.dictionaries.items()},
+            }
+
+
+_snapshot: Optional[ColumnarSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def analytics_enabled() -> bool:
+    return get_settings().analytics_engine
+
+
+def get_analytics() -> ColumnarSnapshot:
+    """Process-wide columnar snapshot"""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = ColumnarSnapshot(get_settings().analytics_refresh_seconds)
+        return _snapshot
+
+
+def columnar_report(db: Session, dim: str, start_dt: date, end_dt: date, skip_none: bool = False) -> List[Tuple]:
+    """Refresh the snapshot if it is stale and group it by ``dim``"""
+    snapshot = get_analytics()
+    snapshot.refresh(db)
+    return snapshot.group_by(dim, start_dt, end_dt, skip_none=skip_none)
@@ -0,0 +1,293 @@
+"""
+Multi-period borderô generation (month-end and year-end closing)
+
+A date range is split into periods (week, month, quarter or year) and one
+borderô is produced per period, all returned in a single ZIP archive.
+
+Periods whose workbook is not cached are aggregated and rendered in the
+render pool's worker processes, one period per task: each worker opens
+its own database connection, so both the SQL pivot and the openpyxl
+rendering run in parallel. Workers build their engine from
+``DATABASE_URL`` when they start; tasks carry only the period bounds, so
+credentials never travel in task payloads or failed-future tracebacks.
+Finished workbooks are cached on disk under a fingerprint of the period's
+data (row counts, sums, highest ids and the latest audit event per day), so
+re-running a year only rebuilds the months that changed; the cache drops
+the least recently used files beyond ``BORDERO_CACHE_MAX_MB``.
+
+    python -m app.services.bordero_batch --start 2024-01-01 --end 2024-12-31 --period month -o 2024.zip
+"""
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Order, OrderItem, OrderEvent, Sale
+from .render_pool import get_render_pool
+from .reports import bordero_filename, bordero_lines, bordero_rows, render_bordero_bytes, to_date
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("week", "month", "quarter", "year")
+MAX_PERIODS = 120
+
+# Aumentar quando o layout gerado mudar, para invalidar o cache
+CACHE_VERSION = 1
+
+Period = Tuple[date, date]
+
+
+def _period_end(start: date, period: str) -> date:
+    if period == "week":
+        return start + timedelta(days=6 - start.weekday())
+    months = {"month": 1, "quarter": 3, "year": 12}[period]
+    first_month = start.month if period == "month" else \
+        (1 if period == "year" else 3 * ((start.month - 1) // 3) + 1)
+    month = first_month + months
+    year = start.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1) - timedelta(days=1)
+
+
+def split_periods(start_dt: date, end_dt: date, period: str) -> List[Period]:
+    """Calendar periods covering ``start_dt..end_dt``; the first and last are clipped to the range"""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}")
+    periods = []
+    current = start_dt
+    while current <= end_dt:
+        last = min(_period_end(current, period), end_dt)
+        periods.append((current, last))
+        if len(periods) > MAX_PERIODS:
+            raise ValueError(f"More than {MAX_PERIODS} periods; use a longer period or a shorter range")
+        current = last + timedelta(days=1)
+    return periods
+
+
+def day_fingerprints(db: Session, start_dt: date, end_dt: date) -> Dict[date, tuple]:
+    """Per-day summary of everything the borderô reads, in three grouped queries"""
+    since, until = start_dt, end_dt + timedelta(days=1)
+    days: Dict[date, tuple] = {}
+
+    order_day = Order.business_date
+    # Tamanho dos textos classificados: pega troca de forma de pagamento ou motivo
+    labels = func.length(Order.payment_method) + func.length(func.coalesce(OrderItem.discount_reason, ""))
+    orders = (select(order_day, func.count(OrderItem.id), func.max(OrderItem.id), func.sum(OrderItem.qty),
+                     func.sum(OrderItem.qty * OrderItem.unit_price_cents), func.sum(labels))
+              .join(OrderItem, OrderItem.order_id == Order.id)
+              .where(Order.deleted_at.is_(None), order_day >= start_dt, order_day <= end_dt)
+              .group_by(order_day))
+    # Edições e exclusões deixam um evento: pega o mais recente dos pedidos de cada dia
+    events = (select(order_day, func.max(OrderEvent.id))
+              .join(OrderEvent, OrderEvent.order_id == Order.id)
+              .where(order_day >= start_dt, order_day <= end_dt)
+              .group_by(order_day))
+    sale_day = func.date(Sale.sold_at)
+    sales = (select(sale_day, func.count(Sale.id), func.max(Sale.id), func.sum(Sale.qty))
+             .where(Sale.sold_at >= since, Sale.sold_at < until)
+             .group_by(sale_day))
+
+    for source, stmt in (("o", orders), ("e", events), ("s", sales)):
+        for day, *values in db.execute(stmt):
+            day = to_date(day)
+            days[day] = days.get(day, ()) + (source, *values)
+    return days
+
+
+def _template_version() -> str:
+    try:
+        st = os.stat(get_settings().bordero_template)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return "missing"
+
+
+def period_key(period: Period, fingerprints: Dict[date, tuple], template_version: str) -> str:
+    start_dt, end_dt = period
+    digest = hashlib.sha256(repr((CACHE_VERSION, template_version, start_dt, end_dt)).encode())
+    for day in sorted(d for d in fingerprints if start_dt <= d <= end_dt):
+        digest.update(repr((day, fingerprints[day])).encode())
+    return digest.hexdigest()[:20]
+
+
+class BorderoCache:
+    """Rendered borderôs on disk, one file per period and data fingerprint, capped at ``max_bytes``"""
+
+    def __init__(self, directory: str, max_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, period: Period, key: str) -> str:
+        return os.path.join(self.directory, f"{period[0]}_{period[1]}_{key}.xlsx")
+
+    def get(self, period: Period, key: str) -> Optional[bytes]:
+        path = self._path(period, key)
+        try:
+            with open(path, "rb") as fh:
+                content = fh.read()
+            os.utime(path)  # mtime = último uso, para o corte por tamanho
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, period: Period, key: str, content: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = f"{period[0]}_{period[1]}_"
+        # Versões antigas do mesmo período não servem mais
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".xlsx"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(content)
+        os.replace(tmp, self._path(period, key))
+        if self.max_bytes:
+            self._trim()
+
+    def _trim(self) -> None:
+        """Remove the least recently used workbooks until the directory fits ``max_bytes``"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".xlsx"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime_ns, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[BorderoCache] = None
+
+
+def get_bordero_cache() -> BorderoCache:
+    """Process-wide borderô cache in ``BORDERO_CACHE_DIR``"""
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = BorderoCache(settings.bordero_cache_dir, settings.bordero_cache_max_mb * 1024 * 1024)
+    return _cache
+
+
+_worker_engine: Optional[Engine] = None
+
+
+def init_worker_engine() -> None:
+    """Worker initializer: the process's own engine, from the same settings as the app"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = create_engine(get_settings().database_url, pool_pre_ping=True)
+
+
+def render_period(start_dt: date, end_dt: date) -> bytes:
+    """Worker task: aggregate and render one period with the worker's own connection"""
+    init_worker_engine()
+    with Session(_worker_engine) as db:
+        return render_bordero_bytes(start_dt, end_dt, bordero_rows(bordero_lines(db, start_dt, end_dt)))
+
+
+def build_borderos(db: Session, start_dt: date, end_dt: date, period: str,
+                   cache: Optional[BorderoCache] = None) -> List[Tuple[Period, bytes]]:
+    """One rendered borderô per period, from the cache or from the render pool"""
+    cache = cache or get_bordero_cache()
+    periods = split_periods(start_dt, end_dt, period)
+    fingerprints = day_fingerprints(db, start_dt, end_dt)
+    template_version = _template_version()
+
+    keys = {p: period_key(p, fingerprints, template_version) for p in periods}
+    contents: Dict[Period, bytes] = {}
+    for p in periods:
+        content = cache.get(p, keys[p])
+        if content is not None:
+            contents[p] = content
+    missing = [p for p in periods if p not in contents]
+
+    if missing:
+        pool = get_render_pool()
+        if pool.workers:
+            rendered = pool.map(render_period, missing)
+        else:
+            # Sem processos, agrega com a própria sessão (testes, máquinas de um núcleo)
+            rendered = pool.map(lambda s, e: render_bordero_bytes(s, e, bordero_rows(bordero_lines(db, s, e))),
+                                missing)
+        for p, content in zip(missing, rendered):
+            cache.put(p, keys[p], content)
+            contents[p] = content
+
+    logger.info("Borderô batch %s..%s by %s: %d periods, %d rebuilt",
+                start_dt, end_dt, period, len(periods), len(missing))
+    return [(p, contents[p]) for p in periods]
+
+
+def batch_filename(start_dt: date, end_dt: date, period: str) -> str:
+    return f"Borderôs_Cais_{period}_{start_dt}_{end_dt}.zip"
+
+
+def write_bordero_zip(fileobj: BinaryIO, db: Session, start_dt: date, end_dt: date, period: str,
+                      cache: Optional[BorderoCache] = None) -> int:
+    """Write the ZIP of per-period borderôs into ``fileobj``; returns the number of workbooks"""
+    borderos = build_borderos(db, start_dt, end_dt, period, cache)
+    # XLSX já é compactado: guardar sem recompressão
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED) as archive:
+        for (s, e), content in borderos:
+            archive.writestr(bordero_filename(s, e), content)
+    return len(borderos)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate one borderô per period into a ZIP archive")
+    parser.add_argument("--start", required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="last day (YYYY-MM-DD)")
+    parser.add_argument("--period", choices=PERIODS, default="month")
+    parser.add_argument("-o", "--output", help="ZIP path (default: the name used by the endpoint)")
+    args = parser.parse_args(argv)
+
+    start_dt = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end_dt = datetime.strptime(args.end, "%Y-%m-%d").date()
+    output = args.output or batch_filename(start_dt, end_dt, args.period)
+
+    from ..db import SessionLocal
+    # Processos só sobem se algum período precisar ser refeito
+    pool = get_render_pool()
+    try:
+        with SessionLocal() as db, open(output, "wb") as fh:
+            count = write_bordero_zip(fh, db, start_dt, end_dt, args.period)
+    finally:
+        pool.stop()
+    print(f"{output}: {count} borderôs ({get_bordero_cache().stats()['hits']} from cache)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Payment-method and gratuity buckets of the borderô
+
+The same rules exist in three forms that must agree: scalar functions for
+single values, SQL ``CASE`` expressions so the database can pivot by
+bucket, and vectorized NumPy versions for data aggregated in pandas
+(NumPy is imported on first use).
+
+- payment: ``pix`` and cash aliases get their own bucket, anything else
+  (card brands, unknown or empty) is counted as card (``cc``);
+- gratuity: ``DG`` (dia da gratuidade), ``GPD`` (pessoa com deficiência)
+  and ``TG`` for every other free ticket.
+"""
+from typing import TYPE_CHECKING, Iterable, Set
+
+from sqlalchemy import case, func
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CASH_NAMES = {"cash", "dinheiro", "especie", "espécie"}
+PIX_NAMES = {"pix"}
+CARD_NAMES = {"cc", "cartao", "cartão", "credito", "crédito", "debit", "debito",
+              "credit", "card", "visa", "master", "elo", "amex", "hipercard"}
+
+DG_REASONS = {"DG", "DIA GRATUIDADE"}
+GPD_REASONS = {"GPD", "PCD"}
+
+PAYMENT_BUCKETS = ("cash", "pix", "cc")
+GRATUITY_BUCKETS = ("DG", "GPD", "TG")
+
+
+def pm_bucket(pm: str) -> str:
+    s = (pm or "").strip().lower()
+    if s in PIX_NAMES:
+        return "pix"
+    if s in CASH_NAMES:
+        return "cash"
+    # padrão: trata tudo como cartão (coluna CC)
+    return "cc"
+
+
+def grat_bucket(reason: str) -> str:
+    r = (reason or "").strip().upper()
+    if r in DG_REASONS:
+        return "DG"
+    if r in GPD_REASONS:
+        return "GPD"
+    return "TG"
+
+
+def _ascii_lower(s: str) -> str:
+    return "".join(c.lower() if c.isascii() else c for c in s)
+
+
+def _sql_spellings(names: Iterable[str]) -> Set[str]:
+    """Names as ``lower()`` may return them: SQLite only folds ASCII letters"""
+    spellings = set()
+    for name in names:
+        spellings.update({name, _ascii_lower(name.upper()), _ascii_lower(name.capitalize())})
+    return spellings
+
+
+def pm_bucket_sql(column):
+    """SQL expression equivalent to :func:`pm_bucket`"""
+    s = func.lower(func.trim(func.coalesce(column, "")))
+    return case(
+        (s.in_(sorted(_sql_spellings(PIX_NAMES))), "pix"),
+        (s.in_(sorted(_sql_spellings(CASH_NAMES))), "cash"),
+        else_="cc",
+    )
+
+
+def _reason_sql(column):
+    return func.upper(func.trim(func.coalesce(column, "")))
+
+
+def grat_bucket_sql(column):
+    """SQL expression equivalent to :func:`grat_bucket`"""
+    r = _reason_sql(column)
+    return case(
+        (r.in_(sorted(DG_REASONS)), "DG"),
+        (r.in_(sorted(GPD_REASONS)), "GPD"),
+        else_="TG",
+    )
+
+
+def in_grat_bucket_sql(column, bucket: str):
+    """SQL condition ``grat_bucket(column) == bucket`` for the explicit buckets (not TG)"""
+    reasons = {"DG": DG_REASONS, "GPD": GPD_REASONS}[bucket]
+    return _reason_sql(column).in_(sorted(reasons))
+
+
+def _normalized(values, upper: bool) -> "np.ndarray":
+    import numpy as np
+
+    # Operações de string do NumPy, sem laço Python por linha. None/NaN viram
+    # "None"/"nan", que não são apelido de nada e caem no bucket padrão
+    arr = np.char.strip(np.asarray(values, dtype=object).astype(str))
+    return np.char.upper(arr) if upper else np.char.lower(arr)
+
+
+def pm_bucket_array(values) -> "np.ndarray":
+    """Vectorized :func:`pm_bucket` over a sequence, Series or array"""
+    import numpy as np
+
+    s = _normalized(values, upper=False)
+    return np.select([np.isin(s, list(PIX_NAMES)), np.isin(s, list(CASH_NAMES))], ["pix", "cash"], "cc")
+
+
+def grat_bucket_array(values) -> "np.ndarray":
+    """Vectorized :func:`grat_bucket` over a sequence, Series or array"""
+    import numpy as np
+
+    r = _normalized(values, upper=True)
+    return np.select([np.isin(r, list(DG_REASONS)), np.isin(r, list(GPD_REASONS))], ["DG", "GPD"], "TG")
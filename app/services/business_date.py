@@ -0,0 +1,51 @@
+"""
+Business date: the venue-local day a sale belongs to
+
+Timestamps are stored as naive UTC (``server_default=now()`` and
+``datetime.utcnow()``), so truncating them with ``date()`` buckets late
+evening sales into the next day. The business date converts to
+``VENUE_TIMEZONE`` first and then subtracts ``BUSINESS_DAY_CUTOFF_HOUR``, so
+a sale at 01:30 with a 03:00 cutoff still counts for the day before.
+
+It is stored on ``orders.business_date`` and ``group_visits.business_date``
+when the row is inserted; reports filter and group on that indexed column.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from ..config import get_settings
+
+
+def venue_timezone() -> ZoneInfo:
+    return ZoneInfo(get_settings().venue_timezone)
+
+
+def business_date(ts: Optional[datetime] = None, local: bool = False) -> date:
+    """Business day of ``ts`` (now when omitted)
+
+    Naive timestamps are UTC unless ``local`` is set, for wall-clock times
+    typed in by staff such as a group's visit time.
+    """
+    settings = get_settings()
+    if ts is None:
+        ts = datetime.now(timezone.utc)
+    if not local:
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        ts = ts.astimezone(venue_timezone())
+    return (ts - timedelta(hours=settings.business_day_cutoff_hour)).date()
+
+
+def local_time(ts: Optional[datetime] = None) -> datetime:
+    """Venue wall-clock time (naive) of a naive UTC timestamp, now when omitted"""
+    if ts is None:
+        ts = datetime.now(timezone.utc)
+    elif ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(venue_timezone()).replace(tzinfo=None)
+
+
+def today() -> date:
+    """Current business day at the venue"""
+    return business_date()
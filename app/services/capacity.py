@@ -0,0 +1,209 @@
+"""
+Time-slot capacity inventory with sharded counters
+
+Each slot's capacity is split across ``capacity_shards`` rows. A reservation
+picks shards in random order and takes seats with a conditional
+``UPDATE ... SET reserved = reserved + n WHERE reserved + n <= capacity``,
+so there is no read-modify-write race and concurrent sales rarely touch the
+same row. On PostgreSQL a reservation first locks one random free shard at
+a time (``ORDER BY random() LIMIT 1 FOR UPDATE SKIP LOCKED``), taking another
+only while seats are still missing, so concurrent sales land on different
+shards; it falls back to waiting on locked shards only when no free one is
+left.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import CapacitySlot, CapacityAllocation, Order
+from . import business_date
+
+
+class CapacityExceeded(Exception):
+    """Raised when a slot does not have enough seats left"""
+
+    def __init__(self, slot_start: datetime, requested: int, available: int):
+        self.slot_start = slot_start
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Capacidade esgotada para {slot_start:%d/%m %H:%M}: "
+            f"{requested} solicitado(s), {available} disponível(is)"
+        )
+
+
+def is_enabled() -> bool:
+    return get_settings().capacity_per_slot > 0
+
+
+def slot_for(when: datetime) -> datetime:
+    """Start of the time slot containing ``when``"""
+    minutes = get_settings().capacity_slot_minutes
+    midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = int((when - midnight).total_seconds() // 60)
+    return midnight + timedelta(minutes=elapsed - elapsed % minutes)
+
+
+def ensure_slot(db: Session, slot_start: datetime) -> None:
+    """Create the shard rows of a slot on first use (safe under concurrency)"""
+    if db.query(CapacitySlot.id).filter(CapacitySlot.slot_start == slot_start).first():
+        return
+    settings = get_settings()
+    shards = max(1, settings.capacity_shards)
+    base, extra = divmod(settings.capacity_per_slot, shards)
+    try:
+        with db.begin_nested():
+            db.add_all([
+                CapacitySlot(slot_start=slot_start, shard=n,
+                             capacity=base + (1 if n < extra else 0), reserved=0)
+                for n in range(shards)
+            ])
+    except IntegrityError:
+        pass  # outra transação criou o horário primeiro
+
+
+def _free_shards(db: Session, slot_start: datetime):
+    return (db.query(CapacitySlot.id, CapacitySlot.capacity - CapacitySlot.reserved)
+              .filter(CapacitySlot.slot_start == slot_start,
+                      CapacitySlot.reserved < CapacitySlot.capacity))
+
+
+def _shard_availability(db: Session, slot_start: datetime) -> Dict[int, int]:
+    return dict(_free_shards(db, slot_start).all())
+
+
+def _unlocked_shard_query(db: Session, slot_start: datetime, tried: Set[int]):
+    """One random shard with free seats that no other transaction holds (PostgreSQL)"""
+    query = _free_shards(db, slot_start)
+    if tried:
+        query = query.filter(CapacitySlot.id.notin_(tried))
+    return query.order_by(func.random()).limit(1).with_for_update(skip_locked=True)
+
+
+def _take_unlocked(db: Session, slot_start: datetime, qty: int, taken: Dict[int, int]) -> int:
+    """Take seats from free shards locked one by one; returns how many are still missing"""
+    tried: Set[int] = set()
+    remaining = qty
+    while remaining > 0:
+        row: Optional[Tuple[int, int]] = _unlocked_shard_query(db, slot_start, tried).first()
+        if row is None:
+            break
+        slot_id, free = row
+        tried.add(slot_id)
+        want = min(remaining, free)
+        if _take(db, slot_id, want):  # a linha já está travada por nós
+            taken[slot_id] = taken.get(slot_id, 0) + want
+            remaining -= want
+    return remaining
+
+
+def _take(db: Session, slot_id: int, qty: int) -> bool:
+    result = db.execute(
+        update(CapacitySlot)
+        .where(CapacitySlot.id == slot_id,
+               CapacitySlot.reserved + qty <= CapacitySlot.capacity)
+        .values(reserved=CapacitySlot.reserved + qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def reserve(db: Session, order_id: int, when: datetime, qty: int) -> Optional[datetime]:
+    """
+    Reserve ``qty`` seats in the slot containing ``when`` for an order.
+
+    Runs inside the caller's transaction: on CapacityExceeded the caller
+    must roll back, which also undoes any partial shard updates. Returns
+    the slot start, or None when capacity control is disabled.
+    """
+    if not is_enabled() or qty <= 0:
+        return None
+    slot_start = slot_for(when)
+    ensure_slot(db, slot_start)
+
+    taken: Dict[int, int] = {}
+    remaining = qty
+    if db.bind.dialect.name == "postgresql":
+        remaining = _take_unlocked(db, slot_start, qty, taken)
+    if remaining > 0:
+        # Sem shard livre desbloqueado (ou SQLite): espera pelos shards com saldo
+        available = _shard_availability(db, slot_start)
+        shard_ids = list(available)
+        random.shuffle(shard_ids)
+        # Prefere um único shard que comporte o restante do pedido
+        shard_ids.sort(key=lambda sid: available[sid] < remaining)
+        for slot_id in shard_ids:
+            while remaining > 0 and available[slot_id] > 0:
+                want = min(remaining, available[slot_id])
+                if _take(db, slot_id, want):
+                    taken[slot_id] = taken.get(slot_id, 0) + want
+                    remaining -= want
+                    available[slot_id] -= want
+                else:
+                    # Outra venda levou parte do shard: relê o saldo dele
+                    fresh = db.query(CapacitySlot.capacity - CapacitySlot.reserved) \
+                        .filter(CapacitySlot.id == slot_id).scalar() or 0
+                    available[slot_id] = min(fresh, want - 1)
+            if remaining == 0:
+                break
+
+    if remaining > 0:
+        raise CapacityExceeded(slot_start, qty, qty - remaining)
+
+    db.add_all([CapacityAllocation(order_id=order_id, slot_id=slot_id, qty=n)
+                for slot_id, n in taken.items()])
+    return slot_start
+
+
+def reserve_order(db: Session, order: Order, sold_at: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Reserve the seats of a flushed order in the slot of its sale.
+
+    ``sold_at`` is naive UTC like ``orders.created_at`` (now when omitted);
+    slots are in venue wall-clock time. Every sale path (counter, terminal
+    sync, bulk ingest, journal replay) goes through here.
+    """
+    if not is_enabled():
+        return None
+    qty = sum(item.qty for item in order.items)
+    return reserve(db, order.id, business_date.local_time(sold_at), qty)
+
+
+def release(db: Session, order_id: int) -> int:
+    """Give back the seats held by an order; returns how many were freed"""
+    allocations = db.query(CapacityAllocation).filter(CapacityAllocation.order_id == order_id).all()
+    freed = 0
+    for allocation in allocations:
+        db.execute(
+            update(CapacitySlot)
+            .where(CapacitySlot.id == allocation.slot_id)
+            .values(reserved=CapacitySlot.reserved - allocation.qty)
+            .execution_options(synchronize_session=False)
+        )
+        freed += allocation.qty
+        db.delete(allocation)
+    return freed
+
+
+def availability(db: Session, day: datetime) -> List[Dict]:
+    """Capacity and reservations per slot for one day"""
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = (db.query(CapacitySlot.slot_start,
+                     func.sum(CapacitySlot.capacity).label("capacity"),
+                     func.sum(CapacitySlot.reserved).label("reserved"))
+              .filter(CapacitySlot.slot_start >= start,
+                      CapacitySlot.slot_start < start + timedelta(days=1))
+              .group_by(CapacitySlot.slot_start)
+              .order_by(CapacitySlot.slot_start)
+              .all())
+    return [{
+        "slot_start": r.slot_start.isoformat(),
+        "capacity": int(r.capacity),
+        "reserved": int(r.reserved),
+        "available": int(r.capacity) - int(r.reserved),
+    } for r in rows]
@@ -0,0 +1,51 @@
+"""
+Streaming RFC 4180 CSV writer
+
+Rows are formatted by the ``csv`` module (quoting fields with commas,
+quotes or line breaks; CRLF line endings) and yielded as encoded chunks
+every ``batch_rows`` rows, so a report never holds more than one batch in
+memory. ``bom=True`` prefixes a UTF-8 byte order mark so Excel detects the
+encoding of accented names.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, Sequence
+
+BATCH_ROWS = 1000
+UTF8_BOM = "\ufeff"
+
+
+def _field(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Sim" if value else "Não"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return value
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence], bom: bool = False,
+               batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    """Yield a CSV document as UTF-8 chunks; ``rows`` is consumed lazily"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if bom:
+        buffer.write(UTF8_BOM)
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow([_field(value) for value in row])
+        pending += 1
+        if pending >= batch_rows:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
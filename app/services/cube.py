@@ -0,0 +1,216 @@
+"""
+Sales cube: any combination of dimensions and measures in one query
+
+Dimensions and measures live in registries mapping a public name to a SQL
+expression. A request is validated against them and compiled into a single
+``SELECT dims, measures FROM orders JOIN order_items [JOIN users] WHERE
+business_date in range GROUP BY dims``; dates are the venue-local
+``business_date``, filtered as a plain range so its index is usable, and
+``users`` is joined only when the operator dimension asks for it.
+
+Server-side limits (dimensions per request, days per range, rows per
+answer) come from settings; answers are cached for ``CUBE_CACHE_TTL_SECONDS``
+keyed on the normalized request.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import desc, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Order, OrderItem, User
+from .reports import money
+
+
+def _week(dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc("week", Order.business_date), "YYYY-MM-DD")
+    # SQLite: domingo seguinte (ou o próprio domingo) menos seis dias = segunda-feira
+    return func.date(Order.business_date, "weekday 0", "-6 days")
+
+
+def _month(dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(Order.business_date, "YYYY-MM")
+    return func.strftime("%Y-%m", Order.business_date)
+
+
+def _day(dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(Order.business_date, "YYYY-MM-DD")
+    return func.date(Order.business_date)
+
+
+# nome -> expressão por dialeto; datas saem como texto ISO (semana = segunda-feira)
+DIMENSIONS: Dict[str, Callable[[str], object]] = {
+    "day": _day,
+    "week": _week,
+    "month": _month,
+    "channel": lambda dialect: Order.channel,
+    "ticket_type": lambda dialect: OrderItem.ticket_type,
+    "payment_method": lambda dialect: Order.payment_method,
+    "discount_reason": lambda dialect: OrderItem.discount_reason,
+    "state": lambda dialect: Order.state,
+    "city": lambda dialect: Order.city,
+    "operator": lambda dialect: User.username,
+}
+
+# nome -> (expressão, conversão do valor)
+MEASURES: Dict[str, Tuple[Callable[[], object], Callable]] = {
+    "people": (lambda: func.sum(OrderItem.qty), int),
+    "revenue": (lambda: func.sum(OrderItem.qty * OrderItem.unit_price_cents), money),
+    "orders": (lambda: func.count(func.distinct(Order.id)), int),
+}
+
+DATE_DIMENSIONS = ("day", "week", "month")
+
+
+@dataclass(frozen=True)
+class CubeQuery:
+    dimensions: Tuple[str, ...]
+    measures: Tuple[str, ...]
+    start_dt: date
+    end_dt: date
+    limit: int
+
+    @property
+    def key(self) -> Tuple:
+        return (self.dimensions, self.measures, self.start_dt, self.end_dt, self.limit)
+
+
+def _names(value: Optional[str]) -> Tuple[str, ...]:
+    return tuple(name.strip() for name in (value or "").split(",") if name.strip())
+
+
+def parse_cube_query(dimensions: Optional[str], measures: Optional[str], start_dt: date, end_dt: date,
+                     limit: Optional[int] = None) -> CubeQuery:
+    """Validate a request against the registries and the server-side limits; raises ValueError"""
+    settings = get_settings()
+    dims = _names(dimensions)
+    meas = _names(measures) or ("people", "revenue")
+
+    unknown = [d for d in dims if d not in DIMENSIONS] + [m for m in meas if m not in MEASURES]
+    if unknown:
+        raise ValueError(f"Unknown dimension or measure: {', '.join(unknown)}. "
+                         f"Dimensions: {', '.join(DIMENSIONS)}; measures: {', '.join(MEASURES)}")
+    if len(set(dims)) != len(dims) or len(set(meas)) != len(meas):
+        raise ValueError("Dimensions and measures must not repeat")
+    if sum(d in DATE_DIMENSIONS for d in dims) > 1:
+        raise ValueError("Use at most one of day, week and month")
+    if len(dims) > settings.cube_max_dimensions:
+        raise ValueError(f"At most {settings.cube_max_dimensions} dimensions per request")
+    if end_dt < start_dt:
+        raise ValueError("end_date must not be before start_date")
+    if (end_dt - start_dt).days + 1 > settings.cube_max_days:
+        raise ValueError(f"At most {settings.cube_max_days} days per request")
+
+    max_rows = settings.cube_max_rows
+    limit = max_rows if limit is None else limit
+    if not 1 <= limit <= max_rows:
+        raise ValueError(f"limit must be between 1 and {max_rows}")
+    return CubeQuery(dims, meas, start_dt, end_dt, limit)
+
+
+def compile_cube(query: CubeQuery, dialect: str):
+    """Single aggregate statement for the query"""
+    dims = [DIMENSIONS[d](dialect).label(d) for d in query.dimensions]
+    measures = [MEASURES[m][0]().label(m) for m in query.measures]
+
+    stmt = (select(*dims, *measures)
+            .select_from(Order)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.deleted_at.is_(None),
+                   Order.business_date >= query.start_dt,
+                   Order.business_date <= query.end_dt))
+    if "operator" in query.dimensions:
+        stmt = stmt.join(User, User.id == Order.user_id)
+    if dims:
+        stmt = stmt.group_by(*[literal_column(str(i)) for i in range(1, len(dims) + 1)])
+    # Datas em ordem cronológica; sem data, maiores primeiro pela primeira medida
+    date_dims = [d for d in query.dimensions if d in DATE_DIMENSIONS]
+    order = [literal_column(d) for d in date_dims] + [desc(literal_column(query.measures[0]))]
+    # Uma linha a mais revela que o resultado foi cortado
+    return stmt.order_by(*order).limit(query.limit + 1)
+
+
+class CubeCache:
+    """Small LRU of cube answers that expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple, value: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[CubeCache] = None
+
+
+def get_cube_cache() -> CubeCache:
+    global _cache
+    if _cache is None:
+        _cache = CubeCache(get_settings().cube_cache_ttl_seconds)
+    return _cache
+
+
+def run_cube(db: Session, query: CubeQuery) -> Dict:
+    """Answer a cube query, from the cache when a fresh answer exists"""
+    cache = get_cube_cache()
+    dialect = db.get_bind().dialect.name
+    key = (dialect,) + query.key
+    cached = cache.get(key)
+    if cached is not None:
+        return dict(cached, cached=True)
+
+    started = time.perf_counter()
+    converters: Sequence[Callable] = [MEASURES[m][1] for m in query.measures]
+    n_dims = len(query.dimensions)
+    rows: List[list] = []
+    for row in db.execute(compile_cube(query, dialect)):
+        rows.append(list(row[:n_dims]) + [convert(value or 0) for convert, value in zip(converters, row[n_dims:])])
+
+    truncated = len(rows) > query.limit
+    answer = {
+        "dimensions": list(query.dimensions),
+        "measures": list(query.measures),
+        "start_date": query.start_dt.isoformat(),
+        "end_date": query.end_dt.isoformat(),
+        "rows": rows[:query.limit],
+        "truncated": truncated,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    cache.put(key, answer)
+    return dict(answer, cached=False)
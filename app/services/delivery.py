@@ -0,0 +1,158 @@
+"""
+Export delivery without leftover files
+
+Exports are built into a ``SpooledTemporaryFile``: small ones never leave
+memory and are sent as a plain response; larger ones spill to an anonymous
+temp file (unlinked on creation, so nothing survives a crash) that is
+streamed back and closed as soon as the response ends or is abandoned.
+Already streaming exports go through :func:`stream_download` so that all
+exports are counted in the same metrics.
+"""
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Union
+from urllib.parse import quote
+
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from ..config import get_settings
+
+READ_CHUNK = 64 * 1024
+
+
+class ExportMetrics:
+    """Counters for produced export bytes and spilled temp-disk usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exports: Dict[str, int] = {"memory": 0, "disk": 0, "stream": 0}
+        self.bytes_produced = 0
+        self.temp_files = 0
+        self.temp_bytes = 0
+        self.temp_bytes_peak = 0
+
+    def produced(self, mode: str, size: int) -> None:
+        with self._lock:
+            self.exports[mode] += 1
+            self.bytes_produced += size
+
+    def spilled(self, size: int) -> None:
+        with self._lock:
+            self.temp_files += 1
+            self.temp_bytes += size
+            self.temp_bytes_peak = max(self.temp_bytes_peak, self.temp_bytes)
+
+    def released(self, size: int) -> None:
+        with self._lock:
+            self.temp_files -= 1
+            self.temp_bytes -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "exports": dict(self.exports),
+                "bytes_produced": self.bytes_produced,
+                "temp_files": self.temp_files,
+                "temp_bytes": self.temp_bytes,
+                "temp_bytes_peak": self.temp_bytes_peak,
+            }
+
+
+export_metrics = ExportMetrics()
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment header, RFC 5987-encoded when the name is not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _spool() -> tempfile.SpooledTemporaryFile:
+    settings = get_settings()
+    directory = settings.export_temp_dir or None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return tempfile.SpooledTemporaryFile(max_size=settings.export_spool_max_bytes, dir=directory)
+
+
+class _SpilledFile:
+    """Spilled export being streamed; closed exactly once, whichever path ends first"""
+
+    def __init__(self, spool: BinaryIO, size: int):
+        self._spool = spool
+        self._size = size
+        self._lock = threading.Lock()
+        self._closed = False
+        export_metrics.spilled(size)
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            self._spool.seek(0)
+            while True:
+                chunk = self._spool.read(READ_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._spool.close()
+        export_metrics.released(self._size)
+
+
+def deliver_file(build: Callable[[BinaryIO], None], filename: str, media_type: str) -> Response:
+    """
+    Build an export by calling ``build(fileobj)`` and return it as a response.
+
+    Up to ``export_spool_max_bytes`` the content is served from memory;
+    above it the spilled file is streamed and then closed, which removes it.
+    """
+    spool = _spool()
+    try:
+        build(spool)
+        size = spool.seek(0, os.SEEK_END)
+    except BaseException:
+        spool.close()
+        raise
+
+    in_memory = size <= get_settings().export_spool_max_bytes
+    export_metrics.produced("memory" if in_memory else "disk", size)
+    headers = {"Content-Disposition": content_disposition(filename)}
+
+    if in_memory:
+        spool.seek(0)
+        content = spool.read()
+        spool.close()
+        return Response(content, media_type=media_type, headers=headers)
+
+    spilled = _SpilledFile(spool, size)
+    headers["Content-Length"] = str(size)
+    # A tarefa de fundo cobre o caso em que o gerador nunca chega a ser iniciado
+    return StreamingResponse(spilled, media_type=media_type, headers=headers,
+                             background=BackgroundTask(spilled.close))
+
+
+def stream_download(chunks: Iterable[Union[bytes, str]], filename: str, media_type: str) -> StreamingResponse:
+    """Stream a generated export, counting its bytes in the export metrics"""
+    def counted():
+        size = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                size += len(chunk)
+                yield chunk
+        finally:
+            export_metrics.produced("stream", size)
+
+    return StreamingResponse(counted(), media_type=media_type,
+                             headers={"Content-Disposition": content_disposition(filename)})
@@ -0,0 +1,266 @@
+"""
+Background export jobs
+
+Large exports are queued in the ``export_jobs`` table and generated by a
+bounded thread pool, so the request that asks for them returns at once.
+Workers write the artifact to ``export_jobs_dir`` (``<id>.part`` renamed
+on success) and record progress on the job row through a session of their
+own, so the export's streamed read is never committed under it; the finished file is kept
+until its retention TTL expires. Jobs left queued or running when the
+process stopped are picked up again on the next start.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Callable, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import ExportJob
+from .prometheus import Histogram
+from .render_pool import get_render_pool
+from .reports import bordero_lines, bordero_filename, bordero_rows, render_bordero_bytes, per_day_sheets
+from .xlsx_stream import stream_xlsx, XLSX_MEDIA_TYPE
+
+logger = logging.getLogger(__name__)
+
+Progress = Callable[[int], None]
+
+# Limites dos buckets de duração dos jobs, em segundos
+EXPORT_JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+class ExportQueueFull(Exception):
+    """Raised when the queued plus running jobs reached the configured limit"""
+
+
+def _build_bordero(db: Session, start_dt: date, end_dt: date, out: BinaryIO, progress: Progress) -> str:
+    linhas = bordero_lines(db, start_dt, end_dt)
+    progress(50)
+    out.write(get_render_pool().call(render_bordero_bytes, start_dt, end_dt, bordero_rows(linhas)))
+    return bordero_filename(start_dt, end_dt)
+
+
+def _build_report(db: Session, start_dt: date, end_dt: date, out: BinaryIO, progress: Progress) -> str:
+    sheets = per_day_sheets(db, start_dt, end_dt)
+
+    def tracked():
+        for n, sheet in enumerate(sheets):
+            progress(n * 100 // len(sheets))
+            yield sheet
+
+    for chunk in stream_xlsx(tracked()):
+        out.write(chunk)
+    return f"relatorio_geral_{start_dt}_{end_dt}.xlsx"
+
+
+# kind -> (builder, media type)
+EXPORT_KINDS: Dict[str, tuple] = {
+    "bordero": (_build_bordero, XLSX_MEDIA_TYPE),
+    "report": (_build_report, XLSX_MEDIA_TYPE),
+}
+
+
+def job_to_dict(job: ExportJob) -> Dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params),
+        "status": job.status,
+        "progress": job.progress,
+        "filename": job.filename,
+        "size_bytes": job.size_bytes,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+    }
+
+
+class ExportJobManager:
+    """Bounded worker pool generating export jobs stored in the database"""
+
+    def __init__(self, session_factory, directory: str, workers: int, queue_limit: int, ttl: timedelta):
+        self.session_factory = session_factory
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.queue_limit = queue_limit
+        self.ttl = ttl
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.durations = Histogram(("kind", "status"), EXPORT_JOB_BUCKETS)
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-job")
+            return self._executor
+
+    def start(self) -> None:
+        """Create the pool, drop expired artifacts and resume unfinished jobs"""
+        self._ensure_executor()
+        for name in os.listdir(self.directory):
+            if name.endswith(".part"):
+                os.remove(os.path.join(self.directory, name))
+        self.purge_expired()
+        db = self.session_factory()
+        try:
+            pending = db.query(ExportJob.id).filter(ExportJob.status.in_(("queued", "running"))) \
+                        .order_by(ExportJob.created_at).all()
+            db.execute(update(ExportJob).where(ExportJob.status == "running")
+                       .values(status="queued", progress=0, started_at=None))
+            db.commit()
+        finally:
+            db.close()
+        for (job_id,) in pending:
+            self._submit(job_id)
+        if pending:
+            logger.info("Resumed %d export job(s)", len(pending))
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            # Jobs em andamento são retomados no próximo start
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def enqueue(self, db: Session, kind: str, params: Dict, user_id: int) -> ExportJob:
+        """Record a job and hand it to the pool; raises ExportQueueFull when saturated"""
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"Unknown export kind: {kind}")
+        with self._lock:
+            if self._active >= self.queue_limit:
+                raise ExportQueueFull(f"{self._active} export jobs already queued or running")
+            self._active += 1
+        try:
+            job = ExportJob(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params, default=str),
+                            status="queued", progress=0, user_id=user_id)
+            db.add(job)
+            db.commit()
+        except Exception:
+            with self._lock:
+                self._active -= 1
+            raise
+        self._submit(job.id, counted=True)
+        return job
+
+    def _submit(self, job_id: str, counted: bool = False) -> None:
+        if not counted:
+            with self._lock:
+                self._active += 1
+        self._ensure_executor().submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self.run_job(job_id)
+        except Exception:
+            logger.exception("Export job %s crashed", job_id)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def run_job(self, job_id: str) -> None:
+        """Generate one job synchronously (pool workers, tests and CLI)"""
+        db = self.session_factory()
+        try:
+            # Reivindica o job de forma atômica: nunca roda duas vezes
+            claimed = db.execute(update(ExportJob)
+                                 .where(ExportJob.id == job_id, ExportJob.status == "queued")
+                                 .values(status="running", progress=0, started_at=datetime.utcnow()))
+            db.commit()
+            if claimed.rowcount != 1:
+                return
+            started = time.perf_counter()
+            job = db.get(ExportJob, job_id)
+            builder, _ = EXPORT_KINDS[job.kind]
+            params = json.loads(job.params)
+            part = os.path.join(self.directory, f"{job.id}.part")
+
+            def progress(pct: int) -> None:
+                # Sessão própria: um commit em db fecharia o cursor do servidor que o
+                # builder ainda está lendo (yield_per no PostgreSQL)
+                with self.session_factory() as progress_db:
+                    progress_db.execute(update(ExportJob).where(ExportJob.id == job_id)
+                                        .values(progress=max(0, min(99, int(pct)))))
+                    progress_db.commit()
+
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(part, "wb") as out:
+                    filename = builder(db, date.fromisoformat(params["start_date"]),
+                                       date.fromisoformat(params["end_date"]), out, progress)
+                final = os.path.join(self.directory, f"{job.id}{os.path.splitext(filename)[1]}")
+                os.replace(part, final)
+            except Exception as e:
+                db.rollback()
+                if os.path.exists(part):
+                    os.remove(part)
+                logger.exception("Export job %s failed", job_id)
+                job.status = "failed"
+                job.error = str(e)[:1000]
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                self.durations.observe(time.perf_counter() - started, job.kind, "failed")
+                return
+
+            now = datetime.utcnow()
+            job.status = "done"
+            job.progress = 100
+            job.filename = filename
+            job.path = final
+            job.size_bytes = os.path.getsize(final)
+            job.finished_at = now
+            job.expires_at = now + self.ttl
+            db.commit()
+            self.durations.observe(time.perf_counter() - started, job.kind, "done")
+        finally:
+            db.close()
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete artifacts past their TTL and mark their jobs expired"""
+        db = self.session_factory()
+        try:
+            jobs = db.query(ExportJob).filter(ExportJob.status == "done",
+                                              ExportJob.expires_at < datetime.utcnow()).all()
+            for job in jobs:
+                if job.path and os.path.exists(job.path):
+                    os.remove(job.path)
+                job.status = "expired"
+                job.path = None
+            db.commit()
+            return len(jobs)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"active": self._active, "workers": self.workers, "queue_limit": self.queue_limit}
+
+
+_manager: Optional[ExportJobManager] = None
+
+
+def get_export_jobs() -> ExportJobManager:
+    """Process-wide export job manager configured from settings"""
+    global _manager
+    if _manager is None:
+        from ..db import SessionLocal
+        settings = get_settings()
+        _manager = ExportJobManager(
+            SessionLocal,
+            settings.export_jobs_dir,
+            settings.export_job_workers,
+            settings.export_job_queue_limit,
+            timedelta(hours=settings.export_job_ttl_hours),
+        )
+    return _manager
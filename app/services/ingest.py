@@ -0,0 +1,214 @@
+"""
+Bulk order ingest: incremental JSON/NDJSON parsing and batched inserts
+"""
+import codecs
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from ..models import Order, OrderItem, OrderEvent
+from ..schemas import OrderCreate, Channel
+from . import capacity
+
+# Preço de face de cada tipo de ingresso (centavos)
+TICKET_PRICES_CENTS = {"inteira": 1000, "meia": 500, "gratuita": 0}
+
+# Canais aceitos pela API em lote (grupos exigem metadados próprios)
+BULK_CHANNELS = {Channel.BALCAO, Channel.ONLINE, Channel.PARCEIRO}
+
+
+class IngestError(Exception):
+    """Raised when the payload itself (not a single record) is malformed"""
+
+
+def add_order(
+    db: Session,
+    user_id: int,
+    payload: OrderCreate,
+    created_at: Optional[datetime] = None,
+    ip_address: Optional[str] = None,
+    client_id: Optional[str] = None,
+) -> Order:
+    """
+    Add an order with its items and audit event to the session.
+
+    Children are attached through relationships, so several orders can be
+    added and written with a single flush (one multi-row INSERT per table).
+    """
+    order = Order(
+        user_id=user_id,
+        channel=payload.channel.value,
+        payment_method=payload.payment_method.value,
+        state=payload.state,
+        city=payload.city,
+        note=payload.note,
+        client_id=client_id,
+    )
+    if created_at is not None:
+        order.created_at = created_at
+
+    for item in payload.items:
+        if item.qty > 0:
+            order.items.append(OrderItem(
+                ticket_type=item.ticket_type.value,
+                qty=item.qty,
+                unit_price_cents=TICKET_PRICES_CENTS[item.ticket_type.value],
+                discount_reason=item.discount_reason,
+            ))
+
+    order.events.append(OrderEvent(
+        action="created",
+        user_id=user_id,
+        ip_address=ip_address,
+    ))
+    db.add(order)
+    return order
+
+
+def validate_record(record: Any) -> Tuple[Optional[OrderCreate], Optional[List[str]]]:
+    """Validate one bulk record, returning (order, None) or (None, errors)"""
+    if not isinstance(record, dict):
+        return None, ["Registro deve ser um objeto JSON"]
+    try:
+        order = OrderCreate.model_validate(record)
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(p) for p in err['loc']) or 'registro'}: {err['msg']}"
+            for err in e.errors()
+        ]
+    if order.channel not in BULK_CHANNELS:
+        return None, [f"channel: canal '{order.channel.value}' não aceito em lote"]
+    if sum(item.qty for item in order.items) <= 0:
+        return None, ["items: pedido sem ingressos"]
+    return order, None
+
+
+async def iter_records(
+    chunks: AsyncIterator[bytes],
+    ndjson: bool,
+    max_record_bytes: int,
+) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """
+    Yield (record, parse_error) pairs from a streamed request body.
+
+    Only one record (plus one network chunk) is held in memory at a time.
+    NDJSON lines that fail to parse are reported individually; a malformed
+    JSON array cannot be resynchronized and raises IngestError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    if ndjson:
+        buffer = ""
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+            if len(buffer) > max_record_bytes:
+                raise IngestError("Registro excede o tamanho máximo permitido")
+        buffer += decoder.decode(b"", final=True)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    json_decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    # "[" antes do array; "first" logo após "["; "value" após uma vírgula;
+    # "next" após um pedido (só vírgula ou "]")
+    expect = "["
+    eof = False
+    chunk_iter = chunks.__aiter__()
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos < len(buffer):
+            char = buffer[pos]
+            if expect == "[":
+                if char != "[":
+                    raise IngestError("JSON inválido: esperado um array de pedidos")
+                expect = "first"
+                pos += 1
+                continue
+            if char == "]" and expect in ("first", "next"):
+                return
+            if expect == "next":
+                if char != ",":
+                    raise IngestError("JSON inválido: esperada vírgula entre os pedidos")
+                expect = "value"
+                pos += 1
+                continue
+            if char in ",]":
+                raise IngestError("JSON inválido: vírgula fora de lugar no array")
+            try:
+                record, end = json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise IngestError("JSON inválido ou truncado")
+                if len(buffer) - pos > max_record_bytes:
+                    raise IngestError("Registro excede o tamanho máximo permitido")
+            else:
+                # Um valor que termina no fim do buffer pode continuar no próximo chunk
+                if end < len(buffer) or eof:
+                    yield record, None
+                    buffer, pos = buffer[end:], 0
+                    expect = "next"
+                    continue
+        elif eof:
+            raise IngestError("JSON truncado: array não foi fechado")
+        try:
+            buffer += decoder.decode(await chunk_iter.__anext__())
+        except StopAsyncIteration:
+            buffer += decoder.decode(b"", final=True)
+            eof = True
+
+
+def _parse_line(line: str) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as e:
+        return None, f"JSON inválido: {e.msg}"
+
+
+def insert_batch(
+    db: Session,
+    user_id: int,
+    batch: List[Tuple[int, OrderCreate]],
+    ip_address: Optional[str] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    Insert a batch of validated orders in a single transaction.
+
+    If the batch transaction fails (including a full capacity slot), each
+    order is retried in its own transaction so the error is attributed to
+    the offending record only.
+    """
+    try:
+        orders = [(index, add_order(db, user_id, payload, ip_address=ip_address))
+                  for index, payload in batch]
+        db.flush()
+        for _, order in orders:
+            capacity.reserve_order(db, order)
+        results = [{"index": index, "status": "created", "order_id": order.id}
+                   for index, order in orders]
+        db.commit()
+        return results
+    except Exception:
+        db.rollback()
+
+    results = []
+    for index, payload in batch:
+        try:
+            order = add_order(db, user_id, payload, ip_address=ip_address)
+            db.flush()
+            capacity.reserve_order(db, order)
+            order_id = order.id
+            db.commit()
+            results.append({"index": index, "status": "created", "order_id": order_id})
+        except Exception as e:
+            db.rollback()
+            results.append({"index": index, "status": "error", "errors": [str(e)]})
+    return results
@@ -0,0 +1,280 @@
+"""
+Store-and-forward journal for sales accepted while the database is down
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.exc import DBAPIError, DisconnectionError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Order
+from ..schemas import CounterOrderCreate, OrderCreate
+from . import capacity
+from .ingest import add_order
+
+logger = logging.getLogger("bilheteria.journal")
+
+# Erros que indicam banco indisponível (vale a pena tentar de novo depois)
+DB_UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, DisconnectionError)
+
+
+def is_db_unavailable(exc: BaseException) -> bool:
+    """True when the exception means the database could not be reached"""
+    if isinstance(exc, DB_UNAVAILABLE_ERRORS):
+        return True
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+class SaleJournal:
+    """
+    Append-only, fsync'd NDJSON file of pending sales.
+
+    Entries are replayed strictly in append order. The replay position is
+    kept in a sidecar ``.offset`` file, and entries carry a ``client_id`` so
+    replaying an entry twice (e.g. after a crash mid-drain) is harmless.
+    Entries that can never be inserted are moved to a ``.rejected`` file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.rejected_path = path + ".rejected"
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._replay_times = deque(maxlen=1000)
+        self.appended = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self.last_replay_at: Optional[datetime] = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._depth = self._count_pending()
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int, sync: bool = False) -> None:
+        with open(self.offset_path, "w") as f:
+            f.write(str(offset))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _count_pending(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek(self._read_offset())
+            return sum(1 for line in f if line.strip())
+
+    def depth(self) -> int:
+        """Number of entries waiting to be replayed"""
+        return self._depth
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Durably append one entry; returns only after the data hit the disk"""
+        line = json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._depth += 1
+            self.appended += 1
+
+    def replay(self, handler: Callable[[Dict[str, Any]], None]) -> int:
+        """
+        Feed pending entries to ``handler`` in order and return how many
+        were consumed. Stops at the first database-unavailable error and
+        leaves that entry at the head of the journal.
+        """
+        with self._replay_lock:
+            return self._replay(handler)
+
+    def _replay(self, handler: Callable[[Dict[str, Any]], None]) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        offset = self._read_offset()
+        consumed = 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    break  # fim do arquivo (ou append em andamento)
+                if line.strip():
+                    try:
+                        handler(json.loads(line))
+                        self.replayed += 1
+                        self._replay_times.append(time.monotonic())
+                    except Exception as e:
+                        if is_db_unavailable(e):
+                            self.last_error = str(e)
+                            break
+                        self._reject(line, e)
+                    consumed += 1
+                    with self._lock:
+                        self._depth -= 1
+                offset = f.tell()
+                self._write_offset(offset)
+        self._write_offset(offset, sync=True)
+        if consumed:
+            self.last_replay_at = datetime.utcnow()
+        self._compact()
+        return consumed
+
+    def _reject(self, line: bytes, exc: Exception) -> None:
+        self.rejected += 1
+        self.last_error = str(exc)
+        logger.error("Journal entry rejected: %s", exc)
+        with open(self.rejected_path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self) -> None:
+        """Truncate the journal once everything has been replayed"""
+        with self._lock:
+            if self._depth == 0 and os.path.exists(self.path) \
+                    and os.path.getsize(self.path) == self._read_offset():
+                with open(self.path, "wb") as f:
+                    os.fsync(f.fileno())
+                self._write_offset(0, sync=True)
+
+    def replay_rate(self, window: float = 60.0) -> float:
+        """Entries replayed per second over the last ``window`` seconds"""
+        cutoff = time.monotonic() - window
+        recent = [t for t in self._replay_times if t >= cutoff]
+        return round(len(recent) / window, 3)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self._depth,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+            "replay_rate_per_s": self.replay_rate(),
+            "last_replay_at": self.last_replay_at.isoformat() if self.last_replay_at else None,
+            "last_error": self.last_error,
+        }
+
+
+def make_entry(payload: OrderCreate, user_id: int, client_id: str,
+               sold_at: datetime, ip_address: Optional[str] = None) -> Dict[str, Any]:
+    """Serialize a sale for the journal"""
+    return {
+        "client_id": client_id,
+        "sold_at": sold_at.isoformat(),
+        "user_id": user_id,
+        "ip_address": ip_address,
+        "order": payload.model_dump(mode="json"),
+    }
+
+
+def apply_entry(db: Session, entry: Dict[str, Any]) -> None:
+    """Insert a journaled sale unless its client_id is already stored"""
+    client_id = entry["client_id"]
+    if db.query(Order.id).filter(Order.client_id == client_id).first():
+        return
+    sold_at = datetime.fromisoformat(entry["sold_at"])
+    try:
+        order = add_order(
+            db,
+            entry["user_id"],
+            CounterOrderCreate.model_validate(entry["order"]),
+            created_at=sold_at,
+            ip_address=entry.get("ip_address"),
+            client_id=client_id,
+        )
+        db.flush()
+        # Horário lotado: CapacityExceeded manda a entrada para o arquivo de rejeitadas
+        capacity.reserve_order(db, order, sold_at)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not db.query(Order.id).filter(Order.client_id == client_id).first():
+            raise
+    except Exception:
+        db.rollback()
+        raise
+
+
+class JournalReplayer:
+    """Background thread that drains the journal whenever it has entries"""
+
+    def __init__(self, journal: SaleJournal, session_factory, interval: float):
+        self.journal = journal
+        self.session_factory = session_factory
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="journal-replayer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def drain(self) -> int:
+        """Replay pending entries once (also used directly by tests/CLI)"""
+        db = self.session_factory()
+        try:
+            return self.journal.replay(lambda entry: apply_entry(db, entry))
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.journal.depth() > 0:
+                try:
+                    self.drain()
+                except Exception as e:  # nunca deixa a thread morrer
+                    self.journal.last_error = str(e)
+                    logger.exception("Journal replay failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+_journal: Optional[SaleJournal] = None
+_replayer: Optional[JournalReplayer] = None
+
+
+def get_journal() -> SaleJournal:
+    """Process-wide journal configured from settings"""
+    global _journal
+    if _journal is None:
+        _journal = SaleJournal(get_settings().journal_path)
+    return _journal
+
+
+def get_replayer() -> JournalReplayer:
+    """Process-wide replayer bound to the application session factory"""
+    global _replayer
+    if _replayer is None:
+        from ..db import SessionLocal
+        _replayer = JournalReplayer(get_journal(), SessionLocal, get_settings().journal_replay_interval)
+    return _replayer
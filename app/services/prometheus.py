@@ -0,0 +1,104 @@
+"""
+Prometheus text exposition format
+
+:class:`Exposition` writes metric families in the text format (version
+0.0.4) scraped by Prometheus and compatible agents; :class:`Histogram` is
+a thread-safe labelled histogram for code that runs outside the event loop
+(export job workers). Values are only read when ``/metrics`` is scraped,
+so nothing here is on the request path.
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Dict[str, str]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Optional[Labels]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(value)
+
+
+class Exposition:
+    """Builds one scrape response, family by family"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _family(self, name: str, kind: str, doc: str) -> None:
+        doc = doc.replace("\\", "\\\\").replace("\n", "\\n")
+        self._lines.append(f"# HELP {name} {doc}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def _sample(self, name: str, labels: Optional[Labels], value: float) -> None:
+        self._lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def gauge(self, name: str, doc: str, samples: Iterable[Tuple[Optional[Labels], float]]) -> None:
+        self._family(name, "gauge", doc)
+        for labels, value in samples:
+            self._sample(name, labels, value)
+
+    def counter(self, name: str, doc: str, samples: Iterable[Tuple[Optional[Labels], float]]) -> None:
+        """``name`` without the ``_total`` suffix, which is added to each sample"""
+        self._family(name, "counter", doc)
+        for labels, value in samples:
+            self._sample(f"{name}_total", labels, value)
+
+    def histogram(self, name: str, doc: str, bounds: Sequence[float],
+                  series: Iterable[Tuple[Optional[Labels], Sequence[int], float, int]]) -> None:
+        """``series`` holds ``(labels, per-bucket counts with +Inf last, sum, count)``"""
+        self._family(name, "histogram", doc)
+        for labels, bucket_counts, total, count in series:
+            running = 0
+            for bound, n in zip(list(bounds) + [math.inf], bucket_counts):
+                running += n
+                self._sample(f"{name}_bucket", dict(labels or {}, le=_number(float(bound))), running)
+            self._sample(f"{name}_sum", labels, total)
+            self._sample(f"{name}_count", labels, count)
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+class Histogram:
+    """Labelled histogram with fixed bucket bounds, safe to observe from any thread"""
+
+    def __init__(self, label_names: Sequence[str], buckets: Sequence[float]):
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # valores dos rótulos -> [contagens por bucket (+Inf por último), soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def series(self) -> List[Tuple[Labels, List[int], float, int]]:
+        """Copy of every series, in the shape :meth:`Exposition.histogram` takes"""
+        with self._lock:
+            return [(dict(zip(self.label_names, values)), list(counts), total, count)
+                    for values, (counts, total, count) in sorted(self._series.items())]
@@ -0,0 +1,304 @@
+"""
+Query plan capture for the hot report queries
+
+Every query the dashboard, the report routes and the admin lists run on
+each request is registered in ``HOT_QUERIES`` with the same shape the
+route builds (the service builders are called directly). The tool runs
+them with representative parameters against a database, captures the plan
+(``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN (ANALYZE, FORMAT JSON)`` on
+PostgreSQL) and the best of a few timed executions, and lists the tables
+read by a full scan.
+
+A baseline of the captured plans is kept per dialect in a JSON file; a
+query that scans a table its baseline did not is reported as a
+regression and the command exits with status 1::
+
+    python -m app.services.query_plans --seed 50000            # fresh SQLite with synthetic data
+    python -m app.services.query_plans --database-url postgresql://...
+    python -m app.services.query_plans --seed 50000 --update-baseline
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, desc, func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..db import Base
+from ..models import Group, GroupVisit, Order, OrderItem, User
+from . import business_date
+from .cube import compile_cube, parse_cube_query
+from .reports import bordero_pivot, per_day_query
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "query_plans.json")
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+@dataclass(frozen=True)
+class PlanParams:
+    """Representative parameters: the last 30 days and their last day"""
+    start_dt: date
+    end_dt: date
+
+    @classmethod
+    def last_days(cls, days: int = 30, end_dt: Optional[date] = None) -> "PlanParams":
+        end_dt = end_dt or business_date.today()
+        return cls(end_dt - timedelta(days=days - 1), end_dt)
+
+
+def _in_period(p: PlanParams):
+    return (Order.business_date >= p.start_dt, Order.business_date <= p.end_dt, Order.deleted_at.is_(None))
+
+
+def _by_order_column(column):
+    def build(db: Session, p: PlanParams):
+        return (select(column, func.sum(OrderItem.qty), func.sum(OrderItem.qty * OrderItem.unit_price_cents))
+                .select_from(Order)
+                .join(OrderItem, OrderItem.order_id == Order.id)
+                .where(*_in_period(p))
+                .group_by(column))
+    return build
+
+
+# nome -> construtor da consulta, no mesmo formato que a rota monta
+HOT_QUERIES: Dict[str, Callable[[Session, PlanParams], object]] = {
+    "dashboard.tickets_today": lambda db, p: (
+        select(func.sum(OrderItem.qty)).select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.business_date == p.end_dt, Order.deleted_at.is_(None))),
+    "dashboard.summary": lambda db, p: (
+        select(Order.business_date, func.sum(OrderItem.qty), func.sum(OrderItem.qty * OrderItem.unit_price_cents))
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.deleted_at.is_(None))
+        .group_by(Order.business_date).order_by(desc(Order.business_date)).limit(30)),
+    "reports.by_state": _by_order_column(Order.state),
+    "reports.by_payment_method": _by_order_column(Order.payment_method),
+    "reports.by_discount_reason": lambda db, p: (
+        _by_order_column(OrderItem.discount_reason)(db, p).where(OrderItem.discount_reason.isnot(None))),
+    "reports.bordero": lambda db, p: bordero_pivot(p.start_dt, p.end_dt),
+    "reports.per_day": lambda db, p: per_day_query(db, p.start_dt, p.end_dt),
+    "reports.cube": lambda db, p: compile_cube(
+        parse_cube_query("week,payment_method", "people,revenue", p.start_dt, p.end_dt),
+        db.get_bind().dialect.name),
+    "reports.groups_kpis": lambda db, p: (
+        select(func.count(GroupVisit.id), func.sum(GroupVisit.size), func.count(func.distinct(GroupVisit.business_date)))
+        .where(GroupVisit.business_date >= p.start_dt)),
+    "admin.orders": lambda db, p: (
+        select(Order).where(*_in_period(p)).order_by(desc(Order.created_at)).limit(20)),
+    "admin.groups": lambda db, p: (
+        select(Group).join(Order, Order.id == Group.order_id)
+        .where(*_in_period(p)).order_by(desc(Order.created_at)).limit(20)),
+}
+
+
+@dataclass
+class QueryPlan:
+    name: str
+    plan: List[str]
+    full_scans: List[str]
+    elapsed_ms: float
+    regressions: List[str] = field(default_factory=list)
+
+
+def _sql(db: Session, stmt) -> str:
+    # Parâmetros embutidos: o EXPLAIN roda como texto puro no driver
+    return str(stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _pg_lines(node: Dict, depth: int, lines: List[str], scans: List[str]) -> None:
+    relation = node.get("Relation Name")
+    label = node["Node Type"] + (f" on {relation}" if relation else "")
+    if node.get("Index Name"):
+        label += f" using {node['Index Name']}"
+    if "Actual Total Time" in node:
+        label += f" (actual {node['Actual Total Time']:.2f} ms, rows {node.get('Actual Rows')})"
+    lines.append("  " * depth + label)
+    if node["Node Type"] == "Seq Scan" and relation:
+        scans.append(relation)
+    for child in node.get("Plans", []):
+        _pg_lines(child, depth + 1, lines, scans)
+
+
+def explain(db: Session, stmt) -> tuple:
+    """``(plan lines, tables read by a full scan)`` of a statement"""
+    sql = _sql(db, stmt)
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        document = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}").scalar()
+        if isinstance(document, str):
+            document = json.loads(document)
+        lines: List[str] = []
+        scans: List[str] = []
+        _pg_lines(document[0]["Plan"], 0, lines, scans)
+        lines.append(f"Execution Time: {document[0].get('Execution Time', 0):.2f} ms")
+        return lines, sorted(set(scans))
+
+    tables = set(Base.metadata.tables)
+    lines, scans = [], []
+    depth = {0: -1}
+    for node_id, parent, _unused, detail in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+        match = _SQLITE_SCAN.match(detail)
+        # "SCAN t USING INDEX" percorre um índice; CTEs e subconsultas não são tabelas
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return lines, sorted(set(scans))
+
+
+def _best_ms(db: Session, stmt, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.execute(stmt).all()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 2)
+
+
+def capture(db: Session, params: Optional[PlanParams] = None, repeat: int = 3,
+            names: Optional[List[str]] = None) -> List[QueryPlan]:
+    """Plan and timing of every registered query (or of ``names``)"""
+    params = params or PlanParams.last_days()
+    plans = []
+    for name in names or list(HOT_QUERIES):
+        stmt = HOT_QUERIES[name](db, params)
+        lines, scans = explain(db, stmt)
+        plans.append(QueryPlan(name, lines, scans, _best_ms(db, stmt, repeat)))
+    return plans
+
+
+def compare(plans: List[QueryPlan], baseline: Dict[str, Dict]) -> List[QueryPlan]:
+    """Mark full scans that the baseline of each query did not have; returns the regressed plans"""
+    regressed = []
+    for plan in plans:
+        known = baseline.get(plan.name)
+        if known is None:
+            continue
+        plan.regressions = sorted(set(plan.full_scans) - set(known.get("full_scans", [])))
+        if plan.regressions:
+            regressed.append(plan)
+    return regressed
+
+
+def load_baseline(path: str, dialect: str) -> Dict[str, Dict]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh).get(dialect, {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path: str, dialect: str, plans: List[QueryPlan]) -> None:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            document = json.load(fh)
+    except FileNotFoundError:
+        document = {}
+    document[dialect] = {p.name: {"full_scans": p.full_scans, "plan": p.plan, "elapsed_ms": p.elapsed_ms}
+                         for p in plans}
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2, ensure_ascii=False, sort_keys=True)
+        fh.write("\n")
+
+
+def seed(session_factory, orders: int, end_dt: date, days: int = 365, rng_seed: int = 1) -> None:
+    """Fill an empty database with synthetic orders, items, groups and group visits"""
+    rng = random.Random(rng_seed)
+    first = datetime.combine(end_dt - timedelta(days=days - 1), dt_time(12))
+    with session_factory() as db:
+        db.add(User(id=1, username="plans", password_hash="x", role="admin"))
+        db.flush()
+        for offset in range(1, orders + 1, 10_000):
+            ids = range(offset, min(orders + 1, offset + 10_000))
+            db.execute(insert(Order), [
+                {"id": n, "user_id": 1, "payment_method": rng.choice(["pix", "credito", "debito", "dinheiro"]),
+                 "channel": "grupo" if n % 50 == 0 else "balcao", "state": rng.choice(["PE", "PE", "BA", "SP", None]),
+                 "created_at": first + timedelta(minutes=rng.randrange(days * 24 * 60) - 12 * 60)}
+                for n in ids
+            ])
+            db.execute(insert(OrderItem), [
+                {"order_id": n, "ticket_type": tt, "qty": rng.randint(1, 4),
+                 "unit_price_cents": 0 if tt == "gratuita" else 1000,
+                 "discount_reason": rng.choice([None, None, "estudante", "professor", "DG"])}
+                for n in ids for tt in rng.sample(["inteira", "meia", "gratuita"], rng.randint(1, 2))
+            ])
+            db.execute(insert(Group), [
+                {"order_id": n, "visit_type": "agendada", "has_oficio": False, "state": "PE"}
+                for n in ids if n % 50 == 0
+            ])
+        db.execute(insert(GroupVisit), [
+            {"date": first + timedelta(days=rng.randrange(days)), "size": rng.randint(10, 40), "state": "PE"}
+            for _ in range(max(1, orders // 50))
+        ])
+        db.commit()
+
+
+def _report(plans: List[QueryPlan], baseline: Dict[str, Dict]) -> None:
+    for plan in plans:
+        known = baseline.get(plan.name)
+        status = "REGRESSION" if plan.regressions else ("new" if known is None else "ok")
+        trend = f"  (baseline {known['elapsed_ms']:.2f} ms)" if known else ""
+        print(f"{plan.name:<28} {plan.elapsed_ms:9.2f} ms  {status}{trend}")
+        if plan.regressions:
+            print(f"    full scan of {', '.join(plan.regressions)} (baseline: {known.get('full_scans') or 'none'})")
+        for line in plan.plan:
+            print(f"    | {line}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Capture the plans of the hot report queries and compare them "
+                                                 "with a baseline")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--database-url", help="database to attach to (default: DATABASE_URL)")
+    source.add_argument("--seed", type=int, metavar="ORDERS", help="run on a fresh SQLite database with this many "
+                                                                  "synthetic orders")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON (default: %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the captured plans as the baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="timed executions per query (best is kept)")
+    parser.add_argument("--days", type=int, default=30, help="length of the report period")
+    parser.add_argument("--end", help="last day of the report period (YYYY-MM-DD, default: today)")
+    parser.add_argument("--query", action="append", choices=sorted(HOT_QUERIES), help="only these queries")
+    args = parser.parse_args(argv)
+
+    end_dt = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else business_date.today()
+    params = PlanParams.last_days(args.days, end_dt)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.seed is not None:
+            engine = create_engine(f"sqlite:///{workdir}/plans.db")
+            Base.metadata.create_all(bind=engine)
+            seed(sessionmaker(bind=engine), args.seed, end_dt)
+        else:
+            from ..config import get_settings
+            engine = create_engine(args.database_url or get_settings().database_url)
+        dialect = engine.dialect.name
+        try:
+            with sessionmaker(bind=engine)() as db:
+                plans = capture(db, params, args.repeat, args.query)
+        finally:
+            engine.dispose()
+
+    baseline = load_baseline(args.baseline, dialect)
+    regressed = compare(plans, baseline)
+    _report(plans, baseline)
+    if args.update_baseline:
+        save_baseline(args.baseline, dialect, plans)
+        print(f"baseline for {dialect} written to {args.baseline}")
+        return 0
+    if regressed:
+        print(f"{len(regressed)} of {len(plans)} queries regressed to a full scan", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+SQL statements issued by each request
+
+:func:`instrument_engine` hooks ``before_cursor_execute`` and
+``after_cursor_execute`` on an engine. While a request is being served,
+:class:`~app.middleware.QueryStatsMiddleware` keeps a :class:`RequestQueries`
+in a context variable; every statement executed in that context (also from
+the thread pool, which copies the context) adds to its count, total time
+and slowest statement. Outside a request the hooks do nothing.
+
+The same SQL text executed ``N_PLUS_ONE_THRESHOLD`` times or more within
+one request is reported as a probable N+1: a lazy-loaded relationship
+issues one identical ``SELECT ... WHERE id = ?`` per parent row.
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_current: ContextVar[Optional["RequestQueries"]] = ContextVar("request_queries", default=None)
+
+
+class RequestQueries:
+    """Statement count, total time, slowest statement and repeats of one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest: Optional[str] = None
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest = statement
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements executed at least ``threshold`` times, most repeated first"""
+        if threshold <= 0:
+            return []
+        return sorted(((sql, n) for sql, n in self.statements.items() if n >= threshold),
+                      key=lambda item: item[1], reverse=True)
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value"""
+        return (f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} queries", '
+                f'db-slowest;dur={self.slowest_seconds * 1000:.2f}')
+
+    def summary(self, threshold: int) -> Dict:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.total_seconds * 1000, 2),
+            "slowest_ms": round(self.slowest_seconds * 1000, 2),
+            "slowest": _shorten(self.slowest),
+            "repeated": [{"sql": _shorten(sql), "count": n} for sql, n in self.repeated(threshold)],
+        }
+
+
+def _shorten(statement: Optional[str], limit: int = 300) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def begin_request() -> Tuple[RequestQueries, object]:
+    """Start collecting for the current context; returns the collector and the token for :func:`end_request`"""
+    queries = RequestQueries()
+    return queries, _current.set(queries)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def current_queries() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = getattr(context, "_query_started", None)
+    if queries is not None and started is not None:
+        queries.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attribute the statements executed on ``engine`` to the current request"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,174 @@
+"""
+Process pool for workbook rendering
+
+Rendering a workbook with openpyxl is CPU-bound pure Python: done inside a
+request it holds the GIL and stalls every other terminal served by the
+same worker. Rendering is handed to a ``ProcessPoolExecutor`` whose
+workers import pandas and openpyxl and load the borderô template once when
+they start, so a render never pays for those. Only the compact aggregated rows are sent to the
+worker and the finished file comes back as bytes.
+
+With ``RENDER_POOL_WORKERS=0`` renders run in the thread pool instead
+(tests, single-core hosts).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPoolFull(Exception):
+    """Raised when running plus waiting renders reached the configured limit"""
+
+
+def _warm_worker() -> None:
+    """Worker initializer: pay the heavy imports, the template load and the DB engine once per process"""
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+    from .reports import bordero_template
+    bordero_template()
+    from .bordero_batch import init_worker_engine
+    init_worker_engine()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderPool:
+    """Bounded pool of pre-warmed rendering processes"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = max(0, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def limit(self) -> int:
+        """Renders admitted at once: one per worker plus the waiting queue"""
+        return max(1, self.workers) + self.queue_limit
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: o processo pai tem threads (replayer, pool de jobs) e fork não é seguro
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """Spawn and warm every worker now instead of on the first export"""
+        if not self.workers:
+            return
+        executor = self._ensure_executor()
+        for _ in range(self.workers):
+            executor.submit(_ping)
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.limit:
+                self._rejected += 1
+                raise RenderPoolFull(f"{self._pending} renders already running or waiting")
+            self._pending += 1
+
+    def _done(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def _reset_broken(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        logger.error("Render worker died; the pool will be recreated")
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Render ``fn(*args)`` off the event loop; raises RenderPoolFull when saturated"""
+        self._admit()
+        try:
+            if not self.workers:
+                return await run_in_threadpool(fn, *args)
+            executor = self._ensure_executor()
+            try:
+                return await asyncio.wrap_future(executor.submit(fn, *args))
+            except BrokenProcessPool:
+                self._reset_broken(executor)
+                raise
+        finally:
+            self._done()
+
+    def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Blocking variant of :meth:`run` for worker threads (export jobs, CLI)"""
+        self._admit()
+        try:
+            if not self.workers:
+                return fn(*args)
+            executor = self._ensure_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                self._reset_broken(executor)
+                raise
+        finally:
+            self._done()
+
+    def map(self, fn: Callable[..., Any], arg_tuples: Sequence[Tuple]) -> List[Any]:
+        """Blocking ``[fn(*args) for args in arg_tuples]`` spread over all workers, admitted as one render"""
+        self._admit()
+        try:
+            if not self.workers:
+                return [fn(*args) for args in arg_tuples]
+            executor = self._ensure_executor()
+            try:
+                futures = [executor.submit(fn, *args) for args in arg_tuples]
+                return [future.result() for future in futures]
+            except BrokenProcessPool:
+                self._reset_broken(executor)
+                raise
+        finally:
+            self._done()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "limit": self.limit,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+_pool: Optional[RenderPool] = None
+
+
+def get_render_pool() -> RenderPool:
+    """Process-wide render pool configured from settings"""
+    global _pool
+    if _pool is None:
+        settings = get_settings()
+        _pool = RenderPool(settings.render_pool_workers, settings.render_pool_queue_limit)
+    return _pool
@@ -0,0 +1,441 @@
+"""
+Report builders shared by the HTTP routes and background export jobs
+
+Everything here takes a database session and plain dates, so the same
+aggregation and rendering code runs inside a request or in a worker.
+openpyxl, pandas and NumPy are imported by the functions that use them,
+keeping them out of the application's import time.
+"""
+import threading
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from sqlalchemy import func, and_, case, select, literal, null, text, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import Order, OrderItem, Sale
+from .bucketing import (
+    PAYMENT_BUCKETS, GRATUITY_BUCKETS, pm_bucket_sql, in_grat_bucket_sql, pm_bucket_array, grat_bucket_array
+)
+from .xlsx_stream import Sheet
+
+def money(cents): return round((cents or 0)/100, 2)
+
+def to_date(d):
+    if isinstance(d, date):        # inclui datetime.date
+        return d
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, str):
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
+            try:
+                return datetime.strptime(d, fmt).date()
+            except ValueError:
+                pass
+    return None
+
+# Modelo oficial do borderô (borderô.xlsx): cabeçalho até a linha 14, seis
+# linhas de dados de exemplo (15-20) e rodapé com totais e assinaturas (21-26)
+BORDERO_FIRST_ROW = 15
+_TEMPLATE_DATA_ROWS = 6
+_TEMPLATE_FOOTER = (21, 26)
+_TEMPLATE_LAST_COL = 17  # Q
+
+
+def bordero_styles() -> tuple:
+    """Named styles registered once in the template and shared by every data cell"""
+    from openpyxl.styles import Font, Alignment, Border, Side, NamedStyle
+
+    thin = Side(style="thin")
+    box = Border(top=thin, left=thin, right=thin, bottom=thin)
+    font = Font(name="Arial", size=10)
+    return (
+        NamedStyle("bordero_dia", font=font, border=box, number_format="dd.mm",
+                   alignment=Alignment(horizontal="center")),
+        NamedStyle("bordero_qtd", font=font, border=box, number_format="#,##0",
+                   alignment=Alignment(horizontal="center")),
+        NamedStyle("bordero_valor", font=font, border=box, number_format='"R$"#,##0.00',
+                   alignment=Alignment(horizontal="right")),
+    )
+
+# (campo, estilo) das colunas B..Q de cada linha de dados
+_BORDERO_COLUMNS = (
+    ("date", "bordero_dia"),
+    ("qtd_int_cash", "bordero_qtd"), ("qtd_int_pix", "bordero_qtd"), ("qtd_int_cc", "bordero_qtd"),
+    ("qtd_meia_cash", "bordero_qtd"), ("qtd_meia_pix", "bordero_qtd"), ("qtd_meia_cc", "bordero_qtd"),
+    ("g_DG", "bordero_qtd"), ("g_GPD", "bordero_qtd"), ("g_TG", "bordero_qtd"),
+    ("rec_cash", "bordero_valor"), ("rec_pix", "bordero_valor"), ("rec_cc", "bordero_valor"),
+    ("receita", "bordero_valor"),
+    ("pagantes", "bordero_qtd"), ("publico_total", "bordero_qtd"),
+)
+
+_template_lock = threading.Lock()
+_template_cache: Dict[str, bytes] = {}
+
+
+def _prepare_template(path: str) -> bytes:
+    """Strip the sample rows from the official template and register the shared styles"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    ws = wb.active
+    ws.title = "borderô"
+    ws.unmerge_cells("C15:H15")  # "DIA DA GRATUIDADE" do exemplo
+    last = BORDERO_FIRST_ROW + _TEMPLATE_DATA_ROWS - 1
+    for row in ws.iter_rows(min_row=BORDERO_FIRST_ROW, max_row=last, min_col=2, max_col=_TEMPLATE_LAST_COL):
+        for cell in row:
+            cell.value = None
+    for style in bordero_styles():
+        wb.add_named_style(style)
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def bordero_template() -> bytes:
+    """Prepared borderô template, read and cleaned once per process"""
+    path = get_settings().bordero_template
+    with _template_lock:
+        if path not in _template_cache:
+            _template_cache[path] = _prepare_template(path)
+        return _template_cache[path]
+
+
+def _resize_data_area(ws, rows: int) -> None:
+    """Move the footer so the data area holds ``rows`` lines, keeping its merges and heights"""
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.cell_range import CellRange
+    from openpyxl.worksheet.merge import MergedCellRange
+
+    shift = rows - _TEMPLATE_DATA_ROWS
+    first, last = _TEMPLATE_FOOTER
+    last_data = BORDERO_FIRST_ROW + rows - 1
+
+    ws.unmerge_cells(f"A12:A{BORDERO_FIRST_ROW + _TEMPLATE_DATA_ROWS - 1}")
+    if shift:
+        footer = [str(mr) for mr in ws.merged_cells.ranges if mr.min_row >= first]
+        for ref in footer:
+            ws.unmerge_cells(ref)
+        heights = {r: ws.row_dimensions[r].height for r in range(first, last + 1)}
+        ws.move_range(f"A{first}:{get_column_letter(_TEMPLATE_LAST_COL)}{last}", rows=shift)
+        for r in range(BORDERO_FIRST_ROW, max(last, last + shift) + 1):
+            ws.row_dimensions[r].height = None
+        for r, height in heights.items():
+            ws.row_dimensions[r + shift].height = height
+        for ref in footer:
+            cells = CellRange(ref)
+            cells.shift(row_shift=shift)
+            ws.merge_cells(cells.coord)
+    # O rótulo vertical do período cobre todas as linhas de dados; mesclar pela API
+    # reformataria cada célula da faixa, o que domina o tempo em períodos longos
+    ws.merged_cells.add(MergedCellRange(ws, f"A12:A{last_data}"))
+
+
+def write_bordero(ws, start_dt, end_dt, valores_ingresso, linhas):
+    """
+    Fill the prepared template sheet: header texts, one row per day and the totals.
+
+    valores_ingresso = {'inteira': 10.00, 'meia': 5.00}
+    linhas = lista de dicts por dia já agregados
+    """
+    from openpyxl.utils import get_column_letter
+
+    ws["A5"] = f"BILHETERIA CAIS DO SERTÃO – DETALHAMENTO DA MOVIMENTAÇÃO Nº        / {end_dt.year} - GCS"
+    ws["B8"] = valores_ingresso["inteira"]
+    ws["B9"] = valores_ingresso["meia"]
+    ws["A12"] = f"ADM EMPETUR - PERÍODO DE {start_dt:%d.%m} A {end_dt:%d.%m.%Y}"
+
+    rows = max(len(linhas), 1)
+    _resize_data_area(ws, rows)
+
+    # Linhas de dados: só valor e estilo nomeado
+    r = BORDERO_FIRST_ROW
+    for linha in linhas:
+        values = dict(linha, date=to_date(linha["date"]) or str(linha["date"] or ""),
+                      receita=linha["rec_cash"] + linha["rec_pix"] + linha["rec_cc"])
+        for col, (field, style) in enumerate(_BORDERO_COLUMNS, start=2):
+            value = values[field]
+            if style == "bordero_valor":
+                value = money(value)
+            elif style == "bordero_qtd":
+                value = int(value)
+            cell = ws.cell(row=r, column=col, value=value)
+            cell.style = style
+        r += 1
+    if not linhas:
+        for col, (_, style) in enumerate(_BORDERO_COLUMNS, start=2):
+            ws.cell(row=r, column=col).style = style
+
+    # Totais do período (o rodapé do modelo já traz os estilos)
+    last_data = BORDERO_FIRST_ROW + rows - 1
+    totals = last_data + 1
+    for col in range(3, _TEMPLATE_LAST_COL + 1):
+        letter = get_column_letter(col)
+        ws.cell(row=totals, column=col, value=f"=SUM({letter}{BORDERO_FIRST_ROW}:{letter}{last_data})")
+    ws.cell(row=totals + 1, column=3, value=f"=SUM(C{totals}:E{totals})")
+    ws.cell(row=totals + 1, column=6, value=f"=SUM(F{totals}:H{totals})")
+    ws.cell(row=totals + 1, column=9, value=f"=SUM(I{totals}:K{totals})")
+
+
+# Colunas do borderô somadas por dia: (campo, gratuito?, tipo, bucket de pagamento, bucket de gratuidade, medida).
+# None = qualquer valor. Itens com preço zero são gratuidades, os demais são pagantes.
+# bordero_pivot aplica as mesmas regras em SQL; os testes comparam os dois caminhos.
+BORDERO_MEASURES = (
+    ("qtd_int_cash", False, "inteira", "cash", None, "qty"),
+    ("qtd_int_pix", False, "inteira", "pix", None, "qty"),
+    ("qtd_int_cc", False, "inteira", "cc", None, "qty"),
+    ("qtd_meia_cash", False, "meia", "cash", None, "qty"),
+    ("qtd_meia_pix", False, "meia", "pix", None, "qty"),
+    ("qtd_meia_cc", False, "meia", "cc", None, "qty"),
+    ("g_DG", True, None, None, "DG", "qty"),
+    ("g_GPD", True, None, None, "GPD", "qty"),
+    ("g_TG", True, None, None, "TG", "qty"),
+    ("rec_cash", False, None, "cash", None, "cents"),
+    ("rec_pix", False, None, "pix", None, "cents"),
+    ("rec_cc", False, None, "cc", None, "cents"),
+)
+_PAYING = tuple(m[0] for m in BORDERO_MEASURES if m[0].startswith("qtd_"))
+_FREE = tuple(m[0] for m in BORDERO_MEASURES if m[0].startswith("g_"))
+
+
+def bordero_pivot(start_dt: date, end_dt: date):
+    """One row per day with every borderô column, bucketed and summed by the database"""
+    # Primeiro agrupa por dia, tipo e forma de pagamento brutos (poucas combinações
+    # por dia), já separando pagantes e gratuidades; depois aplica o bucket de
+    # pagamento e pivota, de modo que esse CASE roda por grupo e não por item
+    day = Order.business_date
+    tt = func.lower(OrderItem.ticket_type)
+    free = OrderItem.unit_price_cents == 0
+
+    def item_sum(cond):
+        return func.sum(case((cond, OrderItem.qty), else_=0))
+
+    grouped = (select(
+                   day.label("d"), tt.label("tt"), Order.payment_method,
+                   item_sum(~free).label("qty"),
+                   func.sum(OrderItem.qty * OrderItem.unit_price_cents).label("cents"),
+                   item_sum(free).label("free_qty"),
+                   *(item_sum(and_(free, in_grat_bucket_sql(OrderItem.discount_reason, bucket)))
+                     .label(f"g_{bucket}") for bucket in GRATUITY_BUCKETS[:-1]))
+               .join(OrderItem, OrderItem.order_id == Order.id)
+               .where(Order.deleted_at.is_(None),
+                      Order.business_date >= start_dt,
+                      Order.business_date <= end_dt)
+               .group_by(day, tt, Order.payment_method)
+               .subquery())
+    pm = pm_bucket_sql(grouped.c.payment_method)
+
+    def total(expr):
+        return func.coalesce(func.sum(expr), 0)
+
+    sums = {}
+    for kind, prefix in (("inteira", "qtd_int"), ("meia", "qtd_meia")):
+        for bucket in PAYMENT_BUCKETS:
+            sums[f"{prefix}_{bucket}"] = total(case((and_(grouped.c.tt == kind, pm == bucket), grouped.c.qty), else_=0))
+    for bucket in GRATUITY_BUCKETS[:-1]:
+        sums[f"g_{bucket}"] = total(grouped.c[f"g_{bucket}"])
+    # TG é o bucket padrão: o que sobra das gratuidades
+    sums["g_TG"] = total(grouped.c.free_qty) - sums["g_DG"] - sums["g_GPD"]
+    for bucket in PAYMENT_BUCKETS:
+        sums[f"rec_{bucket}"] = total(case((pm == bucket, grouped.c.cents), else_=0))
+
+    pagantes = total(case((grouped.c.tt.in_(("inteira", "meia")), grouped.c.qty), else_=0))
+    publico = pagantes + total(grouped.c.free_qty)
+    return (select(grouped.c.d, *(expr.label(field) for field, expr in sums.items()),
+                   pagantes.label("pagantes"), publico.label("publico_total"))
+            .group_by(grouped.c.d)
+            .order_by(grouped.c.d))
+
+
+def pivot_bordero_frame(df) -> List[Dict]:
+    """
+    Vectorized borderô pivot of item rows held in a pandas DataFrame.
+
+    Expects the columns ``d``, ``ticket_type``, ``payment_method``,
+    ``discount_reason``, ``qty`` and ``unit_price_cents``; applies the same
+    rules as :func:`bordero_pivot`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if df.empty:
+        return []
+    qty = df["qty"].fillna(0).to_numpy(dtype=np.int64)
+    price = df["unit_price_cents"].fillna(0).to_numpy(dtype=np.int64)
+    values = {"qty": qty, "cents": qty * price}
+    masks = {
+        "free": price == 0,
+        "tt": np.char.lower(df["ticket_type"].fillna("").to_numpy(dtype=str)),
+        "pm": pm_bucket_array(df["payment_method"]),
+        "grat": grat_bucket_array(df["discount_reason"]),
+    }
+
+    columns = {}
+    for field, free, tt, pm, grat, measure in BORDERO_MEASURES:
+        mask = masks["free"] == free
+        if tt:
+            mask &= masks["tt"] == tt
+        if pm:
+            mask &= masks["pm"] == pm
+        if grat:
+            mask &= masks["grat"] == grat
+        columns[field] = np.where(mask, values[measure], 0)
+
+    frame = pd.DataFrame(columns)
+    frame["date"] = df["d"].map(to_date).to_numpy()
+    daily = frame.groupby("date", sort=True).sum()
+    daily["pagantes"] = daily[list(_PAYING)].sum(axis=1)
+    daily["publico_total"] = daily["pagantes"] + daily[list(_FREE)].sum(axis=1)
+    return [{"date": day, **{k: int(v) for k, v in row.items()}} for day, row in daily.iterrows()]
+
+
+def _archived_bordero_lines(db: Session, start_dt: date, end_dt: date, skip_days) -> List[Dict]:
+    """Borderô rows for days that only exist in the legacy ``sales`` table"""
+    import pandas as pd
+
+    rows = (db.query(func.date(Sale.sold_at).label("d"), Sale.ticket_type, Sale.payment_method,
+                     Sale.qty, Sale.unit_price_cents)
+              .filter(Sale.sold_at >= start_dt, Sale.sold_at < (end_dt + timedelta(days=1)))
+              .all())
+    if not rows:
+        return []
+    df = pd.DataFrame(rows, columns=["d", "ticket_type", "payment_method", "qty", "unit_price_cents"])
+    df["d"] = df["d"].map(to_date)
+    df = df[~df["d"].isin(skip_days)]
+    # A tabela antiga não guarda motivo de gratuidade: tudo vai para TG
+    df["discount_reason"] = None
+    return pivot_bordero_frame(df)
+
+
+def bordero_lines(db: Session, start_dt: date, end_dt: date) -> List[Dict]:
+    """Per-day borderô rows (quantities by ticket type and payment, gratuities, revenue)"""
+    linhas = [dict(row._mapping, date=to_date(row.d)) for row in db.execute(bordero_pivot(start_dt, end_dt))]
+    for linha in linhas:
+        del linha["d"]
+
+    # Dias anteriores à migração só existem na tabela legada
+    archived = _archived_bordero_lines(db, start_dt, end_dt, {linha["date"] for linha in linhas})
+    if archived:
+        linhas = sorted(linhas + archived, key=lambda linha: linha["date"])
+    return linhas
+
+
+def bordero_filename(start_dt: date, end_dt: date) -> str:
+    return f"Borderô_Cais_{start_dt}_{end_dt}.xlsx"
+
+
+def render_bordero(fileobj: BinaryIO, start_dt: date, end_dt: date, linhas: List[Dict]) -> None:
+    """Write the borderô workbook for the given rows into ``fileobj``"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(bordero_template()))
+    write_bordero(wb.active, start_dt, end_dt, {"inteira": 10.00, "meia": 5.00}, linhas)
+    wb.save(fileobj)
+
+
+# Ordem das colunas das linhas compactas enviadas ao processo de renderização
+BORDERO_FIELDS = (
+    "date", "qtd_int_cash", "qtd_int_pix", "qtd_int_cc", "qtd_meia_cash", "qtd_meia_pix", "qtd_meia_cc",
+    "g_DG", "g_GPD", "g_TG", "rec_cash", "rec_pix", "rec_cc", "pagantes", "publico_total",
+)
+
+
+def bordero_rows(linhas: List[Dict]) -> List[Tuple]:
+    """Borderô lines as plain tuples in ``BORDERO_FIELDS`` order (cheap to pickle)"""
+    return [tuple(linha[f] for f in BORDERO_FIELDS) for linha in linhas]
+
+
+def render_bordero_bytes(start_dt: date, end_dt: date, rows: List[Tuple]) -> bytes:
+    """Render the borderô from compact rows; runs in a render pool process"""
+    out = BytesIO()
+    render_bordero(out, start_dt, end_dt, [dict(zip(BORDERO_FIELDS, row)) for row in rows])
+    return out.getvalue()
+
+
+# Conjuntos de agrupamento do relatório por dia, na ordem das planilhas
+PER_DAY_SETS = ("total", "ticket_type", "payment_method")
+
+
+def per_day_query(db: Session, start_dt: date, end_dt: date):
+    """
+    Daily totals, per ticket type and per payment method in one statement.
+
+    Rows are ``(grouping_set, d, key, people, revenue)`` ordered by grouping set
+    (``PER_DAY_SETS`` index), day and key. PostgreSQL computes the three
+    aggregations with GROUPING SETS; elsewhere the join is grouped once at
+    the finest grain in a materialized CTE and rolled up with UNION ALL.
+    """
+    day = Order.business_date
+    filters = (
+        Order.business_date >= start_dt,
+        Order.business_date <= end_dt,
+        Order.deleted_at.is_(None),
+    )
+    people = func.sum(OrderItem.qty)
+    revenue = func.sum(OrderItem.qty * OrderItem.unit_price_cents)
+
+    if db.get_bind().dialect.name == "postgresql":
+        level = func.grouping(OrderItem.ticket_type, Order.payment_method)
+        grouping_set = case((level == 3, 0), (level == 1, 1), else_=2).label("grouping_set")
+        stmt = (select(grouping_set, day.label("d"),
+                       func.coalesce(OrderItem.ticket_type, Order.payment_method).label("key"),
+                       people.label("people"), revenue.label("revenue"))
+                .join(OrderItem, OrderItem.order_id == Order.id)
+                .where(*filters)
+                .group_by(func.grouping_sets(tuple_(day), tuple_(day, OrderItem.ticket_type),
+                                             tuple_(day, Order.payment_method))))
+        return stmt.order_by(text("1, 2, 3"))
+
+    base = (select(day.label("d"), OrderItem.ticket_type, Order.payment_method,
+                   people.label("people"), revenue.label("revenue"))
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(*filters)
+            .group_by(day, OrderItem.ticket_type, Order.payment_method)
+            .cte("per_day_base")
+            .prefix_with("MATERIALIZED"))
+    parts = []
+    for n, column in enumerate((None, base.c.ticket_type, base.c.payment_method)):
+        key = column if column is not None else null()
+        group_by = (base.c.d,) if column is None else (base.c.d, column)
+        parts.append(select(literal(n).label("grouping_set"), base.c.d, key.label("key"),
+                            func.sum(base.c.people).label("people"), func.sum(base.c.revenue).label("revenue"))
+                     .group_by(*group_by))
+    return union_all(*parts).order_by(text("1, 2, 3"))
+
+
+def _split_sets(rows: Iterator, count: int) -> List[Iterator]:
+    """Split rows ordered by grouping set into one lazy iterator per set"""
+    state = {"pending": None}
+
+    def rows_of(n):
+        while True:
+            row = state["pending"] if state["pending"] is not None else next(rows, None)
+            state["pending"] = None
+            if row is None:
+                return
+            if row.grouping_set != n:
+                state["pending"] = row  # pertence a uma planilha seguinte
+                return
+            yield row
+
+    return [rows_of(n) for n in range(count)]
+
+
+def per_day_sheets(db: Session, start_dt: date, end_dt: date) -> List[Sheet]:
+    """Daily totals, per ticket type and per payment method sheets from a single query"""
+    def rows():
+        # A consulta só roda no primeiro next(): numa resposta em stream, já fora do event loop
+        yield from db.execute(per_day_query(db, start_dt, end_dt).execution_options(yield_per=1000))
+
+    daily, by_type, by_payment = _split_sets(rows(), len(PER_DAY_SETS))
+    # As planilhas são consumidas em ordem pelo stream_xlsx, na mesma ordem do resultado
+    return [
+        ("Resumo_Diario", ["Data", "Pessoas", "Receita (R$)"],
+         ((to_date(r.d), r.people, money(r.revenue)) for r in daily)),
+        ("Por_Tipo", ["Data", "Tipo", "Quantidade"],
+         ((to_date(r.d), r.key, r.people) for r in by_type)),
+        ("Por_Pagamento", ["Data", "Forma de Pagamento", "Quantidade"],
+         ((to_date(r.d), r.key, r.people) for r in by_payment)),
+    ]
@@ -0,0 +1,112 @@
+"""
+Request latency metrics per route template
+
+:class:`~app.middleware.TimingMiddleware` records, for every
+``(method, route template)`` pair such as ``POST /orders/{order_id}/delete``,
+a latency histogram with fixed bucket bounds, the count of each response
+status and the number of requests in flight. The in-flight gauge of a
+route counts from the first request to it that has finished: until then
+the route's template is not known when a request arrives.
+
+Recording takes no lock: the middleware only runs on the event loop
+thread, so the counters are plain integers updated by one thread at a time.
+Readers take a snapshot on the same thread (the metrics routes are
+``async``), which also sees a consistent state.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Limites superiores dos buckets, em segundos (o último bucket é +Inf)
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RouteStats:
+    """Histogram, status counts and in-flight gauge of one route"""
+    __slots__ = ("method", "route", "bucket_counts", "sum", "count", "statuses", "in_flight")
+
+    def __init__(self, method: str, route: str, buckets: int):
+        self.method = method
+        self.route = route
+        self.bucket_counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+        self.in_flight = 0
+
+
+class RequestMetrics:
+    """Per-route request metrics, updated from the event loop thread only"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+
+    def _stats(self, method: str, route: str) -> RouteStats:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats(method, route, len(self.buckets))
+        return stats
+
+    def started(self, method: str, route: Optional[str]) -> Optional[RouteStats]:
+        """Count a request in flight; ``route`` is None until its template has been seen once"""
+        self.in_flight += 1
+        if route is None:
+            return None
+        stats = self._stats(method, route)
+        stats.in_flight += 1
+        return stats
+
+    def finished(self, in_flight: Optional[RouteStats], method: str, route: str, status: int,
+                 seconds: float) -> None:
+        self.in_flight -= 1
+        if in_flight is not None:
+            in_flight.in_flight -= 1
+        stats = self._stats(method, route)
+        stats.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+        stats.sum += seconds
+        stats.count += 1
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def quantile(self, stats: RouteStats, q: float) -> Optional[float]:
+        """Quantile estimated by linear interpolation inside its bucket"""
+        if not stats.count:
+            return None
+        rank = q * stats.count
+        seen = 0
+        for i, n in enumerate(stats.bucket_counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self) -> List[Dict]:
+        """Routes sorted by template, with cumulative buckets as in the Prometheus format"""
+        result = []
+        for (method, route), stats in sorted(self.routes.items(), key=lambda item: (item[0][1], item[0][0])):
+            cumulative, running = [], 0
+            for n in stats.bucket_counts:
+                running += n
+                cumulative.append(running)
+            result.append({
+                "method": method,
+                "route": route,
+                "count": stats.count,
+                "sum_seconds": round(stats.sum, 6),
+                "in_flight": stats.in_flight,
+                "statuses": {str(code): n for code, n in sorted(stats.statuses.items())},
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], cumulative)),
+                "p50_ms": _ms(self.quantile(stats, 0.5)),
+                "p95_ms": _ms(self.quantile(stats, 0.95)),
+                "p99_ms": _ms(self.quantile(stats, 0.99)),
+            })
+        return result
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,86 @@
+"""
+Live sales counters for ``/metrics``
+
+Tickets sold and revenue per payment method and ticket type are counted
+as orders are written, by the same kind of session hooks that keep the
+ticket index up to date: the counters never query the database, so a
+scrape costs nothing however many orders exist. They count what this
+process committed since it started; Prometheus ``rate()``/``increase()``
+handle restarts and the sum over workers gives the totals. Soft-deleted
+orders are counted separately and not subtracted (counters only grow).
+"""
+import threading
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models import Order, OrderItem
+
+
+class SalesCounters:
+    """Tickets, revenue and voided orders committed by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (forma de pagamento, tipo de ingresso) -> [ingressos, centavos]
+        self.sold: Dict[Tuple[str, str], List[int]] = {}
+        self.voided_orders = 0
+
+    def add(self, items: List[Tuple[str, str, int, int]], voided: int = 0) -> None:
+        """Count ``(payment_method, ticket_type, qty, cents)`` items and voided orders"""
+        with self._lock:
+            for payment_method, ticket_type, qty, cents in items:
+                counts = self.sold.setdefault((payment_method, ticket_type), [0, 0])
+                counts[0] += qty
+                counts[1] += cents
+            self.voided_orders += voided
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"sold": {key: tuple(counts) for key, counts in sorted(self.sold.items())},
+                    "voided_orders": self.voided_orders}
+
+
+sales_counters = SalesCounters()
+
+
+def _payment_method(session: Session, item: OrderItem, new_orders: Dict[int, str]) -> str:
+    if item.order_id in new_orders:
+        return new_orders[item.order_id]
+    # Itens adicionados depois de um flush do pedido (grupos): o pedido já está na sessão
+    order = session.identity_map.get(identity_key(Order, item.order_id))
+    return order.payment_method if order is not None else "unknown"
+
+
+# Como no índice de ingressos, os valores são capturados no flush e só contam após o commit
+@event.listens_for(Session, "after_flush")
+def _collect_sales(session, flush_context):
+    pending = session.info.setdefault("sales_counters", {"orders": {}, "items": [], "voided": set()})
+    new_items = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            pending["orders"][obj.id] = obj.payment_method
+        elif isinstance(obj, OrderItem):
+            new_items.append(obj)
+    for item in new_items:
+        pending["items"].append((_payment_method(session, item, pending["orders"]), item.ticket_type,
+                                 item.qty, item.qty * item.unit_price_cents))
+    for obj in session.dirty:
+        # Só conta quando deleted_at acabou de ser preenchido
+        if isinstance(obj, Order) and obj.deleted_at is not None \
+                and inspect(obj).attrs.deleted_at.history.added:
+            pending["voided"].add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_sales(session):
+    pending = session.info.pop("sales_counters", None)
+    if pending and (pending["items"] or pending["voided"]):
+        sales_counters.add(pending["items"], len(pending["voided"]))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_sales(session):
+    session.info.pop("sales_counters", None)
@@ -0,0 +1,137 @@
+"""
+Offline terminal sync: idempotent batch insert of queued sales
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Order
+from ..schemas import TerminalSale
+from . import capacity
+from .ingest import add_order
+
+# Tolerância para relógios de terminal adiantados
+MAX_CLOCK_SKEW = timedelta(minutes=10)
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalize a timestamp to naive UTC, the convention of server_default=now()"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def validate_sale(record: Any) -> Tuple[Optional[TerminalSale], Optional[List[str]]]:
+    """Validate one queued sale, returning (sale, None) or (None, errors)"""
+    if not isinstance(record, dict):
+        return None, ["Venda deve ser um objeto JSON"]
+    try:
+        return TerminalSale.model_validate(record), None
+    except ValidationError as e:
+        return None, [
+            f"{'.'.join(str(p) for p in err['loc']) or 'venda'}: {err['msg']}"
+            for err in e.errors()
+        ]
+
+
+def sync_sales(
+    db: Session,
+    user_id: int,
+    records: List[Any],
+    ip_address: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Insert queued terminal sales, skipping client ids already stored.
+
+    Each record is validated on its own, so one malformed sale is answered
+    ``rejected`` without holding back the rest of the batch. Returns one
+    result per sale with ``status`` ``created``, ``duplicate``, ``rejected``
+    (invalid record) or ``error`` (valid but refused). Re-sending a batch is
+    always safe.
+    """
+    outcome: List[Any] = []
+    sales = []
+    for record in records:
+        sale, errors = validate_sale(record)
+        if sale is None:
+            client_id = record.get("client_id") if isinstance(record, dict) else None
+            outcome.append({"client_id": client_id, "status": "rejected", "errors": errors})
+        else:
+            outcome.append(sale)
+            sales.append(sale)
+    sales = _unique(sales)
+    known = _existing(db, [sale.client_id for sale in sales])
+    now = datetime.utcnow()
+    results = {}
+    to_insert = []
+    for sale in sales:
+        if sale.client_id in known:
+            results[sale.client_id] = {"status": "duplicate", "order_id": known[sale.client_id]}
+            continue
+        sold_at = to_utc_naive(sale.sold_at)
+        if sold_at > now + MAX_CLOCK_SKEW:
+            results[sale.client_id] = {"status": "error", "errors": ["sold_at: data no futuro"]}
+            continue
+        try:
+            payload = sale.to_order()
+        except ValidationError as e:
+            results[sale.client_id] = {"status": "error", "errors": [err["msg"] for err in e.errors()]}
+            continue
+        to_insert.append((sale, payload, sold_at))
+
+    try:
+        orders = [(sale.client_id, add_order(db, user_id, payload, created_at=sold_at,
+                                             ip_address=ip_address, client_id=sale.client_id))
+                  for sale, payload, sold_at in to_insert]
+        db.flush()
+        for (_, order), (_, _, sold_at) in zip(orders, to_insert):
+            capacity.reserve_order(db, order, sold_at)
+        created = {client_id: order.id for client_id, order in orders}
+        db.commit()
+    except (IntegrityError, capacity.CapacityExceeded):
+        # Outro terminal/aba sincronizou a mesma venda em paralelo, ou um horário lotou:
+        # refaz uma a uma para atribuir o problema à venda certa
+        db.rollback()
+        created = {}
+        for sale, payload, sold_at in to_insert:
+            try:
+                order = add_order(db, user_id, payload, created_at=sold_at,
+                                  ip_address=ip_address, client_id=sale.client_id)
+                db.flush()
+                capacity.reserve_order(db, order, sold_at)
+                created[sale.client_id] = order.id
+                db.commit()
+            except capacity.CapacityExceeded as e:
+                db.rollback()
+                results[sale.client_id] = {"status": "error", "errors": [str(e)]}
+            except IntegrityError:
+                db.rollback()
+                existing = _existing(db, [sale.client_id])
+                results[sale.client_id] = {"status": "duplicate",
+                                           "order_id": existing.get(sale.client_id)}
+
+    for client_id, order_id in created.items():
+        results[client_id] = {"status": "created", "order_id": order_id}
+
+    unique = {id(sale) for sale in sales}
+    return [item if isinstance(item, dict) else {"client_id": item.client_id, **results[item.client_id]}
+            for item in outcome if isinstance(item, dict) or id(item) in unique]
+
+
+def _existing(db: Session, client_ids: List[str]) -> Dict[str, int]:
+    rows = db.query(Order.client_id, Order.id).filter(Order.client_id.in_(client_ids)).all()
+    return {client_id: order_id for client_id, order_id in rows}
+
+
+def _unique(sales: List[TerminalSale]) -> List[TerminalSale]:
+    """Drop repeated client ids within one batch (first occurrence wins)"""
+    seen = set()
+    unique = []
+    for sale in sales:
+        if sale.client_id not in seen:
+            seen.add(sale.client_id)
+            unique.append(sale)
+    return unique
@@ -0,0 +1,242 @@
+"""
+Per-person tickets: HMAC-signed ids and an in-memory entry index
+
+A ticket id is ``<YYYYMMDD>-<order_id>-<item_id>-<seq>.<signature>``. The
+signature lets a gate reject forged or altered ids without a DB read. The
+:class:`TicketIndex` keeps the issued and used ticket ids of the current day
+in memory; it is built from the database on first use each day (and at
+startup) and kept up to date by session hooks whenever orders are committed
+or soft-deleted. Each entry is also written to ``ticket_redemptions``, so a
+restart or another worker still refuses a ticket that was already used.
+"""
+import base64
+import hashlib
+import hmac
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..config import get_settings
+from ..models import Order, OrderItem, Group, TicketRedemption
+from . import business_date
+
+SIGNATURE_BYTES = 10
+
+
+class SigningKeyMissing(RuntimeError):
+    """Raised when neither TICKET_SIGNING_KEY nor SECRET_KEY is configured"""
+
+
+def _signing_key() -> bytes:
+    settings = get_settings()
+    key = settings.ticket_signing_key or settings.secret_key
+    if not key:
+        # Uma chave aleatória por processo invalidaria os ingressos já impressos a cada restart
+        raise SigningKeyMissing("TICKET_SIGNING_KEY or SECRET_KEY must be set to sign tickets")
+    return key.encode("utf-8")
+
+
+_key: Optional[bytes] = None
+
+
+def signing_key() -> bytes:
+    global _key
+    if _key is None:
+        _key = _signing_key()
+    return _key
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(signing_key(), payload.encode("ascii"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode("ascii").rstrip("=")
+
+
+def ticket_payload(day: date, order_id: int, item_id: int, seq: int) -> str:
+    return f"{day:%Y%m%d}-{order_id}-{item_id}-{seq}"
+
+
+def make_ticket(day: date, order_id: int, item_id: int, seq: int) -> str:
+    payload = ticket_payload(day, order_id, item_id, seq)
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_ticket(ticket: str) -> Optional[Tuple[str, date]]:
+    """Return (payload, day) when the signature is valid, else None"""
+    payload, _, signature = ticket.strip().partition(".")
+    if not signature or not hmac.compare_digest(_sign(payload), signature):
+        return None
+    try:
+        return payload, datetime.strptime(payload[:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def order_ticket_day(order: Order) -> date:
+    """Day a ticket is valid on: the group's scheduled date, else the sale date"""
+    if order.group is not None and order.group.scheduled_date:
+        return order.group.scheduled_date.date()
+    return order.business_date or business_date.today()
+
+
+def mint_tickets(order: Order) -> List[str]:
+    """All ticket ids of an order, one per person"""
+    day = order_ticket_day(order)
+    return [make_ticket(day, order.id, item.id, seq)
+            for item in sorted(order.items, key=lambda i: i.id)
+            for seq in range(1, item.qty + 1)]
+
+
+class TicketIndex:
+    """Issued/used ticket ids for the current day, guarded by one lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.day: Optional[date] = None
+        self.issued: Set[str] = set()
+        self.used: Dict[str, datetime] = {}
+
+    def load(self, db: Session, day: date) -> None:
+        """(Re)build the index for ``day`` from the database"""
+        issued = set()
+        for order_id, item_id, qty in _items_for_day(db, day):
+            issued.update(ticket_payload(day, order_id, item_id, seq) for seq in range(1, qty + 1))
+        used = dict(db.query(TicketRedemption.ticket, TicketRedemption.used_at)
+                      .filter(TicketRedemption.day == day))
+        with self._lock:
+            self.day = day
+            self.issued = issued
+            self.used = used
+
+    def ensure_day(self, db: Session, day: date) -> None:
+        if self.day != day:
+            self.load(db, day)
+
+    def register(self, day: date, order_id: int, items: Iterable[Tuple[int, int]]) -> None:
+        """Add the tickets of a newly committed order (ignored for other days)"""
+        with self._lock:
+            if day != self.day:
+                return
+            for item_id, qty in items:
+                self.issued.update(ticket_payload(day, order_id, item_id, seq) for seq in range(1, qty + 1))
+
+    def revoke(self, order_id: int) -> None:
+        """Drop the unused tickets of a deleted order"""
+        marker = f"-{order_id}-"
+        with self._lock:
+            self.issued = {t for t in self.issued if not t[8:].startswith(marker) or t in self.used}
+
+    def validate(self, ticket: str, today: date) -> Dict:
+        """Check a ticket at the gate and mark it used when valid"""
+        verified = verify_ticket(ticket)
+        if verified is None:
+            return {"status": "invalid"}
+        payload, day = verified
+        if day != today:
+            return {"status": "wrong_day", "day": day.isoformat()}
+        with self._lock:
+            if payload not in self.issued:
+                return {"status": "unknown"}
+            used_at = self.used.get(payload)
+            if used_at is not None:
+                return {"status": "used", "used_at": used_at.isoformat()}
+            now = datetime.now()
+            self.used[payload] = now
+        return {"status": "ok", "ticket": payload, "used_at": now.isoformat()}
+
+    def record_use(self, db: Session, result: Dict, user_id: Optional[int] = None) -> Dict:
+        """Persist an ``ok`` answer of :meth:`validate`; an earlier entry by another worker wins"""
+        payload = result["ticket"]
+        used_at = datetime.fromisoformat(result["used_at"])
+        db.add(TicketRedemption(ticket=payload, day=datetime.strptime(payload[:8], "%Y%m%d").date(),
+                                order_id=int(payload.split("-")[1]), user_id=user_id, used_at=used_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            earlier = db.get(TicketRedemption, payload)
+            with self._lock:
+                self.used[payload] = earlier.used_at
+            return {"status": "used", "used_at": earlier.used_at.isoformat()}
+        except Exception:
+            db.rollback()
+            # Não gravou: o ingresso continua válido
+            with self._lock:
+                self.used.pop(payload, None)
+            raise
+        return result
+
+    def stats(self) -> Dict:
+        return {"day": self.day.isoformat() if self.day else None,
+                "issued": len(self.issued), "used": len(self.used)}
+
+
+def _items_for_day(db: Session, day: date):
+    scheduled = func.date(Group.scheduled_date)
+    return (db.query(Order.id, OrderItem.id, OrderItem.qty)
+              .join(OrderItem, OrderItem.order_id == Order.id)
+              .outerjoin(Group, Group.order_id == Order.id)
+              .filter(Order.deleted_at.is_(None),
+                      or_(scheduled == day,
+                          (Group.scheduled_date.is_(None)) & (Order.business_date == day)))
+              .yield_per(5000))
+
+
+ticket_index = TicketIndex()
+
+
+def load_ticket_index(session_factory) -> None:
+    """Rebuild today's issued and used tickets from the database (process start)"""
+    with session_factory() as db:
+        ticket_index.load(db, business_date.today())
+
+
+# Mantém o índice atualizado em qualquer caminho de escrita (balcão, grupos, lote, sync, journal).
+# Os valores são capturados no flush porque o commit expira os atributos dos objetos.
+@event.listens_for(Session, "after_flush")
+def _collect_ticket_changes(session, flush_context):
+    pending = session.info.setdefault("ticket_changes",
+                                      {"items": [], "days": {}, "scheduled": {}, "deleted": set()})
+    new_items = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            pending["days"][obj.id] = obj.business_date
+        elif isinstance(obj, OrderItem):
+            new_items.append(obj)
+        elif isinstance(obj, Group) and obj.scheduled_date:
+            pending["scheduled"][obj.order_id] = obj.scheduled_date.date()
+    for item in new_items:
+        pending["items"].append((item.order_id, item.id, item.qty))
+        if item.order_id not in pending["days"]:
+            # Itens adicionados depois de um flush do pedido (grupos): o pedido já está na sessão
+            order = session.identity_map.get(identity_key(Order, item.order_id))
+            if order is not None:
+                pending["days"][item.order_id] = order_ticket_day(order)
+    for obj in session.dirty:
+        if isinstance(obj, Order) and obj.deleted_at is not None:
+            pending["deleted"].add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_ticket_changes(session):
+    pending = session.info.pop("ticket_changes", None)
+    if not pending or ticket_index.day is None:
+        return
+    by_order: Dict[int, List[Tuple[int, int]]] = {}
+    for order_id, item_id, qty in pending["items"]:
+        by_order.setdefault(order_id, []).append((item_id, qty))
+    for order_id, items in by_order.items():
+        # Grupos agendados valem no dia da visita; os demais, no dia da venda
+        day = pending["scheduled"].get(order_id) or pending["days"].get(order_id) or business_date.today()
+        ticket_index.register(day, order_id, items)
+    for order_id in pending["deleted"]:
+        ticket_index.revoke(order_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_ticket_changes(session):
+    session.info.pop("ticket_changes", None)
@@ -0,0 +1,109 @@
+"""
+Analytics benchmark: SQL group-by vs the columnar in-memory snapshot
+
+Fills a temporary SQLite database with synthetic orders, then times the
+by-state, by-reason and by-payment aggregates over a 30-day and a full-year range with the SQL queries used
+by the report routes and with ``ColumnarSnapshot.group_by``. Also reports
+the initial snapshot load and an incremental refresh after new orders.
+
+    python -m benchmarks.bench_analytics --orders 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import Base  # noqa: E402
+from app.models import Order, OrderItem, User  # noqa: E402
+from app.services.analytics import ColumnarSnapshot  # noqa: E402
+
+PAYMENTS = ["pix", "credito", "debito", "dinheiro"]
+STATES = ["PE", "PE", "PE", "BA", "PB", "SP", "RN", None]
+REASONS = [None, None, None, "estudante", "professor", "DG", "PCD", "idoso"]
+DIMENSIONS = {"state": Order.state, "discount_reason": OrderItem.discount_reason,
+              "payment_method": Order.payment_method}
+
+
+def populate(session_factory, orders: int, first_id: int = 1, end: date = date(2025, 12, 31)) -> None:
+    rng = random.Random(first_id)
+    start = datetime.combine(end - timedelta(days=364), datetime.min.time())
+    with session_factory() as db:
+        if not db.get(User, 1):
+            db.add(User(id=1, username="bench", password_hash="x", role="admin"))
+        for offset in range(first_id, first_id + orders, 20_000):
+            ids = range(offset, min(first_id + orders, offset + 20_000))
+            db.execute(insert(Order), [
+                {"id": n, "user_id": 1, "payment_method": rng.choice(PAYMENTS), "state": rng.choice(STATES),
+                 "created_at": start + timedelta(minutes=rng.randrange(365 * 24 * 60))}
+                for n in ids
+            ])
+            db.execute(insert(OrderItem), [
+                {"order_id": n, "ticket_type": tt, "qty": rng.randint(1, 4),
+                 "unit_price_cents": 0 if tt == "gratuita" else 1000, "discount_reason": rng.choice(REASONS)}
+                for n in ids for tt in rng.sample(["inteira", "meia", "gratuita"], rng.randint(1, 2))
+            ])
+        db.commit()
+
+
+def sql_group_by(db, dim: str, start_dt: date, end_dt: date):
+    column = DIMENSIONS[dim]
+    stmt = (select(column, func.sum(OrderItem.qty), func.sum(OrderItem.qty * OrderItem.unit_price_cents))
+            .select_from(Order)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(and_(Order.business_date >= start_dt, Order.business_date <= end_dt,
+                        Order.deleted_at.is_(None)))
+            .group_by(column))
+    return db.execute(stmt).all()
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{workdir}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        populate(session_factory, args.orders)
+
+        with session_factory() as db:
+            snapshot = ColumnarSnapshot(refresh_seconds=0)
+            started = time.perf_counter()
+            snapshot.refresh(db)
+            print(f"initial load: {snapshot.stats()['rows']:,} items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+            populate(session_factory, 500, first_id=args.orders + 1)
+            snapshot.refresh(db, force=True)
+            print(f"incremental refresh (+500 orders): {snapshot.last_refresh_ms:.1f} ms")
+
+            end = date(2025, 12, 31)
+            for label, start in (("30 days", end - timedelta(days=29)), ("365 days", end - timedelta(days=364))):
+                for dim in DIMENSIONS:
+                    sql_ms = best_of(args.repeat, lambda: sql_group_by(db, dim, start, end))
+                    col_ms = best_of(args.repeat, lambda: snapshot.group_by(dim, start, end))
+                    print(f"{label:<9} {dim:<16} SQL {sql_ms:8.1f} ms   columnar {col_ms:7.2f} ms   "
+                          f"{sql_ms / col_ms:6.0f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
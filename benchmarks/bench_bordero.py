@@ -0,0 +1,55 @@
+"""
+Borderô rendering benchmark
+
+Renders borderôs of increasing length from synthetic per-day rows with the
+template-based writer and reports the best wall time of a few runs and the
+file size. The template is prepared once before timing, as a warmed render
+pool worker would have it.
+
+    python -m benchmarks.bench_bordero --days 7 30 90 365
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.reports import BORDERO_FIELDS, bordero_template, render_bordero_bytes  # noqa: E402
+
+
+def synthetic_rows(start: date, days: int):
+    rows = []
+    for d in range(days):
+        linha = dict.fromkeys(BORDERO_FIELDS, 0)
+        linha.update(date=start + timedelta(days=d), qtd_int_cash=12, qtd_int_pix=40, qtd_int_cc=31,
+                     qtd_meia_pix=25, g_DG=3, g_TG=8, rec_cash=12000, rec_pix=52500, rec_cc=31000,
+                     pagantes=108, publico_total=119)
+        rows.append(tuple(linha[f] for f in BORDERO_FIELDS))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 90, 365])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bordero_template()
+    print(f"template prepared in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    start = date(2025, 1, 1)
+    for days in args.days:
+        rows = synthetic_rows(start, days)
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            content = render_bordero_bytes(start, start + timedelta(days=days - 1), rows)
+            best = min(best, time.perf_counter() - started)
+        print(f"{days:>5} days: {best * 1000:8.1f} ms  {len(content) / 1024:7.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
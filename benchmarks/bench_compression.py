@@ -0,0 +1,110 @@
+"""
+Response compression benchmark: bandwidth and latency per encoding/level
+
+Streams a synthetic group-visit CSV (built with ``stream_csv``, as the
+report routes do) and a dashboard-like HTML page through
+``CompressionMiddleware`` for each encoding and level. Reports bytes on
+the wire, CPU time spent by the app plus the middleware, time to the first
+body chunk and the estimated download time over a constrained uplink.
+
+    python -m benchmarks.bench_compression --rows 200000 --uplink-mbit 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.responses import HTMLResponse, StreamingResponse  # noqa: E402
+
+from app.middleware import CompressionMiddleware, brotli  # noqa: E402
+from app.services.csv_stream import stream_csv  # noqa: E402
+
+HEADER = ["Data", "Instituição", "Pessoas", "UF", "Cidade", "Agendada", "ValorTotal"]
+
+
+def csv_rows(rows: int):
+    start = datetime(2024, 1, 1, 9, 0)
+    for n in range(rows):
+        yield (start + timedelta(minutes=n), f"Escola Estadual {n % 5000}", 10 + n % 40,
+               "PE", "Recife", n % 3 != 0, f"{25 + n % 7}.00")
+
+
+def html_page(rows: int) -> str:
+    cells = "".join(f"<tr><td>{n}</td><td>Escola Estadual {n % 500}</td><td>PE</td><td>{10 + n % 40}</td></tr>"
+                    for n in range(rows))
+    return f"<html><body><table class=\"table table-sm\">{cells}</table></body></html>"
+
+
+def make_app(kind: str, rows: int):
+    async def app(scope, receive, send):
+        if kind == "csv":
+            response = StreamingResponse(stream_csv(HEADER, csv_rows(rows)), media_type="text/csv")
+        else:
+            response = HTMLResponse(html_page(rows))
+        await response(scope, receive, send)
+    return app
+
+
+async def run_once(app, accept: str):
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    wire = 0
+    first_chunk = None
+    started = time.perf_counter()
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal wire, first_chunk
+        if message["type"] == "http.response.body":
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            wire += len(message.get("body", b""))
+
+    scope = {"type": "http", "method": "GET", "path": "/", "raw_path": b"/", "root_path": "",
+             "query_string": b"", "headers": [(b"accept-encoding", accept.encode())], "scheme": "http",
+             "server": ("bench", 80), "client": ("bench", 1), "http_version": "1.1"}
+    cpu_started = time.process_time()
+    await app(scope, receive, send)
+    return wire, time.process_time() - cpu_started, first_chunk
+
+
+def bench(kind: str, rows: int, uplink_mbit: float) -> None:
+    inner = make_app(kind, rows)
+    variants = [("identity", "identity", {})]
+    variants += [(f"gzip -{level}", "gzip", {"gzip_level": level}) for level in (1, 6, 9)]
+    if brotli is not None:
+        variants += [(f"br q{quality}", "br", {"brotli_quality": quality}) for quality in (1, 4, 6, 11)]
+
+    print(f"\n{kind.upper()} ({rows:,} rows), uplink {uplink_mbit} Mbit/s")
+    baseline = None
+    for label, accept, options in variants:
+        app = CompressionMiddleware(inner, **options)
+        wire, cpu, first_chunk = asyncio.run(run_once(app, accept))
+        baseline = baseline or wire
+        transfer = wire * 8 / (uplink_mbit * 1e6)
+        print(f"{label:<10} {wire / 2**20:8.2f} MiB  ratio {baseline / wire:5.1f}x  cpu {cpu * 1000:8.0f} ms  "
+              f"first chunk {first_chunk * 1000:6.1f} ms  download ~{transfer:7.1f} s  total ~{transfer + cpu:7.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000, help="CSV rows")
+    parser.add_argument("--html-rows", type=int, default=2_000, help="table rows of the HTML page")
+    parser.add_argument("--uplink-mbit", type=float, default=4.0, help="simulated uplink bandwidth")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli not installed: only gzip is measured")
+    bench("csv", args.rows, args.uplink_mbit)
+    bench("html", args.html_rows, args.uplink_mbit)
+
+
+if __name__ == "__main__":
+    main()
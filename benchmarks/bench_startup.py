@@ -0,0 +1,97 @@
+"""
+Startup benchmark: import time per module and time to the first request
+
+Each run starts a fresh interpreter (as a worker boot or a ``--reload``
+does) against a throwaway SQLite database and measures:
+
+- the import time of ``app.main``, broken down per module with
+  ``python -X importtime`` (self and cumulative microseconds);
+- the time until the first ``GET /health`` is answered, startup events
+  (journal replayer, render pool, export jobs) included;
+- which heavy optional dependencies got imported on the way.
+
+    python -m benchmarks.bench_startup --runs 5 --top 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependências que só devem carregar quando uma exportação ou métrica as usa
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "psutil", "qrcode", "PIL")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    status = client.get("/health").status_code
+answered = time.perf_counter()
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"import_s": imported - started, "first_request_s": answered - started,
+                  "status": status, "heavy": heavy}}))
+"""
+
+
+def _env(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update(DATABASE_URL=f"sqlite:///{workdir}/startup.db", RENDER_POOL_WORKERS="0",
+               SECRET_KEY="bench-startup")
+    return env
+
+
+def probe(workdir: str) -> dict:
+    """Import the app and answer one request in a fresh interpreter"""
+    out = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)], cwd=ROOT,
+                         env=_env(workdir), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_times(workdir: str):
+    """(module, self µs, cumulative µs) for every module imported by ``app.main``"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT,
+                         env=_env(workdir), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="slowest modules to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        probe(workdir)  # aquece o cache de bytecode e cria o banco
+        rows = import_times(workdir)
+        runs = [probe(workdir) for _ in range(args.runs)]
+
+    print(f"{'module':<45} {'self ms':>9} {'cumul. ms':>10}")
+    for name, own, cumulative in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:<45} {own / 1000:9.1f} {cumulative / 1000:10.1f}")
+    app_own = sum(own for name, own, _ in rows if name.startswith("app"))
+    print(f"\napp.* modules (self): {app_own / 1000:.1f} ms over {sum(1 for r in rows if r[0].startswith('app'))} modules")
+
+    imports = [r["import_s"] for r in runs]
+    firsts = [r["first_request_s"] for r in runs]
+    print(f"import app.main: median {statistics.median(imports) * 1000:.0f} ms "
+          f"(min {min(imports) * 1000:.0f}, max {max(imports) * 1000:.0f}) over {args.runs} runs")
+    print(f"first request:   median {statistics.median(firsts) * 1000:.0f} ms "
+          f"(min {min(firsts) * 1000:.0f}, max {max(firsts) * 1000:.0f})")
+    print(f"heavy modules loaded at startup: {', '.join(runs[-1]['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
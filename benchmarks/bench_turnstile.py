@@ -0,0 +1,95 @@
+"""
+Turnstile validation throughput benchmark
+
+Measures gate validations per second against the in-memory ticket index,
+both directly (signature check + index lookup) and through the full ASGI
+stack of ``POST /gate/validate`` with concurrent in-process clients.
+
+    python -m benchmarks.bench_turnstile --tickets 50000 --http 5000 --gates 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_turnstile.db")
+
+from app.services.tickets import TicketIndex, make_ticket, ticket_index  # noqa: E402
+
+
+def build_tickets(index: TicketIndex, day: date, count: int):
+    index.day = day
+    tickets = []
+    for order_id in range(1, count // 4 + 2):
+        index.register(day, order_id, [(order_id * 10, 4)])
+        tickets.extend(make_ticket(day, order_id, order_id * 10, seq) for seq in range(1, 5))
+    return tickets[:count]
+
+
+def bench_direct(count: int) -> None:
+    index = TicketIndex()
+    today = date.today()
+    tickets = build_tickets(index, today, count)
+    random.shuffle(tickets)
+
+    start = time.perf_counter()
+    statuses = [index.validate(t, today)["status"] for t in tickets]
+    elapsed = time.perf_counter() - start
+    assert statuses.count("ok") == count
+
+    start = time.perf_counter()
+    for t in tickets:
+        index.validate(t, today)
+    repeat = time.perf_counter() - start
+
+    print(f"direct: {count} tickets, first scan {count / elapsed:,.0f}/s, "
+          f"re-scan (used) {count / repeat:,.0f}/s")
+
+
+def bench_http(count: int, concurrency: int) -> None:
+    import asyncio
+    import httpx
+    from app.auth import require_auth
+    from app.main import app
+    from app.routes import tickets as tickets_routes
+
+    # Sem login: o benchmark mede só validação + overhead HTTP/ASGI
+    tickets_routes.require_auth = lambda request: None
+    today = date.today()
+    tickets = build_tickets(ticket_index, today, count)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gate") as client:
+            async def scan(chunk):
+                for t in chunk:
+                    response = await client.post("/gate/validate", json={"ticket": t})
+                    assert response.json()["status"] == "ok"
+
+            start = time.perf_counter()
+            await asyncio.gather(*(scan(tickets[n::concurrency]) for n in range(concurrency)))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    tickets_routes.require_auth = require_auth
+    print(f"http:   {count} requests, {concurrency} gates, {count / elapsed:,.0f}/s "
+          f"({elapsed / count * 1000:.2f} ms/req)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=50_000)
+    parser.add_argument("--http", type=int, default=5_000)
+    parser.add_argument("--gates", type=int, default=8)
+    args = parser.parse_args()
+    bench_direct(args.tickets)
+    if args.http:
+        bench_http(args.http, args.gates)
+
+
+if __name__ == "__main__":
+    main()
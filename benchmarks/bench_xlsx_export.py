@@ -0,0 +1,115 @@
+"""
+XLSX export benchmark: streaming writer vs pandas + openpyxl
+
+Fills a temporary SQLite database with group visits, then exports the raw
+rows through ``stream_xlsx`` (server-side cursor, constant memory) and,
+for a smaller row count, through the former DataFrame + ``pd.ExcelWriter``
+path. Reports wall time, peak traced Python memory (measured in a second,
+traced run) and output size.
+
+    python -m benchmarks.bench_xlsx_export --rows 1000000 --baseline-rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import Base  # noqa: E402
+from app.models import GroupVisit  # noqa: E402
+from app.services.xlsx_stream import stream_xlsx  # noqa: E402
+
+COLUMNS = ["Data", "Instituição", "Pessoas", "UF", "Cidade", "Agendada", "ValorTotal"]
+
+
+def populate(session_factory, rows: int) -> None:
+    start = datetime(2024, 1, 1, 9, 0)
+    with session_factory() as db:
+        for offset in range(0, rows, 50_000):
+            db.execute(insert(GroupVisit), [
+                {"date": start + timedelta(minutes=n), "institution": f"Escola Estadual {n % 5000}",
+                 "size": 10 + n % 40, "state": "PE", "city": "Recife", "scheduled": n % 3 != 0,
+                 "price_total": Decimal("25.00")}
+                for n in range(offset, min(rows, offset + 50_000))
+            ])
+        db.commit()
+
+
+def raw_query(db, limit: int):
+    return (db.query(GroupVisit.date, GroupVisit.institution, GroupVisit.size,
+                     GroupVisit.state, GroupVisit.city, GroupVisit.scheduled, GroupVisit.price_total)
+              .order_by(GroupVisit.date.desc())
+              .limit(limit))
+
+
+def measure(label: str, rows: int, run) -> None:
+    # Tempo medido sem tracemalloc (que deixa tudo várias vezes mais lento)
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {rows:>9,} rows  {elapsed:7.1f} s  {rows / elapsed:>9,.0f} rows/s  "
+          f"peak {peak / 2**20:7.1f} MiB  file {size / 2**20:6.1f} MiB")
+
+
+def bench_stream(session_factory, rows: int) -> None:
+    def run():
+        size = 0
+        with session_factory() as db:
+            sheets = [("Bruto", COLUMNS, raw_query(db, rows).yield_per(2000))]
+            for chunk in stream_xlsx(sheets):
+                size += len(chunk)
+        return size
+    measure("stream_xlsx", rows, run)
+
+
+def bench_pandas(session_factory, rows: int, workdir: str) -> None:
+    import pandas as pd
+
+    def run():
+        path = os.path.join(workdir, "pandas.xlsx")
+        with session_factory() as db:
+            df = pd.DataFrame(raw_query(db, rows).all(), columns=COLUMNS)
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="Bruto")
+        return os.path.getsize(path)
+    measure("pandas + openpyxl", rows, run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--baseline-rows", type=int, default=100_000,
+                        help="rows for the pandas baseline (0 to skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{workdir}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+
+        started = time.perf_counter()
+        populate(session_factory, max(args.rows, args.baseline_rows))
+        print(f"populated {max(args.rows, args.baseline_rows):,} rows in {time.perf_counter() - started:.1f} s")
+
+        if args.baseline_rows:
+            bench_stream(session_factory, args.baseline_rows)
+            bench_pandas(session_factory, args.baseline_rows, workdir)
+        bench_stream(session_factory, args.rows)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
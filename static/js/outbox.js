@@ -0,0 +1,154 @@
+// Fila local de vendas (IndexedDB) com sincronização em lote.
+// Carregado tanto pela página de vendas quanto pelo service worker (importScripts).
+(function (global) {
+  const DB_NAME = 'bilheteria-outbox';
+  const DB_VERSION = 2;
+  const SALES = 'sales';
+  const REJECTED = 'rejected';
+  const META = 'meta';
+  const BATCH_SIZE = 50;
+  const SYNC_TIMEOUT_MS = 8000;
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, DB_VERSION);
+      req.onupgradeneeded = () => {
+        const db = req.result;
+        if (!db.objectStoreNames.contains(SALES)) {
+          db.createObjectStore(SALES, { keyPath: 'client_id' }).createIndex('sold_at', 'sold_at');
+        }
+        if (!db.objectStoreNames.contains(META)) {
+          db.createObjectStore(META);
+        }
+        // Vendas recusadas pelo servidor ficam guardadas para conferência
+        if (!db.objectStoreNames.contains(REJECTED)) {
+          db.createObjectStore(REJECTED, { keyPath: 'client_id' });
+        }
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  async function tx(store, mode, fn) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const t = db.transaction(store, mode);
+      const result = fn(t.objectStore(store));
+      t.oncomplete = () => { db.close(); resolve(result && 'result' in result ? result.result : result); };
+      t.onerror = () => { db.close(); reject(t.error); };
+    });
+  }
+
+  function newClientId() {
+    if (global.crypto && global.crypto.randomUUID) return global.crypto.randomUUID();
+    return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+      const r = Math.random() * 16 | 0;
+      return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+    });
+  }
+
+  const Outbox = {
+    // Guarda a venda com id e horário gerados no terminal
+    async enqueue(fields) {
+      const sale = Object.assign({}, fields, {
+        client_id: newClientId(),
+        sold_at: new Date().toISOString(),
+      });
+      await tx(SALES, 'readwrite', s => s.put(sale));
+      return sale;
+    },
+
+    async pending() {
+      return tx(SALES, 'readonly', s => s.index('sold_at').getAll());
+    },
+
+    async count() {
+      return tx(SALES, 'readonly', s => s.count());
+    },
+
+    async remove(clientIds) {
+      return tx(SALES, 'readwrite', s => clientIds.forEach(id => s.delete(id)));
+    },
+
+    // Tira as vendas da fila e as guarda, com os erros, na área de recusadas
+    async park(sales) {
+      const db = await openDb();
+      return new Promise((resolve, reject) => {
+        const t = db.transaction([SALES, REJECTED], 'readwrite');
+        sales.forEach(sale => {
+          t.objectStore(REJECTED).put(sale);
+          t.objectStore(SALES).delete(sale.client_id);
+        });
+        t.oncomplete = () => { db.close(); resolve(); };
+        t.onerror = () => { db.close(); reject(t.error); };
+      });
+    },
+
+    async parked() {
+      return tx(REJECTED, 'readonly', s => s.getAll());
+    },
+
+    async setToken(token) {
+      return tx(META, 'readwrite', s => s.put(token, 'csrf_token'));
+    },
+
+    async getToken() {
+      return tx(META, 'readonly', s => s.get('csrf_token'));
+    },
+
+    async refreshToken() {
+      const resp = await fetch('/sync/token', { credentials: 'same-origin' });
+      if (!resp.ok) throw new Error('token ' + resp.status);
+      const token = (await resp.json()).csrf_token;
+      await Outbox.setToken(token);
+      return token;
+    },
+
+    async postBatch(batch, token) {
+      const ctrl = new AbortController();
+      const timer = setTimeout(() => ctrl.abort(), SYNC_TIMEOUT_MS);
+      try {
+        return await fetch('/sync/sales', {
+          method: 'POST',
+          credentials: 'same-origin',
+          headers: { 'Content-Type': 'application/json', 'X-CSRF-Token': token || '' },
+          body: JSON.stringify({ sales: batch }),
+          signal: ctrl.signal,
+        });
+      } finally {
+        clearTimeout(timer);
+      }
+    },
+
+    // Envia a fila em lotes, na ordem das vendas. Retorna quantas foram confirmadas.
+    // Vendas recusadas pelo servidor ("rejected"/"error") vão para a área de recusadas
+    // e são devolvidas em `rejected`; o restante da fila segue normalmente.
+    async flush() {
+      const sales = await Outbox.pending();
+      let synced = 0;
+      const rejected = [];
+      let token = await Outbox.getToken();
+      for (let i = 0; i < sales.length; i += BATCH_SIZE) {
+        const batch = sales.slice(i, i + BATCH_SIZE);
+        let resp = await Outbox.postBatch(batch, token);
+        if (resp.status === 400) {
+          token = await Outbox.refreshToken();
+          resp = await Outbox.postBatch(batch, token);
+        }
+        if (!resp.ok) throw new Error('sync ' + resp.status);
+        const results = (await resp.json()).results;
+        const byId = new Map(batch.map(sale => [sale.client_id, sale]));
+        const refused = results.filter(r => r.status === 'rejected' || r.status === 'error');
+        await Outbox.park(refused.filter(r => byId.has(r.client_id)).map(r =>
+          Object.assign({}, byId.get(r.client_id), { errors: r.errors, rejected_at: new Date().toISOString() })));
+        await Outbox.remove(results.filter(r => !refused.includes(r)).map(r => r.client_id));
+        rejected.push(...refused);
+        synced += results.length - refused.length;
+      }
+      return { synced, rejected };
+    },
+  };
+
+  global.Outbox = Outbox;
+})(self);
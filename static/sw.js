@@ -0,0 +1,60 @@
+// Service worker da bilheteria: mantém a tela de vendas disponível offline
+// e sincroniza a fila de vendas (Background Sync) quando a rede volta.
+importScripts('/static/js/outbox.js');
+
+const CACHE = 'bilheteria-shell-v2';
+const SHELL = [
+  '/sell',
+  '/static/js/outbox.js',
+  'https://cdn.tailwindcss.com',
+  'https://unpkg.com/htmx.org@1.9.10',
+];
+
+self.addEventListener('install', event => {
+  event.waitUntil(
+    caches.open(CACHE)
+      .then(cache => Promise.all(SHELL.map(url => cache.add(url).catch(() => null))))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil(
+    caches.keys()
+      .then(keys => Promise.all(keys.filter(k => k !== CACHE).map(k => caches.delete(k))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', event => {
+  const req = event.request;
+  if (req.method !== 'GET') return;
+  const url = new URL(req.url);
+  const isShell = SHELL.includes(url.pathname) || SHELL.includes(req.url);
+  if (!isShell) return;
+
+  // Rede primeiro (página sempre atualizada), cache como reserva offline
+  event.respondWith(
+    fetch(req)
+      .then(resp => {
+        if (resp.ok || resp.type === 'opaque') {
+          const copy = resp.clone();
+          caches.open(CACHE).then(cache => cache.put(req, copy));
+        }
+        return resp;
+      })
+      .catch(() => caches.match(req))
+  );
+});
+
+self.addEventListener('sync', event => {
+  if (event.tag === 'outbox-sync') {
+    event.waitUntil(
+      Outbox.flush().then(result =>
+        self.clients.matchAll().then(clients =>
+          clients.forEach(c => c.postMessage({ type: 'outbox-synced', result }))
+        )
+      )
+    );
+  }
+});
@@ -1,17 +1,33 @@
 """
 Pytest configuration and fixtures
 """
+import os
 import pytest
 import asyncio
+import json
+from base64 import b64encode
+import itsdangerous
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.main import app
+# Renderiza planilhas no thread pool; o pool de processos tem testes próprios
+os.environ.setdefault("RENDER_POOL_WORKERS", "0")
+# Dia de operação = dia UTC, como date.today() nos testes; o fuso tem testes próprios
+os.environ.setdefault("VENUE_TIMEZONE", "UTC")
+# Ingressos exigem uma chave de assinatura configurada
+os.environ.setdefault("TICKET_SIGNING_KEY", "test-ticket-signing-key")
+
+from app.main import app, SECRET_KEY
+from app.logging_config import shutdown_logging
 from app.db import get_db, Base
 from app.models import User
 from app.auth import hash_password
+from app.services.query_stats import instrument_engine
+
+# Registros vão direto ao caplog do pytest, sem a fila; o pipeline tem testes próprios
+shutdown_logging()
 
 
 # Test database URL
@@ -23,6 +39,7 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+instrument_engine(engine)
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -111,3 +128,24 @@ def auth_headers(client, admin_user):
     # Extract session cookie
     cookies = response.cookies
     return {"Cookie": f"session={cookies.get('session')}"}
+
+
+def make_session_cookie(session: dict) -> str:
+    """Build a signed session cookie the same way SessionMiddleware does"""
+    signer = itsdangerous.TimestampSigner(str(SECRET_KEY))
+    return signer.sign(b64encode(json.dumps(session).encode("utf-8"))).decode("utf-8")
+
+
+@pytest.fixture
+def admin_client(client, admin_user):
+    """Test client already logged in as the admin user"""
+    client.cookies.set("session", make_session_cookie({
+        "user_session": {
+            "id": admin_user.id,
+            "username": admin_user.username,
+            "role": admin_user.role,
+            "is_active": True,
+        },
+        "csrf_token": "test-csrf-token",
+    }))
+    return client
@@ -0,0 +1,100 @@
+"""
+Columnar analytics engine tests
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.models import Order, OrderItem, OrderEvent
+from app.services import analytics
+from app.services.analytics import ColumnarSnapshot
+
+TODAY = date.today()
+
+ORDERS = [
+    # (dias atrás, pagamento, UF, [(tipo, qtd, preço, motivo)])
+    (0, "pix", "PE", [("inteira", 2, 1000, None), ("meia", 1, 500, "estudante")]),
+    (0, "credito", "BA", [("inteira", 1, 1500, None)]),
+    (1, "pix", None, [("gratuita", 3, 0, "DG")]),
+    (2, "dinheiro", "PE", [("meia", 2, 500, "professor")]),
+    (40, "pix", "SP", [("inteira", 5, 1000, None)]),
+]
+
+
+def _add(db_session, user_id, days_ago, pm, uf, items):
+    at = datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time()).replace(hour=11)
+    order = Order(user_id=user_id, payment_method=pm, state=uf, created_at=at)
+    for tt, qty, price, reason in items:
+        order.items.append(OrderItem(ticket_type=tt, qty=qty, unit_price_cents=price, discount_reason=reason))
+    db_session.add(order)
+    db_session.commit()
+    return order
+
+
+@pytest.fixture
+def orders(db_session, admin_user):
+    return [_add(db_session, admin_user.id, *spec) for spec in ORDERS]
+
+
+def _totals(snapshot, dim, start=TODAY - timedelta(days=30), end=TODAY, **kwargs):
+    return {value: (qty, cents) for value, qty, cents in snapshot.group_by(dim, start, end, **kwargs)}
+
+
+def test_group_by_matches_the_orders(db_session, orders):
+    snapshot = ColumnarSnapshot(refresh_seconds=0)
+    snapshot.refresh(db_session)
+
+    assert _totals(snapshot, "state") == {"PE": (5, 3500), "BA": (1, 1500), None: (3, 0)}
+    assert _totals(snapshot, "payment_method") == {"pix": (6, 2500), "credito": (1, 1500), "dinheiro": (2, 1000)}
+    assert _totals(snapshot, "discount_reason", skip_none=True) == {
+        "estudante": (1, 500), "DG": (3, 0), "professor": (2, 1000)
+    }
+    assert _totals(snapshot, "state", start=TODAY - timedelta(days=45), end=TODAY - timedelta(days=35)) == {
+        "SP": (5, 5000)
+    }
+    assert _totals(snapshot, "state", start=TODAY + timedelta(days=1), end=TODAY + timedelta(days=2)) == {}
+
+
+def test_refresh_is_incremental(db_session, admin_user, orders):
+    snapshot = ColumnarSnapshot(refresh_seconds=60)
+    snapshot.refresh(db_session)
+    assert snapshot.stats()["rows"] == 6
+
+    # dentro do intervalo mínimo não consulta o banco
+    _add(db_session, admin_user.id, 0, "pix", "RN", [("inteira", 4, 1000, None)])
+    assert snapshot.refresh(db_session) is False
+    assert "RN" not in _totals(snapshot, "state")
+
+    assert snapshot.refresh(db_session, force=True) is True
+    assert _totals(snapshot, "state")["RN"] == (4, 4000)
+    assert snapshot.max_order_id == max(o.id for o in orders) + 1
+
+    # exclusão e edição chegam pelos eventos do pedido
+    deleted, edited = orders[1], orders[3]
+    deleted.deleted_at = datetime.now()
+    edited.items[0].qty = 7
+    db_session.add_all([
+        OrderEvent(order_id=deleted.id, action="deleted", user_id=admin_user.id),
+        OrderEvent(order_id=edited.id, action="updated", user_id=admin_user.id),
+    ])
+    db_session.commit()
+    snapshot.refresh(db_session, force=True)
+
+    assert "BA" not in _totals(snapshot, "state")
+    assert _totals(snapshot, "payment_method")["dinheiro"] == (7, 3500)
+    assert snapshot.stats()["rows"] == 6
+
+
+def test_reports_answer_from_the_snapshot(admin_client: TestClient, orders, monkeypatch):
+    paths = ["/reports/by-state", "/reports/by-discount-reason", "/reports/by-payment-method"]
+    from_sql = [admin_client.get(path).text for path in paths]
+
+    monkeypatch.setattr(settings, "analytics_engine", True)
+    monkeypatch.setattr(analytics, "_snapshot", ColumnarSnapshot(refresh_seconds=0))
+    from_snapshot = [admin_client.get(path).text for path in paths]
+
+    assert from_snapshot == from_sql
+    assert analytics.get_analytics().stats()["rows"] == 6
+    assert admin_client.get("/health").json()["analytics"]["rows"] == 6
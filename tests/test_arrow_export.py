@@ -0,0 +1,86 @@
+"""
+Parquet / Arrow raw export tests
+"""
+import builtins
+import io
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models import GroupVisit, Order, OrderItem
+from app.services.arrow_export import stream_arrow
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+TODAY = date.today()
+
+
+def _add_orders(db_session, user_id, count):
+    noon = datetime.combine(TODAY, datetime.min.time()).replace(hour=12)
+    for n in range(count):
+        order = Order(user_id=user_id, payment_method="pix", state="PE", created_at=noon - timedelta(minutes=n))
+        order.items.append(OrderItem(ticket_type="inteira", qty=1 + n % 3, unit_price_cents=1000))
+        db_session.add(order)
+    db_session.commit()
+
+
+def test_parquet_keeps_types(admin_client: TestClient, db_session):
+    db_session.add(GroupVisit(date=datetime.now() - timedelta(days=1), institution="Escola, Recife", size=30,
+                              state="PE", city="Recife", scheduled=True, contact_phone="81 99999-0000",
+                              price_total=Decimal("150.50")))
+    db_session.commit()
+
+    response = admin_client.get("/reports/raw/group_visits")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert "group_visits_" in response.headers["content-disposition"]
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.field("size").type == pa.int64()
+    assert table.schema.field("scheduled").type == pa.bool_()
+    assert table.schema.field("price_total").type == pa.decimal128(10, 2)
+    assert table.schema.field("date").type == pa.timestamp("us")
+    assert "contact_phone" not in table.schema.names
+    assert table.column("price_total").to_pylist() == [Decimal("150.50")]
+    assert table.column("institution").to_pylist() == ["Escola, Recife"]
+
+
+def test_arrow_stream_in_bounded_batches(db_session, admin_user):
+    _add_orders(db_session, admin_user.id, 25)
+
+    chunks = list(stream_arrow(db_session, "items", TODAY, TODAY, fmt="arrow", batch_rows=10))
+    assert len(chunks) == 4  # três lotes e o fim do stream
+
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    batches = list(reader)
+    assert [b.num_rows for b in batches] == [10, 10, 5]
+    table = pa.Table.from_batches(batches)
+    assert sum(table.column("qty").to_pylist()) == sum(1 + n % 3 for n in range(25))
+    assert table.schema.field("order_created_at").type == pa.timestamp("us")
+
+
+def test_empty_range_is_a_valid_file(admin_client: TestClient):
+    response = admin_client.get("/reports/raw/orders", params={"start_date": "2020-01-01", "end_date": "2020-01-31"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 0
+    assert "payment_method" in table.schema.names
+
+
+def test_without_pyarrow_answers_501(admin_client: TestClient, monkeypatch):
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, *args, **kwargs):
+        if name.startswith("pyarrow"):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_pyarrow)
+    assert admin_client.get("/reports/raw/orders").status_code == 501
+
+
+def test_unknown_dataset_is_rejected(admin_client: TestClient):
+    assert admin_client.get("/reports/raw/users").status_code == 422
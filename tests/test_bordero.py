@@ -0,0 +1,57 @@
+"""
+Borderô writer tests
+"""
+import io
+from datetime import date, timedelta
+
+from openpyxl import load_workbook
+
+from app.services.reports import BORDERO_FIELDS, BORDERO_FIRST_ROW, render_bordero
+
+
+def _render(linhas, start=date(2025, 10, 14)):
+    out = io.BytesIO()
+    render_bordero(out, start, start + timedelta(days=max(len(linhas), 1) - 1), linhas)
+    return load_workbook(io.BytesIO(out.getvalue()))["borderô"]
+
+
+def _linha(day, pix=2):
+    linha = dict.fromkeys(BORDERO_FIELDS, 0)
+    linha.update(date=day, qtd_int_pix=pix, g_DG=1, rec_pix=pix * 1000, pagantes=pix, publico_total=pix + 1)
+    return linha
+
+
+def test_data_rows_use_shared_styles():
+    start = date(2025, 10, 14)
+    ws = _render([_linha(start + timedelta(days=d)) for d in range(3)])
+
+    assert ws["A12"].value == "ADM EMPETUR - PERÍODO DE 14.10 A 16.10.2025"
+    assert ws["B15"].value.date() == start
+    assert ws["B15"].style == "bordero_dia"
+    assert ws["D16"].value == 2 and ws["D16"].style == "bordero_qtd"
+    assert ws["M17"].value == 20.0 and ws["M17"].style == "bordero_valor"
+    assert ws["O17"].value == 20.0
+    # rodapé do modelo sobe para logo abaixo dos dados
+    assert ws["A18"].value == "TOTAIS DA SEMANA"
+    assert ws["D18"].value == "=SUM(D15:D17)"
+    assert ws["I19"].value == "=SUM(I18:K18)"
+    assert ws["B21"].value == "EXECUTIVO SÊNIOR"
+    assert "A12:A17" in {str(r) for r in ws.merged_cells.ranges}
+
+
+def test_long_period_moves_footer():
+    start = date(2025, 1, 1)
+    ws = _render([_linha(start + timedelta(days=d)) for d in range(90)])
+
+    totals = BORDERO_FIRST_ROW + 90
+    assert ws.cell(row=totals, column=1).value == "TOTAIS DA SEMANA"
+    assert ws.cell(row=totals, column=17).value == f"=SUM(Q15:Q{totals - 1})"
+    merged = {str(r) for r in ws.merged_cells.ranges}
+    assert f"A{totals}:B{totals}" in merged
+    assert f"C{totals + 1}:E{totals + 1}" in merged
+
+
+def test_empty_period_keeps_one_blank_row():
+    ws = _render([])
+    assert ws["B15"].value is None
+    assert ws["A16"].value == "TOTAIS DA SEMANA"
@@ -0,0 +1,127 @@
+"""
+Multi-period borderô batch tests
+"""
+import io
+import os
+import zipfile
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from app.config import get_settings
+from app.models import Order, OrderItem
+from app.services import bordero_batch
+from app.services.bordero_batch import BorderoCache, build_borderos, render_period, split_periods
+
+
+def _add_order(db_session, user_id, when, qty=2):
+    order = Order(user_id=user_id, payment_method="pix", created_at=when)
+    order.items.append(OrderItem(ticket_type="inteira", qty=qty, unit_price_cents=1000))
+    db_session.add(order)
+    db_session.commit()
+
+
+def test_split_periods():
+    assert split_periods(date(2024, 1, 15), date(2024, 3, 10), "month") == [
+        (date(2024, 1, 15), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 10)),
+    ]
+    assert split_periods(date(2024, 2, 10), date(2024, 12, 31), "quarter")[1] == (date(2024, 4, 1), date(2024, 6, 30))
+    assert split_periods(date(2023, 12, 1), date(2024, 12, 31), "year") == [
+        (date(2023, 12, 1), date(2023, 12, 31)), (date(2024, 1, 1), date(2024, 12, 31)),
+    ]
+    # semanas de segunda a domingo
+    assert split_periods(date(2024, 1, 3), date(2024, 1, 14), "week") == [
+        (date(2024, 1, 3), date(2024, 1, 7)), (date(2024, 1, 8), date(2024, 1, 14)),
+    ]
+    with pytest.raises(ValueError):
+        split_periods(date(2000, 1, 1), date(2024, 12, 31), "week")
+
+
+def test_batch_zip_has_one_bordero_per_month(admin_client: TestClient, db_session, admin_user, tmp_path, monkeypatch):
+    monkeypatch.setattr(bordero_batch, "_cache", BorderoCache(str(tmp_path)))
+    _add_order(db_session, admin_user.id, datetime(2024, 1, 10, 10), qty=3)
+    _add_order(db_session, admin_user.id, datetime(2024, 2, 15, 10), qty=5)
+
+    response = admin_client.get("/reports/bordero-cais/batch",
+                                params={"start_date": "2024-01-01", "end_date": "2024-03-31"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [
+        "Borderô_Cais_2024-01-01_2024-01-31.xlsx",
+        "Borderô_Cais_2024-02-01_2024-02-29.xlsx",
+        "Borderô_Cais_2024-03-01_2024-03-31.xlsx",
+    ]
+    ws = load_workbook(io.BytesIO(archive.read("Borderô_Cais_2024-02-01_2024-02-29.xlsx")))["borderô"]
+    assert ws["B15"].value.date() == date(2024, 2, 15)
+    assert ws["D15"].value == 5
+
+
+def test_batch_rejects_bad_ranges(admin_client: TestClient):
+    params = {"start_date": "2024-02-01", "end_date": "2024-01-01"}
+    assert admin_client.get("/reports/bordero-cais/batch", params=params).status_code == 400
+    params = {"start_date": "2000-01-01", "end_date": "2024-12-31", "period": "week"}
+    assert admin_client.get("/reports/bordero-cais/batch", params=params).status_code == 400
+
+
+def test_only_changed_periods_are_rebuilt(db_session, admin_user, tmp_path):
+    cache = BorderoCache(str(tmp_path))
+    _add_order(db_session, admin_user.id, datetime(2024, 1, 10, 10))
+    _add_order(db_session, admin_user.id, datetime(2024, 2, 15, 10))
+
+    first = build_borderos(db_session, date(2024, 1, 1), date(2024, 3, 31), "month", cache)
+    assert cache.stats() == {"hits": 0, "misses": 3}
+
+    second = build_borderos(db_session, date(2024, 1, 1), date(2024, 3, 31), "month", cache)
+    assert cache.stats() == {"hits": 3, "misses": 3}
+    assert second == first
+
+    _add_order(db_session, admin_user.id, datetime(2024, 2, 20, 10))
+    third = build_borderos(db_session, date(2024, 1, 1), date(2024, 3, 31), "month", cache)
+    assert cache.stats() == {"hits": 5, "misses": 4}
+    assert third[0] == first[0] and third[1] != first[1]
+    assert len(list(tmp_path.glob("2024-02-01_2024-02-29_*.xlsx"))) == 1
+
+
+def test_worker_task_opens_its_own_connection(db_session, admin_user, monkeypatch):
+    _add_order(db_session, admin_user.id, datetime(2024, 1, 10, 10), qty=4)
+    # Como num processo do pool: o engine vem das configurações, não da tarefa
+    monkeypatch.setattr(get_settings(), "database_url", str(db_session.get_bind().url))
+    monkeypatch.setattr(bordero_batch, "_worker_engine", None)
+
+    ws = load_workbook(io.BytesIO(render_period(date(2024, 1, 1), date(2024, 1, 31))))["borderô"]
+    assert ws["D15"].value == 4
+
+
+def test_worker_tasks_carry_only_period_bounds(db_session, tmp_path, monkeypatch):
+    class RecordingPool:
+        workers = 2
+        calls = []
+
+        def map(self, fn, arg_tuples):
+            self.calls.append((fn, list(arg_tuples)))
+            return [b"xlsx"] * len(arg_tuples)
+
+    pool = RecordingPool()
+    monkeypatch.setattr(bordero_batch, "get_render_pool", lambda: pool)
+    build_borderos(db_session, date(2024, 1, 1), date(2024, 2, 29), "month", BorderoCache(str(tmp_path)))
+    assert pool.calls == [(render_period, [(date(2024, 1, 1), date(2024, 1, 31)),
+                                           (date(2024, 2, 1), date(2024, 2, 29))])]
+
+
+def test_cache_drops_least_recently_used_files(tmp_path):
+    cache = BorderoCache(str(tmp_path), max_bytes=25)
+    periods = [(date(2024, month, 1), date(2024, month, 28)) for month in (1, 2, 3)]
+    cache.put(periods[0], "a", b"x" * 10)
+    cache.put(periods[1], "b", b"x" * 10)
+    old = os.stat(cache._path(periods[1], "b")).st_mtime_ns
+    os.utime(cache._path(periods[0], "a"), ns=(old + 10**9, old + 10**9))  # janeiro usado por último
+
+    cache.put(periods[2], "c", b"x" * 10)
+    assert cache.get(periods[1], "b") is None
+    assert cache.get(periods[0], "a") == b"x" * 10 and cache.get(periods[2], "c") == b"x" * 10
@@ -0,0 +1,109 @@
+"""
+Borderô bucketing rules and pivot tests
+"""
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import literal, select
+
+from app.models import Order, OrderItem, Sale
+from app.services.bucketing import (
+    pm_bucket, grat_bucket, pm_bucket_sql, grat_bucket_sql, in_grat_bucket_sql, pm_bucket_array, grat_bucket_array
+)
+from app.services.reports import bordero_lines, pivot_bordero_frame
+
+PAYMENTS = ["pix", " PIX ", "Pix", "dinheiro", "Espécie", "ESPÉCIE", "cash", "credito", "Visa", "", None, "boleto"]
+REASONS = ["DG", " dg ", "Dia Gratuidade", "PCD", "gpd", "professor", "", None]
+
+
+@pytest.mark.parametrize("value, bucket", [
+    ("pix", "pix"), (" PIX ", "pix"), ("Espécie", "cash"), ("dinheiro", "cash"),
+    ("debito", "cc"), ("hipercard", "cc"), ("", "cc"), (None, "cc"),
+])
+def test_pm_bucket(value, bucket):
+    assert pm_bucket(value) == bucket
+
+
+@pytest.mark.parametrize("value, bucket", [
+    ("DG", "DG"), ("dia gratuidade", "DG"), ("PCD", "GPD"), (" gpd", "GPD"), ("estudante", "TG"), (None, "TG"),
+])
+def test_grat_bucket(value, bucket):
+    assert grat_bucket(value) == bucket
+
+
+def test_sql_buckets_match_python(db_session):
+    for value in PAYMENTS:
+        assert db_session.execute(select(pm_bucket_sql(literal(value)))).scalar() == pm_bucket(value), value
+    for value in REASONS:
+        assert db_session.execute(select(grat_bucket_sql(literal(value)))).scalar() == grat_bucket(value), value
+        for bucket in ("DG", "GPD"):
+            matches = db_session.execute(select(in_grat_bucket_sql(literal(value), bucket))).scalar()
+            assert bool(matches) == (grat_bucket(value) == bucket), value
+
+
+def test_array_buckets_match_python():
+    assert list(pm_bucket_array(PAYMENTS)) == [pm_bucket(v) for v in PAYMENTS]
+    assert list(grat_bucket_array(pd.Series(REASONS))) == [grat_bucket(v) for v in REASONS]
+
+
+ITEMS = [
+    # (dias atrás, pagamento, tipo, qtd, preço, motivo)
+    (1, "pix", "inteira", 3, 1000, None),
+    (1, "Dinheiro", "meia", 2, 500, "estudante"),
+    (1, "visa", "inteira", 1, 1000, None),
+    (1, "pix", "gratuita", 4, 0, "DG"),
+    (0, "espécie", "inteira", 2, 1000, None),
+    (0, "credito", "gratuita", 1, 0, "PCD"),
+    (0, "credito", "gratuita", 2, 0, "professor"),
+]
+
+
+def _add_orders(db_session, user_id):
+    today = datetime.combine(date.today(), datetime.min.time()).replace(hour=10)
+    for days_ago, pm, tt, qty, price, reason in ITEMS:
+        order = Order(user_id=user_id, payment_method=pm, created_at=today - timedelta(days=days_ago))
+        order.items.append(OrderItem(ticket_type=tt, qty=qty, unit_price_cents=price, discount_reason=reason))
+        db_session.add(order)
+    db_session.commit()
+
+
+def test_sql_pivot_rows(db_session, admin_user):
+    _add_orders(db_session, admin_user.id)
+    linhas = bordero_lines(db_session, date.today() - timedelta(days=1), date.today())
+
+    assert [linha["date"] for linha in linhas] == [date.today() - timedelta(days=1), date.today()]
+    ontem, hoje = linhas
+    assert (ontem["qtd_int_pix"], ontem["qtd_int_cc"], ontem["qtd_meia_cash"], ontem["g_DG"]) == (3, 1, 2, 4)
+    assert (ontem["rec_pix"], ontem["rec_cash"], ontem["rec_cc"]) == (3000, 1000, 1000)
+    assert (ontem["pagantes"], ontem["publico_total"]) == (6, 10)
+    assert (hoje["qtd_int_cash"], hoje["g_GPD"], hoje["g_TG"], hoje["publico_total"]) == (2, 1, 2, 5)
+
+
+def test_vectorized_pivot_matches_sql(db_session, admin_user):
+    _add_orders(db_session, admin_user.id)
+    df = pd.DataFrame(
+        [(date.today() - timedelta(days=d), tt, pm, reason, qty, price) for d, pm, tt, qty, price, reason in ITEMS],
+        columns=["d", "ticket_type", "payment_method", "discount_reason", "qty", "unit_price_cents"],
+    )
+    assert pivot_bordero_frame(df) == bordero_lines(db_session, date.today() - timedelta(days=1), date.today())
+
+
+def test_archived_days_come_from_legacy_sales(db_session, admin_user):
+    _add_orders(db_session, admin_user.id)
+    old_day = datetime.combine(date.today() - timedelta(days=5), datetime.min.time()).replace(hour=11)
+    db_session.add_all([
+        Sale(sold_at=old_day, ticket_type="inteira", qty=2, unit_price_cents=1000,
+             operator_username="admin", payment_method="pix"),
+        Sale(sold_at=old_day, ticket_type="gratuita", qty=3, unit_price_cents=0,
+             operator_username="admin", payment_method="pix"),
+        # dia que já está em orders: a tabela legada é ignorada
+        Sale(sold_at=old_day + timedelta(days=5), ticket_type="inteira", qty=99, unit_price_cents=1000,
+             operator_username="admin", payment_method="pix"),
+    ])
+    db_session.commit()
+
+    linhas = bordero_lines(db_session, date.today() - timedelta(days=7), date.today())
+    assert [linha["date"] for linha in linhas] == [date.today() - timedelta(days=d) for d in (5, 1, 0)]
+    assert (linhas[0]["qtd_int_pix"], linhas[0]["g_TG"], linhas[0]["rec_pix"]) == (2, 3, 2000)
+    assert linhas[2]["qtd_int_pix"] == 0
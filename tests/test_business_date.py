@@ -0,0 +1,92 @@
+"""
+Business date tests
+"""
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.models import GroupVisit, Order, OrderItem
+from app.services import business_date as business_date_module
+from app.services.business_date import business_date
+
+
+@pytest.fixture
+def recife(monkeypatch):
+    monkeypatch.setattr(settings, "venue_timezone", "America/Recife")
+    monkeypatch.setattr(settings, "business_day_cutoff_hour", 0)
+
+
+def test_late_evening_sales_belong_to_the_local_day(recife, monkeypatch):
+    # 01:30 UTC = 22:30 do dia anterior em Recife (UTC-3)
+    assert business_date(datetime(2024, 3, 5, 1, 30)) == date(2024, 3, 4)
+    assert business_date(datetime(2024, 3, 5, 3, 0)) == date(2024, 3, 5)
+    assert business_date(datetime(2024, 3, 5, 1, 30, tzinfo=timezone.utc)) == date(2024, 3, 4)
+    assert business_date(datetime(2024, 3, 5, 1, 30), local=True) == date(2024, 3, 5)
+
+    # Com virada às 03h locais, 02:00 de Recife (05:00 UTC) ainda é o dia anterior
+    monkeypatch.setattr(settings, "business_day_cutoff_hour", 3)
+    assert business_date(datetime(2024, 3, 5, 5, 0)) == date(2024, 3, 4)
+    assert business_date(datetime(2024, 3, 5, 6, 0)) == date(2024, 3, 5)
+    assert business_date(datetime(2024, 3, 5, 2, 59), local=True) == date(2024, 3, 4)
+
+
+def test_stored_on_insert(recife, db_session, admin_user):
+    order = Order(user_id=admin_user.id, payment_method="pix", created_at=datetime(2024, 3, 5, 1, 30))
+    visit = GroupVisit(date=datetime(2024, 3, 5, 9, 0), size=30, institution="Escola")
+    db_session.add_all([order, visit])
+    db_session.commit()
+    assert order.business_date == date(2024, 3, 4)
+    assert visit.business_date == date(2024, 3, 5)
+
+    # Inserts em lote (Core) também recebem a data, linha a linha
+    db_session.execute(insert(Order), [
+        {"user_id": admin_user.id, "payment_method": "pix", "created_at": datetime(2024, 3, 6, hour)}
+        for hour in (2, 14)
+    ])
+    days = db_session.execute(select(Order.business_date).where(Order.id != order.id).order_by(Order.id)).scalars()
+    assert list(days) == [date(2024, 3, 5), date(2024, 3, 6)]
+
+    # Sem created_at explícito vale o dia corrente do museu
+    now = Order(user_id=admin_user.id, payment_method="pix")
+    db_session.add(now)
+    db_session.commit()
+    assert now.business_date == business_date()
+
+
+def test_reports_bucket_by_business_date(recife, admin_client: TestClient, db_session, admin_user):
+    for created_at, pm in ((datetime(2024, 3, 5, 1, 30), "pix"), (datetime(2024, 3, 5, 12, 0), "credito")):
+        order = Order(user_id=admin_user.id, payment_method=pm, created_at=created_at)
+        order.items.append(OrderItem(ticket_type="inteira", qty=1, unit_price_cents=1000))
+        db_session.add(order)
+    db_session.commit()
+
+    day = "2024-03-04"
+    response = admin_client.get("/reports/by-payment-method", params={"start_date": day, "end_date": day})
+    assert response.status_code == 200
+    assert response.text.splitlines()[1:] == ["pix,1,10.0"]
+
+    cube = admin_client.get("/reports/api/cube", params={
+        "start_date": "2024-03-01", "end_date": "2024-03-31", "dimensions": "day,payment_method", "measures": "people",
+    }).json()
+    assert cube["rows"] == [["2024-03-04", "pix", 1], ["2024-03-05", "credito", 1]]
+
+    summary = admin_client.get("/api/reports/summary").json()["data"]
+    assert [(d["dia"], d["ingressos"]) for d in summary] == [("2024-03-05", 1), ("2024-03-04", 1)]
+
+
+def test_report_defaults_end_on_the_business_day(recife, admin_client: TestClient, db_session, admin_user,
+                                                 monkeypatch):
+    monkeypatch.setattr(business_date_module, "today", lambda: date(2024, 3, 11))
+    # 01:30 UTC do dia 12 ainda é dia 11 em Recife
+    order = Order(user_id=admin_user.id, payment_method="pix", created_at=datetime(2024, 3, 12, 1, 30))
+    order.items.append(OrderItem(ticket_type="inteira", qty=2, unit_price_cents=1000))
+    db_session.add(order)
+    db_session.commit()
+
+    response = admin_client.get("/reports/by-payment-method")
+    assert response.status_code == 200
+    assert "formas_pagamento_2024-02-10_2024-03-11.csv" in response.headers["content-disposition"]
+    assert response.text.splitlines()[1:] == ["pix,2,20.0"]
@@ -0,0 +1,241 @@
+"""
+Time-slot capacity tests
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, func, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.db import Base
+from app.models import Order, User, CapacitySlot, CapacityAllocation
+from app.schemas import OrderCreate
+from app.services import business_date, capacity
+from app.services.ingest import add_order
+from app.services.journal import SaleJournal, apply_entry, make_entry
+
+SLOT = datetime(2026, 5, 18, 10, 0)
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def capacity_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "capacity_per_slot", 100)
+    monkeypatch.setattr(settings, "capacity_slot_minutes", 60)
+    monkeypatch.setattr(settings, "capacity_shards", 8)
+    return settings
+
+
+def test_slot_for_floors_to_slot_start(capacity_settings, monkeypatch):
+    monkeypatch.setattr(capacity_settings, "capacity_slot_minutes", 30)
+    assert capacity.slot_for(datetime(2026, 5, 18, 10, 47, 12)) == datetime(2026, 5, 18, 10, 30)
+
+
+def test_reserve_splits_across_shards_and_releases(db_session, capacity_settings, test_user):
+    """A group larger than one shard is spread over several; delete frees the seats"""
+    order = add_order(db_session, test_user.id, OrderCreate(
+        payment_method="pix", items=[{"ticket_type": "inteira", "qty": 40}]))
+    db_session.flush()
+    assert capacity.reserve(db_session, order.id, SLOT.replace(minute=20), 40) == SLOT
+    db_session.commit()
+
+    assert db_session.query(func.sum(CapacitySlot.reserved)).scalar() == 40
+    assert db_session.query(CapacityAllocation).count() > 1
+
+    with pytest.raises(capacity.CapacityExceeded) as exc:
+        capacity.reserve(db_session, order.id, SLOT, 61)
+    assert exc.value.available == 60
+    db_session.rollback()
+
+    assert capacity.release(db_session, order.id) == 40
+    db_session.commit()
+    assert db_session.query(func.sum(CapacitySlot.reserved)).scalar() == 0
+
+
+def test_disabled_by_default(db_session):
+    assert capacity.reserve(db_session, 1, SLOT, 10_000) is None
+
+
+def test_create_group_rejects_overbooking(admin_client: TestClient, db_session, capacity_settings):
+    """create_group answers 409 once the scheduled slot is full"""
+    form = {
+        "visit_type": "agendada",
+        "institution_name": "Escola Municipal",
+        "responsible_name": "Ana",
+        "scheduled_date": "2026-05-18T10:00",
+        "qtd_gratuita": 60,
+        "reason_gratuita": "estudante_rede_publica",
+        "payment_method": "pix",
+        "csrf_token": "test-csrf-token",
+    }
+    first = admin_client.post("/groups/new", data=form, follow_redirects=False)
+    assert first.status_code == 303
+    second = admin_client.post("/groups/new", data=form, follow_redirects=False)
+    assert second.status_code == 409
+    assert db_session.query(Order).count() == 1
+
+    slots = admin_client.get("/api/capacity", params={"day": "2026-05-18"}).json()["slots"]
+    assert slots == [{"slot_start": "2026-05-18T10:00:00", "capacity": 100,
+                      "reserved": 60, "available": 40}]
+
+
+def test_walk_in_group_uses_venue_clock(admin_client: TestClient, db_session, capacity_settings, monkeypatch):
+    """Unscheduled groups and the default availability view follow VENUE_TIMEZONE, not the host clock"""
+    # Fuso cujo dia local difere sempre do dia UTC, a qualquer hora do teste
+    venue = "Etc/GMT+12" if datetime.utcnow().hour < 12 else "Etc/GMT-14"
+    monkeypatch.setattr(capacity_settings, "venue_timezone", venue)
+    monkeypatch.setattr(capacity_settings, "capacity_slot_minutes", 24 * 60)
+    response = admin_client.post("/groups/new", data={
+        "visit_type": "espontanea",
+        "institution_name": "Escola Estadual",
+        "responsible_name": "Bia",
+        "qtd_inteira": 7,
+        "payment_method": "pix",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+    assert response.status_code == 303
+
+    expected = capacity.slot_for(business_date.local_time())
+    assert db_session.query(CapacitySlot.slot_start).distinct().scalar() == expected
+    slots = admin_client.get("/api/capacity").json()["slots"]
+    assert [(s["slot_start"], s["reserved"]) for s in slots] == [(expected.isoformat(), 7)]
+
+
+def test_every_sale_path_reserves_seats(admin_client: TestClient, db_session, capacity_settings, tmp_path,
+                                        monkeypatch):
+    """Terminal sync, bulk ingest and journal replay hold seats like the counter form"""
+    monkeypatch.setattr(capacity_settings, "capacity_slot_minutes", 24 * 60)  # um horário por dia
+    sold_at = datetime.utcnow().replace(microsecond=0)
+    headers = {"X-CSRF-Token": "test-csrf-token"}
+    sales = [{"client_id": f"cap-sale-{n:04d}", "sold_at": sold_at.isoformat(), "qtd_inteira": 40,
+              "payment_method": "pix"} for n in range(3)]
+    results = admin_client.post("/sync/sales", json={"sales": sales}, headers=headers).json()["results"]
+    assert [r["status"] for r in results] == ["created", "created", "error"]
+    assert results[2]["errors"][0].startswith("Capacidade esgotada")
+
+    bulk = [{"channel": "online", "payment_method": "pix", "items": [{"ticket_type": "inteira", "qty": n}]}
+            for n in (15, 10)]
+    response = admin_client.post("/api/orders/bulk", json=bulk)
+    assert [json.loads(line)["status"] for line in response.text.splitlines()] == ["created", "error"]
+
+    journal = SaleJournal(str(tmp_path / "sales.ndjson"))
+    for n in (5, 1):
+        journal.append(make_entry(OrderCreate(payment_method="pix", items=[{"ticket_type": "inteira", "qty": n}]),
+                                  1, f"cap-journal-{n}", datetime.utcnow()))
+    journal.replay(lambda entry: apply_entry(db_session, entry))
+    assert journal.stats()["rejected"] == 1
+
+    assert db_session.query(func.sum(CapacitySlot.reserved)).scalar() == 100
+    assert db_session.query(Order).count() == 4
+
+
+def test_concurrent_reservations_never_overbook(tmp_path, capacity_settings):
+    """Hundreds of simultaneous reservations fill the slot exactly to capacity"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'capacity.db'}",
+        connect_args={"check_same_thread": False, "timeout": 60},
+        poolclass=NullPool,
+    )
+
+    # pysqlite: transações de escrita explícitas evitam SQLITE_BUSY na promoção de lock
+    @event.listens_for(engine, "connect")
+    def _no_autobegin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user = User(username="caixa", password_hash="x", role="bilheteira")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    workers = 300
+    barrier = threading.Barrier(workers)
+    outcomes = []
+
+    def sell():
+        db = Session()
+        try:
+            barrier.wait()
+            order = add_order(db, user_id, OrderCreate(
+                payment_method="pix", items=[{"ticket_type": "inteira", "qty": 1}]))
+            db.flush()
+            capacity.reserve(db, order.id, SLOT, 1)
+            db.commit()
+            outcomes.append("ok")
+        except capacity.CapacityExceeded:
+            db.rollback()
+            outcomes.append("full")
+        except Exception as e:
+            db.rollback()
+            outcomes.append(repr(e))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=sell) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes.count("ok") == 100
+    assert outcomes.count("full") == 200
+    with Session() as db:
+        assert db.query(func.sum(CapacitySlot.reserved)).scalar() == 100
+        assert db.query(func.sum(CapacityAllocation.qty)).scalar() == 100
+        assert db.query(Order).count() == 100
+    engine.dispose()
+
+
+def test_skip_locked_query_locks_a_single_random_shard(db_session):
+    sql = str(capacity._unlocked_shard_query(db_session, SLOT, {3, 5}).statement.compile(
+        dialect=postgresql.dialect()))
+    assert "ORDER BY random()" in sql
+    assert "LIMIT" in sql and sql.rstrip().endswith("FOR UPDATE SKIP LOCKED")
+    assert "NOT IN" in sql
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+def test_postgres_open_reservation_does_not_block_others(capacity_settings):
+    """A transaction holding one seat leaves the other shards free for the next sale"""
+    engine = create_engine(POSTGRES_URL, poolclass=NullPool)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    try:
+        with Session() as db:
+            user = User(username="caixa", password_hash="x", role="bilheteira")
+            db.add(user)
+            db.commit()
+            user_id = user.id
+
+        def sale(db):
+            order = add_order(db, user_id, OrderCreate(
+                payment_method="pix", items=[{"ticket_type": "inteira", "qty": 1}]))
+            db.flush()
+            capacity.reserve(db, order.id, SLOT, 1)
+
+        with Session() as holder, Session() as other:
+            sale(holder)  # transação aberta com um shard travado
+            other.execute(text("SET LOCAL lock_timeout = '2s'"))
+            sale(other)
+            other.commit()
+            holder.commit()
+        with Session() as db:
+            assert db.query(func.sum(CapacitySlot.reserved)).scalar() == 2
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
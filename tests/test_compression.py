@@ -0,0 +1,108 @@
+"""
+Response compression middleware tests
+"""
+import asyncio
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware import CompressionMiddleware, choose_encoding
+
+CSV_LINE = "2024-01-01,Escola Estadual de Petrolina,PE,32\r\n"
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+async def _csv(request):
+    return StreamingResponse((CSV_LINE * 100 for _ in range(5)), media_type="text/csv")
+
+
+async def _html(request):
+    return PlainTextResponse("<p>Cais do Sertão</p>" * 100, media_type="text/html")
+
+
+async def _tiny(request):
+    return PlainTextResponse("ok")
+
+
+async def _xlsx(request):
+    return Response(b"PK\x03\x04" + b"x" * 2000, media_type=XLSX)
+
+
+def _app(**options):
+    routes = [Route("/csv", _csv), Route("/html", _html), Route("/tiny", _tiny), Route("/xlsx", _xlsx)]
+    return CompressionMiddleware(Starlette(routes=routes), **options)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_gzip_html_and_vary():
+    client = TestClient(_app())
+    response = client.get("/html", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < 2200
+    assert response.text == "<p>Cais do Sertão</p>" * 100
+
+
+def test_brotli_when_preferred():
+    pytest.importorskip("brotli")
+    client = TestClient(_app())
+    response = client.get("/csv", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == CSV_LINE * 500
+
+
+def test_skips_xlsx_small_bodies_and_clients_without_support():
+    client = TestClient(_app())
+    assert "content-encoding" not in client.get("/xlsx", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/tiny", headers={"Accept-Encoding": "gzip"}).headers
+    response = client.get("/html", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert len(response.content) == len(("<p>Cais do Sertão</p>" * 100).encode())
+
+
+def test_streaming_flushes_every_chunk():
+    """Each chunk sent by the app is decodable as soon as it arrives"""
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)  # cliente continua conectado
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/csv", "raw_path": b"/csv", "root_path": "",
+             "query_string": b"", "headers": [(b"accept-encoding", b"gzip")], "scheme": "http",
+             "server": ("test", 80), "client": ("test", 1), "http_version": "1.1"}
+    asyncio.run(_app(gzip_level=1)(scope, receive, send))
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    bodies = [m for m in messages[1:] if m["type"] == "http.response.body"]
+    decoder = zlib.decompressobj(31)
+    for message in bodies[:5]:
+        assert message["more_body"] is True
+        assert decoder.decompress(message["body"]) == (CSV_LINE * 100).encode()
+    assert bodies[-1]["more_body"] is False
+    decoder.decompress(bodies[-1]["body"])
+    assert decoder.eof
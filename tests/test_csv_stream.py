@@ -0,0 +1,59 @@
+"""
+Streaming CSV export tests
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app.models import GroupVisit
+from app.services.csv_stream import stream_csv
+
+
+def _parse(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode("utf-8-sig"), newline="")))
+
+
+def test_quoting_round_trips():
+    rows = [("Escola, \"Centro\"", "linha 1\nlinha 2", None, Decimal("10.50"), True)]
+    data = b"".join(stream_csv(["a", "b", "c", "d", "e"], rows))
+    assert data.startswith(b"a,b,c,d,e\r\n")
+    assert _parse(data)[1] == ["Escola, \"Centro\"", "linha 1\nlinha 2", "", "10.50", "Sim"]
+
+
+def test_bom_and_batches():
+    chunks = list(stream_csv(["n"], ((n,) for n in range(25)), bom=True, batch_rows=10))
+    assert len(chunks) == 3
+    assert chunks[0].startswith("\ufeff".encode("utf-8"))
+    assert [row[0] for row in _parse(b"".join(chunks))[1:]] == [str(n) for n in range(25)]
+
+
+def test_groups_csv_keeps_commas(client: TestClient, db_session):
+    db_session.add(GroupVisit(date=datetime.now() - timedelta(days=1), institution="Escola Estadual, Recife",
+                              size=30, state="PE", city="Jaboatão, PE", scheduled=False,
+                              price_total=Decimal("150.00")))
+    db_session.commit()
+
+    response = client.get("/reports/groups/export.csv", params={"bom": True})
+    assert response.status_code == 200
+    assert response.content.startswith("\ufeff".encode("utf-8"))
+    rows = _parse(response.content)
+    assert rows[0] == ["Data", "Instituição", "Pessoas", "UF", "Cidade", "Agendada", "ValorTotal"]
+    assert rows[1][1:] == ["Escola Estadual, Recife", "30", "PE", "Jaboatão, PE", "Não", "150.00"]
+
+
+def test_report_by_state_csv(admin_client: TestClient):
+    for qtd in (2, 3):
+        admin_client.post("/sell", data={
+            "qtd_inteira": qtd,
+            "payment_method": "pix",
+            "state": "PE",
+            "csrf_token": "test-csrf-token",
+        }, follow_redirects=False)
+
+    response = admin_client.get("/reports/by-state")
+    assert response.status_code == 200
+    assert "pessoas_por_uf_" in response.headers["content-disposition"]
+    assert _parse(response.content) == [["UF", "Pessoas", "Receita (R$)"], ["PE", "5", "50.0"]]
@@ -0,0 +1,95 @@
+"""
+Sales cube API tests
+"""
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models import Order, OrderItem
+from app.services import business_date, cube
+from app.services.cube import CubeCache
+
+ORDERS = [
+    # (quando, canal, pagamento, UF, [(tipo, qtd, preço, motivo)])
+    (datetime(2024, 3, 4, 10), "balcao", "pix", "PE", [("inteira", 2, 1000, None), ("meia", 1, 500, "estudante")]),
+    (datetime(2024, 3, 6, 15), "balcao", "credito", "BA", [("inteira", 1, 1000, None)]),
+    (datetime(2024, 3, 11, 9), "online", "pix", "PE", [("inteira", 3, 1000, None)]),
+    (datetime(2024, 4, 2, 11), "grupo", "pix", "PE", [("gratuita", 10, 0, "escola")]),
+]
+RANGE = {"start_date": "2024-03-01", "end_date": "2024-04-30"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cube, "_cache", CubeCache(ttl=60))
+
+
+@pytest.fixture
+def orders(db_session, admin_user):
+    for when, channel, pm, uf, items in ORDERS:
+        order = Order(user_id=admin_user.id, created_at=when, channel=channel, payment_method=pm, state=uf)
+        for tt, qty, price, reason in items:
+            order.items.append(OrderItem(ticket_type=tt, qty=qty, unit_price_cents=price, discount_reason=reason))
+        db_session.add(order)
+    db_session.commit()
+
+
+def _cube(client, **params):
+    response = client.get("/reports/api/cube", params={**RANGE, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_dimensions_and_measures(admin_client: TestClient, orders):
+    answer = _cube(admin_client, dimensions="state,payment_method", measures="people,revenue,orders")
+    assert answer["dimensions"] == ["state", "payment_method"]
+    assert answer["measures"] == ["people", "revenue", "orders"]
+    assert answer["rows"] == [["PE", "pix", 16, 55.0, 3], ["BA", "credito", 1, 10.0, 1]]
+    assert answer["truncated"] is False
+
+    totals = _cube(admin_client, measures="orders,people")
+    assert totals["rows"] == [[4, 17]]
+
+
+def test_date_buckets_and_operator(admin_client: TestClient, orders):
+    weeks = _cube(admin_client, dimensions="week", measures="people")
+    assert weeks["rows"] == [["2024-03-04", 4], ["2024-03-11", 3], ["2024-04-01", 10]]
+
+    months = _cube(admin_client, dimensions="month,channel", measures="revenue")
+    assert months["rows"] == [["2024-03", "balcao", 35.0], ["2024-03", "online", 30.0], ["2024-04", "grupo", 0.0]]
+
+    by_operator = _cube(admin_client, dimensions="operator,discount_reason", measures="people")
+    assert by_operator["rows"] == [["admin", "escola", 10], ["admin", None, 6], ["admin", "estudante", 1]]
+
+
+def test_default_range_ends_on_the_venue_business_day(admin_client: TestClient, orders, monkeypatch):
+    monkeypatch.setattr(business_date, "today", lambda: date(2024, 3, 11))
+    response = admin_client.get("/reports/api/cube", params={"measures": "people"})
+    assert response.status_code == 200, response.text
+    assert response.json()["rows"] == [[7]]
+
+
+def test_limit_truncates_and_cache_answers_repeats(admin_client: TestClient, orders):
+    first = _cube(admin_client, dimensions="day", limit=2)
+    assert len(first["rows"]) == 2 and first["truncated"] is True
+    assert first["cached"] is False
+
+    again = _cube(admin_client, dimensions="day", limit=2)
+    assert again["cached"] is True and again["rows"] == first["rows"]
+    assert cube.get_cube_cache().stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("params", [
+    {"dimensions": "state,color"},
+    {"measures": "profit"},
+    {"dimensions": "day,month"},
+    {"dimensions": "state,state"},
+    {"dimensions": "state,city,channel,ticket_type,operator"},
+    {"limit": 0},
+    {"limit": 100000},
+    {"start_date": "2020-01-01", "end_date": "2024-01-01"},
+    {"start_date": "2024-02-01", "end_date": "2024-01-01"},
+])
+def test_rejects_requests_over_the_limits(admin_client: TestClient, params):
+    assert admin_client.get("/reports/api/cube", params={**RANGE, **params}).status_code == 400
@@ -0,0 +1,86 @@
+"""
+Export delivery tests
+"""
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.services.delivery import deliver_file, stream_download, export_metrics, content_disposition
+
+
+@pytest.fixture
+def small_spool(monkeypatch, tmp_path):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "export_spool_max_bytes", 1024)
+    monkeypatch.setattr(settings, "export_temp_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def export_app():
+    app = FastAPI()
+
+    @app.get("/small")
+    def small():
+        return deliver_file(lambda f: f.write(b"a,b\n1,2\n"), "small.csv", "text/csv")
+
+    @app.get("/large")
+    def large():
+        return deliver_file(lambda f: f.write(b"x" * 200_000), "relatório.csv", "text/csv")
+
+    @app.get("/stream")
+    def stream():
+        return stream_download(iter(["uma,", "linha\n"]), "stream.csv", "text/csv")
+
+    return TestClient(app)
+
+
+def test_small_exports_stay_in_memory(export_app, small_spool):
+    before = export_metrics.stats()
+    response = export_app.get("/small")
+    assert response.content == b"a,b\n1,2\n"
+    assert response.headers["content-disposition"] == 'attachment; filename="small.csv"'
+
+    after = export_metrics.stats()
+    assert after["exports"]["memory"] == before["exports"]["memory"] + 1
+    assert after["temp_files"] == before["temp_files"]
+
+
+def test_large_exports_spill_and_are_released(export_app, small_spool):
+    before = export_metrics.stats()
+    response = export_app.get("/large")
+    assert len(response.content) == 200_000
+    assert response.headers["content-length"] == "200000"
+    assert response.headers["content-disposition"] == "attachment; filename*=utf-8''relat%C3%B3rio.csv"
+
+    after = export_metrics.stats()
+    assert after["exports"]["disk"] == before["exports"]["disk"] + 1
+    assert after["bytes_produced"] == before["bytes_produced"] + 200_000
+    assert after["temp_bytes_peak"] >= 200_000
+    # Nada fica para trás: nem arquivo no diretório, nem bytes em uso
+    assert after["temp_files"] == before["temp_files"]
+    assert after["temp_bytes"] == before["temp_bytes"]
+    assert list(small_spool.iterdir()) == []
+
+
+def test_streamed_exports_are_counted(export_app):
+    before = export_metrics.stats()
+    assert export_app.get("/stream").content == "uma,linha\n".encode()
+    after = export_metrics.stats()
+    assert after["bytes_produced"] == before["bytes_produced"] + 10
+    assert after["exports"]["stream"] == before["exports"]["stream"] + 1
+
+
+def test_bordero_is_delivered_without_temp_files(admin_client: TestClient):
+    today = date.today().isoformat()
+    response = admin_client.get("/reports/bordero-cais", params={"start_date": today, "end_date": today})
+    assert response.status_code == 200
+    assert response.content[:2] == b"PK"
+    assert "filename*=utf-8''Border%C3%B4_Cais_" in response.headers["content-disposition"]
+
+
+def test_content_disposition_plain_ascii():
+    assert content_disposition("grupos.csv") == 'attachment; filename="grupos.csv"'
@@ -0,0 +1,149 @@
+"""
+Background export job tests
+"""
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from app.models import ExportJob
+from app.services import export_jobs as export_jobs_module
+from app.services.export_jobs import ExportJobManager
+from tests.conftest import TestingSessionLocal
+
+TODAY = date.today().isoformat()
+
+
+class InlineExecutor:
+    """Runs submitted jobs immediately, or holds them when paused"""
+
+    def __init__(self, paused=False):
+        self.paused = paused
+        self.held = []
+
+    def submit(self, fn, *args):
+        if self.paused:
+            self.held.append((fn, args))
+        else:
+            fn(*args)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def jobs(db_session, tmp_path, monkeypatch):
+    manager = ExportJobManager(TestingSessionLocal, str(tmp_path), workers=1, queue_limit=2,
+                               ttl=timedelta(hours=1))
+    manager._executor = InlineExecutor()
+    monkeypatch.setattr(export_jobs_module, "_manager", manager)
+    return manager
+
+
+def _sell(client, qtd):
+    client.post("/sell", data={
+        "qtd_inteira": qtd,
+        "payment_method": "pix",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+
+
+def test_bordero_job_runs_and_downloads(jobs, admin_client: TestClient):
+    _sell(admin_client, 3)
+
+    response = admin_client.post("/exports/jobs", json={"kind": "bordero", "start_date": TODAY, "end_date": TODAY})
+    assert response.status_code == 202
+    job = response.json()
+
+    status = admin_client.get(job["status_url"]).json()
+    assert status["status"] == "done"
+    assert status["progress"] == 100
+    assert status["filename"].startswith("Borderô_Cais_")
+
+    download = admin_client.get(job["download_url"])
+    assert download.status_code == 200
+    ws = load_workbook(io.BytesIO(download.content))["borderô"]
+    assert ws["C15"].value == 0 and ws["D15"].value == 3  # inteira em pix
+
+
+def test_report_job_and_listing(jobs, admin_client: TestClient):
+    job = admin_client.post("/exports/jobs", json={"kind": "report", "start_date": TODAY, "end_date": TODAY}).json()
+    assert admin_client.get(job["download_url"]).status_code == 200
+    listed = admin_client.get("/exports/jobs").json()
+    assert [j["id"] for j in listed] == [job["id"]]
+
+
+def test_queue_limit_and_pending_download(jobs, admin_client: TestClient):
+    jobs._executor = InlineExecutor(paused=True)
+    body = {"kind": "report", "start_date": TODAY, "end_date": TODAY}
+    first = admin_client.post("/exports/jobs", json=body).json()
+    assert admin_client.post("/exports/jobs", json=body).status_code == 202
+    full = admin_client.post("/exports/jobs", json=body)
+    assert full.status_code == 503
+    assert full.headers["retry-after"] == "30"
+
+    pending = admin_client.get(first["download_url"])
+    assert pending.status_code == 409
+    assert pending.json()["status"] == "queued"
+
+    for fn, args in jobs._executor.held:
+        fn(*args)
+    assert jobs.stats()["active"] == 0
+    assert admin_client.get(first["download_url"]).status_code == 200
+
+
+def test_unfinished_jobs_resume_on_start(jobs, db_session, admin_user):
+    db_session.add(ExportJob(id="a" * 32, kind="report", status="running", progress=40, user_id=admin_user.id,
+                             params=json.dumps({"start_date": TODAY, "end_date": TODAY})))
+    db_session.commit()
+
+    jobs.start()
+    db_session.expire_all()
+    job = db_session.get(ExportJob, "a" * 32)
+    assert job.status == "done"
+    assert job.size_bytes > 0
+
+
+def test_expired_artifacts_are_removed(jobs, admin_client: TestClient, db_session, tmp_path):
+    jobs.ttl = timedelta(seconds=-1)
+    job = admin_client.post("/exports/jobs", json={"kind": "report", "start_date": TODAY, "end_date": TODAY}).json()
+
+    # run_job purga ao terminar; o artefato já nasce vencido
+    assert admin_client.get(job["download_url"]).status_code == 410
+    assert db_session.get(ExportJob, job["id"]).status == "expired"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_range_is_rejected(jobs, admin_client: TestClient):
+    response = admin_client.post("/exports/jobs", json={"kind": "bordero", "start_date": TODAY,
+                                                        "end_date": (date.today() - timedelta(days=1)).isoformat()})
+    assert response.status_code == 422
+
+
+def test_progress_does_not_commit_the_streaming_session(jobs, db_session, admin_user, monkeypatch):
+    """Progress goes through its own session; the builder's read stays open"""
+    seen = []
+
+    def builder(db, start_dt, end_dt, out, progress):
+        rows = db.execute(select(ExportJob.id).execution_options(yield_per=1))
+        progress(40)
+        seen.append((db.in_transaction(), [r.id for r in rows]))
+        with TestingSessionLocal() as other:
+            seen.append(other.get(ExportJob, job.id).progress)
+        out.write(b"ok")
+        return "teste.txt"
+
+    monkeypatch.setitem(export_jobs_module.EXPORT_KINDS, "teste", (builder, "text/plain"))
+    job = ExportJob(id="b" * 32, kind="teste", status="queued", progress=0, user_id=admin_user.id,
+                    params=json.dumps({"start_date": TODAY, "end_date": TODAY}))
+    db_session.add(job)
+    db_session.commit()
+
+    jobs.run_job(job.id)
+    assert seen == [(True, [job.id]), 40]
+    db_session.refresh(job)
+    assert job.status == "done" and job.progress == 100
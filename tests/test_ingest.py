@@ -0,0 +1,131 @@
+"""
+Bulk ingest API tests
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from app.models import Order, OrderItem
+from app.routes import ingest as ingest_routes
+
+
+def _record(**overrides):
+    record = {
+        "channel": "online",
+        "payment_method": "pix",
+        "state": "pe",
+        "city": "Recife",
+        "items": [
+            {"ticket_type": "inteira", "qty": 2},
+            {"ticket_type": "meia", "qty": 1, "discount_reason": "idoso"},
+        ],
+    }
+    record.update(overrides)
+    return record
+
+
+def _results(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_bulk_requires_auth(client: TestClient):
+    """Bulk ingest is not available to anonymous users"""
+    response = client.post("/api/orders/bulk", json=[_record()])
+    assert response.status_code == 401
+
+
+def test_bulk_json_array(admin_client: TestClient, db_session):
+    """A JSON array is inserted and reported record by record"""
+    response = admin_client.post("/api/orders/bulk", json=[_record(), _record(payment_method="debito")])
+    assert response.status_code == 200
+    results = _results(response)
+    assert [r["status"] for r in results] == ["created", "created"]
+    assert response.headers["X-Ingest-Created"] == "2"
+
+    orders = db_session.query(Order).order_by(Order.id).all()
+    assert [o.payment_method for o in orders] == ["pix", "debito"]
+    assert orders[0].state == "PE"
+    assert orders[0].channel == "online"
+    items = db_session.query(OrderItem).filter(OrderItem.order_id == orders[0].id).all()
+    assert sorted((i.ticket_type, i.qty, i.unit_price_cents) for i in items) == [
+        ("inteira", 2, 1000), ("meia", 1, 500)
+    ]
+
+
+def test_bulk_ndjson_partial_failure(admin_client: TestClient, db_session):
+    """Invalid NDJSON lines fail individually without affecting the others"""
+    lines = [
+        json.dumps(_record()),
+        "{not json",
+        json.dumps(_record(payment_method="boleto")),
+        json.dumps(_record(channel="grupo")),
+        json.dumps(_record(items=[{"ticket_type": "inteira", "qty": 0}])),
+        json.dumps(_record(channel="parceiro")),
+    ]
+    response = admin_client.post(
+        "/api/orders/bulk",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = _results(response)
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["status"] for r in results] == ["created", "error", "error", "error", "error", "created"]
+    assert response.headers["X-Ingest-Failed"] == "4"
+    assert db_session.query(Order).count() == 2
+
+
+def test_bulk_batches_across_transactions(admin_client: TestClient, db_session, monkeypatch):
+    """Payloads larger than one batch are committed batch by batch"""
+    from app.config import get_settings
+    monkeypatch.setattr(get_settings(), "ingest_batch_size", 3)
+
+    response = admin_client.post("/api/orders/bulk", json=[_record() for _ in range(10)])
+    results = _results(response)
+    assert len(results) == 10
+    assert all(r["status"] == "created" for r in results)
+    assert len({r["order_id"] for r in results}) == 10
+    assert db_session.query(Order).count() == 10
+
+
+def test_bulk_truncated_array(admin_client: TestClient, db_session):
+    """A truncated JSON array keeps the records parsed before the error"""
+    body = "[" + json.dumps(_record()) + "," + json.dumps(_record())[:20]
+    response = admin_client.post(
+        "/api/orders/bulk", content=body, headers={"Content-Type": "application/json"}
+    )
+    results = _results(response)
+    assert results[0]["status"] == "created"
+    assert results[-1]["status"] == "error"
+    assert db_session.query(Order).count() == 1
+
+
+@pytest.mark.parametrize("body", ["[,{}]", "[{},,{}]", "[{},]", "[{} {}]"])
+def test_bulk_array_requires_single_commas(admin_client: TestClient, db_session, body):
+    """Elements must be separated by exactly one comma"""
+    body = body.replace("{}", json.dumps(_record()))
+    response = admin_client.post(
+        "/api/orders/bulk", content=body, headers={"Content-Type": "application/json"}
+    )
+    results = _results(response)
+    assert results[-1]["status"] == "error"
+    assert db_session.query(Order).count() == sum(r["status"] == "created" for r in results)
+
+
+def test_bulk_inserts_run_off_the_event_loop(admin_client: TestClient, monkeypatch):
+    threads_with_loop = []
+    insert_batch = ingest_routes.insert_batch
+
+    def tracking_insert_batch(*args):
+        try:
+            asyncio.get_running_loop()
+            threads_with_loop.append(True)
+        except RuntimeError:
+            threads_with_loop.append(False)
+        return insert_batch(*args)
+
+    monkeypatch.setattr(ingest_routes, "insert_batch", tracking_insert_batch)
+    response = admin_client.post("/api/orders/bulk", json=[_record(), _record()])
+    assert [r["status"] for r in _results(response)] == ["created", "created"]
+    assert threads_with_loop and not any(threads_with_loop)
@@ -0,0 +1,121 @@
+"""
+Sales journal (store-and-forward) tests
+"""
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+
+from app.db import get_db
+from app.main import app
+from app.models import Order
+from app.services import journal as journal_module
+from app.services.journal import SaleJournal, JournalReplayer
+from tests.conftest import TestingSessionLocal
+
+
+def test_replay_in_order_and_stop_when_db_down(tmp_path):
+    """Entries replay in append order and stay queued while the DB is down"""
+    journal = SaleJournal(str(tmp_path / "sales.ndjson"))
+    for n in range(5):
+        journal.append({"n": n})
+    assert journal.depth() == 5
+
+    seen = []
+
+    def flaky(entry):
+        if entry["n"] == 3 and not seen.count("retry"):
+            seen.append("retry")
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        seen.append(entry["n"])
+
+    assert journal.replay(flaky) == 3
+    assert journal.depth() == 2
+    assert journal.last_error
+
+    # Reabre o arquivo como após um restart: a posição é preservada
+    reopened = SaleJournal(str(tmp_path / "sales.ndjson"))
+    assert reopened.depth() == 2
+    assert reopened.replay(flaky) == 2
+    assert seen == [0, 1, 2, "retry", 3, 4]
+    assert reopened.depth() == 0
+    assert (tmp_path / "sales.ndjson").stat().st_size == 0
+
+
+def test_poison_entries_are_rejected(tmp_path):
+    """Entries failing for non-connectivity reasons are moved aside"""
+    journal = SaleJournal(str(tmp_path / "sales.ndjson"))
+    journal.append({"n": 1})
+    journal.append({"n": 2})
+
+    def handler(entry):
+        if entry["n"] == 1:
+            raise ValueError("bad entry")
+
+    assert journal.replay(handler) == 2
+    assert journal.stats()["rejected"] == 1
+    rejected = (tmp_path / "sales.ndjson.rejected").read_text().splitlines()
+    assert [json.loads(line)["n"] for line in rejected] == [1]
+
+
+@pytest.fixture
+def tmp_journal(tmp_path, monkeypatch):
+    journal = SaleJournal(str(tmp_path / "sales.ndjson"))
+    replayer = JournalReplayer(journal, TestingSessionLocal, interval=60)
+    monkeypatch.setattr(journal_module, "_journal", journal)
+    monkeypatch.setattr(journal_module, "_replayer", replayer)
+    return journal, replayer
+
+
+def test_create_sale_is_journaled_when_db_is_down(admin_client: TestClient, db_session, tmp_journal):
+    """A counter sale survives a database outage and is replayed afterwards"""
+    journal, replayer = tmp_journal
+    broken = sessionmaker(bind=create_engine("sqlite:////nonexistent-dir/bilheteria.db"))()
+    app.dependency_overrides[get_db] = lambda: broken
+
+    response = admin_client.post("/sell", data={
+        "qtd_inteira": 2,
+        "qtd_meia": 1,
+        "reason_meia": "idoso",
+        "payment_method": "pix",
+        "state": "PE",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+    assert response.status_code == 303
+    assert response.headers["location"] == "/sell?journaled=1"
+    assert journal.depth() == 1
+    assert db_session.query(Order).count() == 0
+
+    assert replayer.drain() == 1
+    assert journal.depth() == 0
+    order = db_session.query(Order).one()
+    assert order.payment_method == "pix"
+    assert order.client_id
+    assert len(order.items) == 2
+
+    # Replay repetido não duplica a venda
+    journal.append(journal_module.make_entry(
+        journal_module.OrderCreate(payment_method="pix", items=[{"ticket_type": "inteira", "qty": 1}]),
+        order.user_id, order.client_id, order.created_at,
+    ))
+    replayer.drain()
+    assert db_session.query(Order).count() == 1
+
+
+def test_large_counter_sales_are_accepted_and_replayed(admin_client: TestClient, db_session, tmp_journal):
+    """The counter form has no per-type cap, online or through the journal"""
+    journal, replayer = tmp_journal
+    form = {"qtd_inteira": 150, "payment_method": "pix", "csrf_token": "test-csrf-token"}
+
+    response = admin_client.post("/sell", data=form, follow_redirects=False)
+    assert response.headers["location"] == "/dashboard"
+
+    broken = sessionmaker(bind=create_engine("sqlite:////nonexistent-dir/bilheteria.db"))()
+    app.dependency_overrides[get_db] = lambda: broken
+    response = admin_client.post("/sell", data=form, follow_redirects=False)
+    assert response.headers["location"] == "/sell?journaled=1"
+
+    assert replayer.drain() == 1 and journal.stats()["rejected"] == 0
+    assert [item.qty for order in db_session.query(Order).all() for item in order.items] == [150, 150]
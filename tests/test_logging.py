@@ -0,0 +1,63 @@
+"""
+Logging pipeline tests
+"""
+import json
+import logging
+
+import pytest
+
+from app.config import settings
+from app.logging_config import (BoundedQueueHandler, SamplingFilter, logging_stats, parse_sampling,
+                                setup_logging, shutdown_logging)
+
+
+def _record(name, level=logging.INFO, msg="event %d", args=(1,)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_sampling_keeps_one_in_n_per_logger():
+    assert parse_sampling(" bilheteria.queries=3, app=1 ,") == {"bilheteria.queries": 3}
+    with pytest.raises(ValueError):
+        parse_sampling("bilheteria.queries=often")
+
+    sampling = SamplingFilter({"bilheteria.queries": 3, "bilheteria.queries.slow": 2})
+    kept = [sampling.filter(_record("bilheteria.queries")) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert [sampling.filter(_record("bilheteria.queries.slow")) for _ in range(3)] == [True, False, True]
+    # Avisos e outros loggers nunca são amostrados
+    assert all(sampling.filter(_record("bilheteria.queries", logging.WARNING)) for _ in range(3))
+    assert all(sampling.filter(_record("bilheteria.queriesx")) for _ in range(3))
+    assert sampling.sampled_out == 5
+
+
+def test_full_queue_drops_and_counts():
+    handler = BoundedQueueHandler(maxsize=2)
+    for n in range(5):
+        handler.handle(_record("app.test", args=(n,)))
+
+    assert handler.dropped == 3
+    queued = [handler.queue.get_nowait() for _ in range(2)]
+    assert [r.msg for r in queued] == ["event 0", "event 1"] and queued[0].args is None
+
+
+def test_records_are_written_as_json_by_the_listener(monkeypatch, capsys):
+    monkeypatch.setattr(settings, "debug", False)
+    monkeypatch.setattr(settings, "log_sampling", "bilheteria.chatty=2")
+    setup_logging()
+    try:
+        logging.getLogger("app.services.test").info("module logger %s", "ok")
+        for n in range(4):
+            logging.getLogger("bilheteria.chatty").info("tick %d", n)
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logging.getLogger("bilheteria.test").exception("failed", extra={"method": "GET", "status": 500})
+        assert logging_stats()["sampled_out"] == 2
+    finally:
+        shutdown_logging()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["message"] for line in lines] == ["module logger ok", "tick 0", "tick 2", "failed"]
+    assert lines[-1]["logger"] == "bilheteria.test" and lines[-1]["status"] == 500
+    assert "RuntimeError: boom" in lines[-1]["exception"]
+    assert logging.getLogger("bilheteria").propagate and logging.getLogger("app").propagate
@@ -0,0 +1,94 @@
+"""
+Per-day report (general and daily exports) tests
+"""
+import asyncio
+import io
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlalchemy.dialects import postgresql
+
+from app.models import Order, OrderItem
+from app.services.reports import per_day_query, per_day_sheets
+
+TODAY = date.today()
+
+
+def _add_orders(db_session, user_id):
+    noon = datetime.combine(TODAY, datetime.min.time()).replace(hour=12)
+    for days_ago, pm, items in [
+        (1, "pix", [("inteira", 2, 1000), ("meia", 1, 500)]),
+        (1, "credito", [("inteira", 1, 1000)]),
+        (0, "pix", [("gratuita", 3, 0)]),
+    ]:
+        order = Order(user_id=user_id, payment_method=pm, created_at=noon - timedelta(days=days_ago))
+        for tt, qty, price in items:
+            order.items.append(OrderItem(ticket_type=tt, qty=qty, unit_price_cents=price))
+        db_session.add(order)
+    db_session.commit()
+
+
+def test_one_query_feeds_three_sheets(db_session, admin_user):
+    _add_orders(db_session, admin_user.id)
+    yesterday = TODAY - timedelta(days=1)
+
+    sheets = {name: list(rows) for name, _, rows in per_day_sheets(db_session, yesterday, TODAY)}
+    assert sheets["Resumo_Diario"] == [(yesterday, 4, 35.0), (TODAY, 3, 0.0)]
+    assert sheets["Por_Tipo"] == [(yesterday, "inteira", 3), (yesterday, "meia", 1), (TODAY, "gratuita", 3)]
+    assert sheets["Por_Pagamento"] == [(yesterday, "credito", 1), (yesterday, "pix", 3), (TODAY, "pix", 3)]
+
+
+def test_empty_grouping_sets_keep_sheet_order(db_session):
+    sheets = per_day_sheets(db_session, TODAY, TODAY)
+    assert [list(rows) for _, _, rows in sheets] == [[], [], []]
+
+
+def test_postgresql_uses_grouping_sets():
+    db = mock.Mock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    sql = str(per_day_query(db, TODAY, TODAY).compile(dialect=postgresql.dialect()))
+    assert "GROUPING SETS" in sql
+    assert "UNION ALL" not in sql
+
+
+def test_daily_and_general_exports_match(admin_client: TestClient, db_session, admin_user):
+    _add_orders(db_session, admin_user.id)
+    params = {"start_date": (TODAY - timedelta(days=1)).isoformat(), "end_date": TODAY.isoformat()}
+
+    workbooks = []
+    for url in ("/reports/api/export", "/reports/daily"):
+        response = admin_client.get(url, params=params)
+        assert response.status_code == 200
+        wb = load_workbook(io.BytesIO(response.content))
+        workbooks.append({ws.title: [row for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets})
+
+    general, daily = workbooks
+    assert general == daily
+    assert general["Por_Pagamento"][0] == ("Data", "Forma de Pagamento", "Quantidade")
+    assert len(general["Por_Tipo"]) == 4
+
+
+def test_export_query_runs_off_the_event_loop(admin_client: TestClient, db_session, admin_user, monkeypatch):
+    _add_orders(db_session, admin_user.id)
+    on_loop = []
+    execute = db_session.execute
+
+    def tracking_execute(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(db_session, "execute", tracking_execute)
+    sheets = per_day_sheets(db_session, TODAY, TODAY)
+    assert on_loop == []  # nada roda até a primeira linha ser pedida
+    assert list(sheets[0][2]) == [(TODAY, 3, 0.0)]
+
+    on_loop.clear()
+    response = admin_client.get("/reports/api/export")
+    assert response.status_code == 200
+    assert on_loop == [False]
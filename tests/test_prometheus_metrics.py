@@ -0,0 +1,175 @@
+"""
+Prometheus /metrics endpoint tests
+"""
+import math
+import re
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.models import Order, OrderItem
+from app.services.prometheus import Exposition, Histogram
+from tests.conftest import make_session_cookie
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)",?')
+SUFFIXES = {"counter": ("_total",), "gauge": ("",), "histogram": ("_bucket", "_sum", "_count")}
+
+
+def parse(text):
+    """Minimal text-format scraper: {family: (type, [(name, labels, value)])}"""
+    families, current = {}, None
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in families, f"{name} declared twice"
+            families[name] = (kind, [])
+            current = name
+        elif line.startswith("#") or not line:
+            continue
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"bad sample line: {line!r}"
+            name, labels, value = match.groups()
+            kind, samples = families[current]
+            assert name in {current + s for s in SUFFIXES[kind]}, f"{name} outside family {current}"
+            parsed = dict(LABEL.findall(labels or ""))
+            assert LABEL.sub("", labels or "") == "", f"bad labels: {labels!r}"
+            samples.append((name, parsed, float(value)))
+    return families
+
+
+def value(families, family, name=None, **labels):
+    for sample_name, sample_labels, v in families[family][1]:
+        if (name is None or sample_name == name) and sample_labels == labels:
+            return v
+    return 0.0
+
+
+def check_histograms(families):
+    for family, (kind, samples) in families.items():
+        if kind != "histogram":
+            continue
+        series = {}
+        for name, labels, v in samples:
+            key = tuple(sorted((k, x) for k, x in labels.items() if k != "le"))
+            series.setdefault(key, {"buckets": []})
+            if name.endswith("_bucket"):
+                series[key]["buckets"].append((float(labels["le"]), v))
+            else:
+                series[key][name[len(family):]] = v
+        for s in series.values():
+            counts = [v for _, v in s["buckets"]]
+            assert counts == sorted(counts), f"{family} buckets not cumulative"
+            assert s["buckets"][-1] == (math.inf, s["_count"])
+
+
+def test_sales_counters_follow_commits(admin_client: TestClient, db_session, admin_user):
+    before = parse(admin_client.get("/metrics").text)
+
+    order = Order(user_id=admin_user.id, payment_method="pix")
+    order.items.append(OrderItem(ticket_type="inteira", qty=3, unit_price_cents=1000))
+    db_session.add(order)
+    db_session.commit()
+
+    # Como em grupos: itens adicionados só com order_id, após um flush do pedido
+    group = Order(user_id=admin_user.id, payment_method="credito", channel="grupo")
+    db_session.add(group)
+    db_session.flush()
+    db_session.add(OrderItem(order_id=group.id, ticket_type="meia", qty=4, unit_price_cents=500))
+    db_session.commit()
+
+    # Desfeito: não conta
+    db_session.add(Order(user_id=admin_user.id, payment_method="pix",
+                         items=[OrderItem(ticket_type="inteira", qty=9, unit_price_cents=1000)]))
+    db_session.flush()
+    db_session.rollback()
+
+    order.deleted_at = datetime.utcnow()
+    db_session.commit()
+    order.note = "editado depois de excluído"
+    db_session.commit()
+
+    after = parse(admin_client.get("/metrics").text)
+
+    def delta(family, **labels):
+        return value(after, family, **labels) - value(before, family, **labels)
+
+    assert delta("bilheteria_tickets_sold", payment_method="pix", ticket_type="inteira") == 3
+    assert delta("bilheteria_revenue_reais", payment_method="pix", ticket_type="inteira") == 30.0
+    assert delta("bilheteria_tickets_sold", payment_method="credito", ticket_type="meia") == 4
+    assert delta("bilheteria_revenue_reais", payment_method="credito", ticket_type="meia") == 20.0
+    assert delta("bilheteria_orders_voided") == 1
+
+
+def test_exposition_is_scrapeable(admin_client: TestClient):
+    assert admin_client.get("/health/ready").json()["status"] == "ready"
+    response = admin_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    families = parse(response.text)
+    check_histograms(families)
+
+    assert families["bilheteria_http_request_duration_seconds"][0] == "histogram"
+    assert value(families, "bilheteria_http_request_duration_seconds", "bilheteria_http_request_duration_seconds_count",
+                 method="GET", route="/health/ready") >= 1
+    assert value(families, "bilheteria_http_requests", method="GET", route="/health/ready", status="200") >= 1
+    assert value(families, "bilheteria_http_requests_in_flight") >= 1
+    assert families["bilheteria_export_job_duration_seconds"][0] == "histogram"
+    assert {labels["cache"] for _, labels, _ in families["bilheteria_cache_hit_ratio"][1]} == {"cube", "bordero"}
+    assert families["bilheteria_tickets_sold"][0] == "counter"
+    assert families["bilheteria_log_records_dropped"][0] == "counter"
+
+
+def test_metrics_require_token_or_admin(client: TestClient, test_user, monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_token", "s3cr3t-scrape")
+    for path in ("/metrics", "/metrics/requests", "/health/live", "/health/metrics"):
+        anonymous = client.get(path)
+        assert anonymous.status_code == 401
+        assert anonymous.headers["www-authenticate"] == "Bearer"
+        assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer s3cr3t-scrape"}).status_code == 200
+
+    client.cookies.set("session", make_session_cookie({"user_session": {
+        "id": test_user.id, "username": test_user.username, "role": test_user.role, "is_active": True}}))
+    assert client.get("/metrics").status_code == 403
+
+    # Sem token configurado, nenhum bearer é aceito
+    monkeypatch.setattr(get_settings(), "metrics_token", "")
+    client.cookies.clear()
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 401
+
+
+def test_public_health_routes_stay_slim(client: TestClient, db_session, monkeypatch):
+    assert client.get("/health/").json()["status"] == "healthy"
+    assert client.get("/health/ready").json() == {"status": "ready", "database": "connected"}
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("password=hunter2 at db.internal")
+
+    monkeypatch.setattr(db_session, "execute", broken)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Database not ready"}
+
+
+def test_histogram_and_label_escaping():
+    durations = Histogram(("kind", "status"), (1.0, 10.0))
+    for seconds in (0.5, 1.0, 4.0, 60.0):
+        durations.observe(seconds, "bordero", "done")
+    durations.observe(2.0, 'rel"at\\orio', "failed")
+
+    out = Exposition()
+    out.histogram("jobs_seconds", "Job time", durations.buckets, durations.series())
+    out.gauge("temperature", "Multi\nline", [({"room": "a\nb"}, 1.5)])
+    families = parse(out.text())
+    check_histograms(families)
+
+    bucket = "jobs_seconds_bucket"
+    assert value(families, "jobs_seconds", bucket, kind="bordero", status="done", le="1.0") == 2
+    assert value(families, "jobs_seconds", bucket, kind="bordero", status="done", le="10.0") == 3
+    assert value(families, "jobs_seconds", "jobs_seconds_sum", kind="bordero", status="done") == 65.5
+    assert value(families, "jobs_seconds", "jobs_seconds_count", kind='rel\\"at\\\\orio', status="failed") == 1
+    assert value(families, "temperature", room="a\\nb") == 1.5
@@ -0,0 +1,58 @@
+"""
+Query plan capture tests
+"""
+import json
+import os
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models import Order
+from app.services import query_plans
+from app.services.query_plans import PlanParams, capture, compare, explain, load_baseline
+
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(__file__)), query_plans.DEFAULT_BASELINE)
+PARAMS = PlanParams.last_days(30, date(2024, 3, 31))
+
+
+def _scanning_query(db, params):
+    return select(Order).where(Order.note == "x")
+
+
+def test_hot_queries_match_the_baseline(db_session):
+    plans = capture(db_session, PARAMS, repeat=1)
+    assert [p.name for p in plans] == list(query_plans.HOT_QUERIES)
+    assert all(p.plan for p in plans)
+    # Uma consulta que passa a varrer uma tabela inteira falha aqui
+    assert compare(plans, load_baseline(BASELINE, "sqlite")) == []
+
+
+def test_full_scans_are_flagged_against_the_baseline(db_session):
+    lines, scans = explain(db_session, _scanning_query(db_session, PARAMS))
+    assert scans == ["orders"] and lines == ["SCAN orders"]
+
+    plans = capture(db_session, PARAMS, repeat=1, names=["admin.orders"])
+    assert plans[0].full_scans == []
+
+    plans[0].full_scans = ["orders"]
+    regressed = compare(plans, {"admin.orders": {"full_scans": []}})
+    assert regressed == plans and regressed[0].regressions == ["orders"]
+    assert compare(plans, {"admin.orders": {"full_scans": ["orders"]}}) == []
+
+
+def test_cli_seeds_and_exits_non_zero_on_regression(tmp_path, monkeypatch, capsys):
+    baseline = str(tmp_path / "plans.json")
+    args = ["--seed", "200", "--baseline", baseline, "--repeat", "1", "--end", "2024-03-31"]
+    assert query_plans.main(args + ["--update-baseline"]) == 0
+    assert query_plans.main(args) == 0
+    assert set(json.load(open(baseline))["sqlite"]) == set(query_plans.HOT_QUERIES)
+
+    monkeypatch.setitem(query_plans.HOT_QUERIES, "test.scan", _scanning_query)
+    with open(baseline) as fh:
+        document = json.load(fh)
+    document["sqlite"]["test.scan"] = {"full_scans": [], "plan": [], "elapsed_ms": 0}
+    with open(baseline, "w") as fh:
+        json.dump(document, fh)
+
+    assert query_plans.main(args) == 1
+    assert "test.scan" in capsys.readouterr().out
@@ -0,0 +1,86 @@
+"""
+Per-request SQL statistics tests
+"""
+import logging
+import re
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import selectinload
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import QueryStatsMiddleware
+from app.models import Order, OrderItem
+from app.services.query_stats import begin_request, current_queries, end_request
+from tests.conftest import engine
+
+SERVER_TIMING = re.compile(r'^db;dur=[\d.]+;desc="(\d+) queries", db-slowest;dur=[\d.]+$')
+
+
+def _app(threshold=3):
+    def lookups(request):
+        with engine.connect() as conn:
+            for n in range(int(request.path_params["n"])):
+                conn.execute(text("SELECT :n"), {"n": n})
+        return PlainTextResponse("ok")
+
+    def nothing(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/lookups/{n}", lookups), Route("/nothing", nothing)])
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=threshold)
+    return app
+
+
+def test_server_timing_and_repeated_statements(caplog):
+    client = TestClient(_app(threshold=3))
+
+    with caplog.at_level(logging.INFO, logger="bilheteria.queries"):
+        few = client.get("/lookups/2")
+        many = client.get("/lookups/4")
+        none = client.get("/nothing")
+
+    assert SERVER_TIMING.match(few.headers["server-timing"]).group(1) == "2"
+    assert SERVER_TIMING.match(many.headers["server-timing"]).group(1) == "4"
+    assert "server-timing" not in none.headers
+
+    records = {r.path: r for r in caplog.records if r.name == "bilheteria.queries"}
+    assert set(records) == {"/lookups/2", "/lookups/4"}
+    assert records["/lookups/2"].levelno == logging.INFO and records["/lookups/2"].db["repeated"] == []
+    warning = records["/lookups/4"]
+    assert warning.levelno == logging.WARNING and warning.status == 200
+    assert warning.db["queries"] == 4 and warning.db["repeated"] == [{"sql": "SELECT ?", "count": 4}]
+    assert "Probable N+1 in GET /lookups/4" in warning.getMessage()
+
+
+def test_statements_outside_a_request_are_not_collected():
+    assert current_queries() is None
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert current_queries() is None
+
+
+def test_lazy_loaded_relationship_is_reported(db_session, admin_user):
+    for _ in range(6):
+        order = Order(user_id=admin_user.id, payment_method="pix")
+        order.items.append(OrderItem(ticket_type="inteira", qty=2, unit_price_cents=1000))
+        db_session.add(order)
+    db_session.commit()
+
+    def tickets(query):
+        queries, token = begin_request()
+        try:
+            assert sum(item.qty for order in query.all() for item in order.items) == 12
+        finally:
+            end_request(token)
+        db_session.expire_all()
+        return queries
+
+    lazy = tickets(db_session.query(Order))
+    assert lazy.count == 7
+    assert [n for _, n in lazy.repeated(5)] == [6]
+
+    eager = tickets(db_session.query(Order).options(selectinload(Order.items)))
+    assert eager.count == 2 and eager.repeated(5) == []
@@ -0,0 +1,60 @@
+"""
+Workbook render pool tests
+"""
+import asyncio
+import io
+import os
+import time
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from app.services import render_pool as render_pool_module
+from app.services.render_pool import RenderPool, RenderPoolFull
+from app.services.reports import BORDERO_FIELDS, bordero_rows, render_bordero_bytes
+
+
+def _linha(day):
+    linha = dict.fromkeys(BORDERO_FIELDS, 0)
+    linha.update(date=day, qtd_int_pix=4, rec_pix=4000, pagantes=4, publico_total=4)
+    return linha
+
+
+def test_bordero_renders_in_worker_process():
+    pool = RenderPool(workers=1, queue_limit=0)
+    try:
+        pool.start()
+        assert pool.call(render_pool_module._ping) != os.getpid()
+        today = date.today()
+        content = pool.call(render_bordero_bytes, today, today, bordero_rows([_linha(today)]))
+    finally:
+        pool.stop()
+
+    ws = load_workbook(io.BytesIO(content))["borderô"]
+    assert ws["D15"].value == 4
+    assert ws["M15"].value == 40.0
+    assert pool.stats()["completed"] == 2
+
+
+def test_saturated_pool_rejects_renders():
+    pool = RenderPool(workers=0, queue_limit=1)
+
+    async def burst():
+        return await asyncio.gather(*(pool.run(time.sleep, 0.2) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert sum(isinstance(r, RenderPoolFull) for r in results) == 1
+    assert pool.stats()["pending"] == 0
+    assert pool.stats()["rejected"] == 1
+
+
+def test_bordero_route_returns_503_when_full(admin_client: TestClient, monkeypatch):
+    pool = RenderPool(workers=0, queue_limit=0)
+    pool._pending = pool.limit
+    monkeypatch.setattr(render_pool_module, "_pool", pool)
+
+    response = admin_client.get("/reports/bordero-cais")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
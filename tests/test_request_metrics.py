@@ -0,0 +1,79 @@
+"""
+Request metrics middleware tests
+"""
+import asyncio
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import TimingMiddleware
+from app.services.request_metrics import RequestMetrics
+
+
+def _route(snapshot, method, route):
+    return next((r for r in snapshot["routes"] if r["method"] == method and r["route"] == route), None)
+
+
+def test_routes_are_labelled_by_template(admin_client: TestClient):
+    before = admin_client.get("/metrics/requests").json()
+    seen = (_route(before, "GET", "/exports/jobs/{job_id}") or {}).get("count", 0)
+
+    for job_id in ("a1", "b2", "c3"):
+        admin_client.get(f"/exports/jobs/{job_id}")
+    admin_client.get("/no/such/page/42")
+
+    after = admin_client.get("/metrics/requests").json()
+    jobs = _route(after, "GET", "/exports/jobs/{job_id}")
+    assert jobs["count"] == seen + 3
+    assert jobs["statuses"]["404"] >= 3
+    assert jobs["buckets"]["+Inf"] == jobs["count"] and jobs["in_flight"] == 0
+    assert jobs["p50_ms"] is not None
+    assert _route(after, "GET", "unmatched")["statuses"]["404"] >= 1
+    # a própria consulta às métricas está em andamento
+    assert _route(after, "GET", "/metrics/requests")["in_flight"] == 1
+    assert not any("a1" in r["route"] for r in after["routes"])
+
+
+def _app(metrics, slow_seconds=0.0):
+    async def slow(request):
+        await asyncio.sleep(0.03)
+        return PlainTextResponse("ok")
+
+    async def boom(request):
+        raise RuntimeError("boom")
+
+    routes = [Route("/slow/{n}", slow), Route("/boom", boom)]
+    app = Starlette(routes=routes)
+    app.add_middleware(TimingMiddleware, metrics=metrics, slow_seconds=slow_seconds)
+    return app
+
+
+def test_histogram_statuses_and_slow_log(caplog):
+    metrics = RequestMetrics(buckets=(0.001, 0.01, 1.0))
+    client = TestClient(_app(metrics, slow_seconds=0.02), raise_server_exceptions=False)
+
+    with caplog.at_level(logging.WARNING, logger="app.middleware"):
+        assert client.get("/slow/1").status_code == 200
+        assert client.get("/slow/2").status_code == 200
+    assert client.get("/boom").status_code == 500
+
+    slow = metrics.routes[("GET", "/slow/{n}")]
+    assert slow.count == 2 and slow.statuses == {200: 2}
+    assert slow.bucket_counts == [0, 0, 2, 0]  # entre 10 ms e 1 s
+    assert 0.01 < metrics.quantile(slow, 0.5) <= 1.0
+    assert metrics.routes[("GET", "/boom")].statuses == {500: 1}
+    assert metrics.in_flight == 0
+    assert "Slow request: GET /slow/1 (/slow/{n}) -> 200" in caplog.text
+
+
+@pytest.mark.parametrize("seconds,bucket", [(0.0005, 0), (0.001, 0), (0.005, 1), (2.0, 3)])
+def test_bucket_bounds_are_inclusive(seconds, bucket):
+    metrics = RequestMetrics(buckets=(0.001, 0.01, 1.0))
+    metrics.finished(metrics.started("GET", "/x"), "GET", "/x", 200, seconds)
+    stats = metrics.routes[("GET", "/x")]
+    assert stats.bucket_counts.index(1) == bucket
+    assert metrics.snapshot()[0]["buckets"]["+Inf"] == 1
@@ -0,0 +1,43 @@
+"""
+Startup cost tests: heavy dependencies stay lazy and boot fits a budget
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Medido em ~1 s numa máquina de um núcleo; folga para CI lento
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_SECONDS", "5.0"))
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow", "psutil", "qrcode", "PIL")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app.main import app
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    status = client.get("/health").status_code
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "status": status,
+                  "heavy": sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def _probe(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path}/startup.db", RENDER_POOL_WORKERS="0",
+               SECRET_KEY="test-startup")
+    out = subprocess.run([sys.executable, "-c", PROBE % (HEAVY_MODULES,)], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_startup_skips_heavy_imports_and_fits_budget(tmp_path):
+    _probe(tmp_path)  # primeira execução compila bytecode e cria o banco
+    result = _probe(tmp_path)
+
+    assert result["status"] == 200
+    assert result["heavy"] == []
+    assert result["elapsed"] < STARTUP_BUDGET_S, f"startup took {result['elapsed']:.2f} s"
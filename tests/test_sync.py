@@ -0,0 +1,83 @@
+"""
+Offline terminal sync tests
+"""
+from datetime import datetime
+from fastapi.testclient import TestClient
+from app.models import Order, OrderItem
+
+CSRF = {"X-CSRF-Token": "test-csrf-token"}
+
+
+def _sale(client_id, **overrides):
+    sale = {
+        "client_id": client_id,
+        "sold_at": "2026-03-10T14:05:00-03:00",
+        "qtd_inteira": 1,
+        "qtd_meia": 2,
+        "reason_meia": "idoso",
+        "payment_method": "dinheiro",
+        "state": "pe",
+    }
+    sale.update(overrides)
+    return sale
+
+
+def test_sync_requires_csrf(admin_client: TestClient):
+    """Sync rejects requests without the session CSRF token"""
+    response = admin_client.post("/sync/sales", json={"sales": [_sale("a1b2c3d4-0001")]})
+    assert response.status_code == 400
+
+
+def test_sync_creates_with_original_timestamp(admin_client: TestClient, db_session):
+    """Queued sales keep the terminal timestamp (stored as UTC)"""
+    response = admin_client.post("/sync/sales", json={"sales": [_sale("a1b2c3d4-0001")]}, headers=CSRF)
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert result["status"] == "created"
+
+    order = db_session.get(Order, result["order_id"])
+    assert order.client_id == "a1b2c3d4-0001"
+    assert order.created_at == datetime(2026, 3, 10, 17, 5)
+    assert order.state == "PE"
+    items = db_session.query(OrderItem).filter(OrderItem.order_id == order.id).all()
+    assert sorted((i.ticket_type, i.qty) for i in items) == [("inteira", 1), ("meia", 2)]
+
+
+def test_sync_deduplicates_client_ids(admin_client: TestClient, db_session):
+    """Re-sending a batch (or repeating an id inside it) never duplicates sales"""
+    batch = {"sales": [_sale("a1b2c3d4-0001"), _sale("a1b2c3d4-0002"), _sale("a1b2c3d4-0001")]}
+    first = admin_client.post("/sync/sales", json=batch, headers=CSRF).json()["results"]
+    assert [r["status"] for r in first] == ["created", "created"]
+
+    second = admin_client.post("/sync/sales", json=batch, headers=CSRF).json()["results"]
+    assert [r["status"] for r in second] == ["duplicate", "duplicate"]
+    assert [r["order_id"] for r in second] == [r["order_id"] for r in first]
+    assert db_session.query(Order).count() == 2
+
+
+def test_sync_reports_invalid_sales(admin_client: TestClient, db_session):
+    """Empty sales and future timestamps fail individually"""
+    batch = {"sales": [
+        _sale("a1b2c3d4-0001", qtd_inteira=0, qtd_meia=0),
+        _sale("a1b2c3d4-0002", sold_at="2999-01-01T00:00:00Z"),
+        _sale("a1b2c3d4-0003"),
+    ]}
+    results = admin_client.post("/sync/sales", json=batch, headers=CSRF).json()["results"]
+    assert [r["status"] for r in results] == ["error", "error", "created"]
+    assert db_session.query(Order).count() == 1
+
+
+def test_sync_rejects_malformed_sales_individually(admin_client: TestClient, db_session):
+    """A sale failing validation is answered per item instead of failing the whole batch"""
+    batch = {"sales": [
+        _sale("a1b2c3d4-0001", qtd_inteira=150),
+        "not a sale",
+        _sale("a1b2c3d4-0003"),
+    ]}
+    response = admin_client.post("/sync/sales", json=batch, headers=CSRF)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r["client_id"], r["status"]) for r in results] == [
+        ("a1b2c3d4-0001", "rejected"), (None, "rejected"), ("a1b2c3d4-0003", "created")]
+    assert results[0]["errors"][0].startswith("qtd_inteira:")
+    assert db_session.query(Order).count() == 1
@@ -0,0 +1,157 @@
+"""
+Ticket issuance and gate validation tests
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.models import Order, OrderItem, TicketRedemption
+from app.services import business_date
+from app.services import tickets
+from app.services.tickets import (SigningKeyMissing, TicketIndex, load_ticket_index, make_ticket,
+                                  verify_ticket, ticket_index)
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    """Start every test with an empty, unloaded gate index"""
+    monkeypatch.setattr(ticket_index, "day", None)
+    monkeypatch.setattr(ticket_index, "issued", set())
+    monkeypatch.setattr(ticket_index, "used", {})
+
+
+def test_signature_rejects_tampering():
+    ticket = make_ticket(date(2026, 5, 18), 12, 30, 1)
+    assert verify_ticket(ticket) == ("20260518-12-30-1", date(2026, 5, 18))
+    assert verify_ticket(ticket.replace("-12-", "-13-")) is None
+    assert verify_ticket(ticket.split(".")[0]) is None
+
+
+def test_index_validates_once():
+    index = TicketIndex()
+    day = date(2026, 5, 18)
+    index.day = day
+    index.register(day, 7, [(70, 2)])
+
+    ticket = make_ticket(day, 7, 70, 2)
+    assert index.validate(ticket, day)["status"] == "ok"
+    assert index.validate(ticket, day)["status"] == "used"
+    assert index.validate(make_ticket(day, 7, 70, 3), day)["status"] == "unknown"
+    assert index.validate(ticket, date(2026, 5, 19))["status"] == "wrong_day"
+
+
+def test_sale_tickets_validate_at_gate(admin_client: TestClient, db_session):
+    """Tickets of a counter sale pass the gate once; deleting the order revokes them"""
+    # Carrega o índice do dia antes da venda: o hook de commit deve registrá-la
+    assert admin_client.post("/gate/validate", json={"ticket": "x" * 12}).json() == {"status": "invalid"}
+    assert ticket_index.day == date.today()
+
+    response = admin_client.post("/sell", data={
+        "qtd_inteira": 2,
+        "qtd_meia": 1,
+        "reason_meia": "estudante",
+        "payment_method": "pix",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+    assert response.status_code == 303
+    order = db_session.query(Order).one()
+
+    tickets = admin_client.get(f"/orders/{order.id}/tickets").json()["tickets"]
+    assert len(tickets) == 3
+
+    first = admin_client.post("/gate/validate", json={"ticket": tickets[0]}).json()
+    assert first["status"] == "ok"
+    assert admin_client.post("/gate/validate", json={"ticket": tickets[0]}).json()["status"] == "used"
+
+    order.deleted_at = datetime.utcnow()
+    db_session.commit()
+    assert admin_client.post("/gate/validate", json={"ticket": tickets[1]}).json()["status"] == "unknown"
+    # Ingressos já usados continuam aparecendo como usados
+    assert admin_client.post("/gate/validate", json={"ticket": tickets[0]}).json()["status"] == "used"
+
+
+def test_index_is_rebuilt_from_database(admin_client: TestClient, db_session):
+    """A fresh process recognises tickets sold before it started"""
+    admin_client.post("/sell", data={
+        "qtd_inteira": 1,
+        "payment_method": "dinheiro",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+    order = db_session.query(Order).one()
+    ticket = make_ticket(date.today(), order.id, order.items[0].id, 1)
+
+    assert ticket_index.day is None
+    assert admin_client.post("/gate/validate", json={"ticket": ticket}).json()["status"] == "ok"
+
+
+def test_late_synced_sale_is_registered_under_its_own_day(db_session, admin_user):
+    """An order sold yesterday and committed today does not enter today's gate index"""
+    today = business_date.today()
+    ticket_index.day = today
+    late = Order(user_id=admin_user.id, payment_method="pix", created_at=datetime.utcnow() - timedelta(days=1),
+                 items=[OrderItem(ticket_type="inteira", qty=2, unit_price_cents=1000)])
+    fresh = Order(user_id=admin_user.id, payment_method="pix",
+                  items=[OrderItem(ticket_type="inteira", qty=1, unit_price_cents=1000)])
+    db_session.add_all([late, fresh])
+    db_session.commit()
+
+    assert late.business_date == today - timedelta(days=1)
+    assert ticket_index.issued == {f"{today:%Y%m%d}-{fresh.id}-{fresh.items[0].id}-1"}
+
+
+def test_signing_key_is_required(monkeypatch):
+    monkeypatch.setattr(tickets, "_key", None)
+    monkeypatch.setattr(get_settings(), "ticket_signing_key", "")
+    monkeypatch.setattr(get_settings(), "secret_key", "")
+    with pytest.raises(SigningKeyMissing):
+        tickets.signing_key()
+
+
+def test_redemptions_survive_a_restart(admin_client: TestClient, db_session):
+    """A used ticket stays used once the in-memory index is rebuilt"""
+    admin_client.post("/sell", data={
+        "qtd_inteira": 2,
+        "payment_method": "pix",
+        "csrf_token": "test-csrf-token",
+    }, follow_redirects=False)
+    order = db_session.query(Order).one()
+    first, second = admin_client.get(f"/orders/{order.id}/tickets").json()["tickets"]
+    assert admin_client.post("/gate/validate", json={"ticket": first}).json()["status"] == "ok"
+
+    redemption = db_session.query(TicketRedemption).one()
+    assert (redemption.ticket, redemption.order_id) == (first.split(".")[0], order.id)
+
+    # Novo processo: o índice é reconstruído do banco
+    ticket_index.day = None
+    load_ticket_index(TestingSessionLocal)
+    assert admin_client.post("/gate/validate", json={"ticket": first}).json()["status"] == "used"
+    assert admin_client.post("/gate/validate", json={"ticket": second}).json()["status"] == "ok"
+
+
+def test_entry_recorded_by_another_worker_wins(db_session, admin_user):
+    """Two workers with stale indexes: the database lets only one of them through"""
+    order = Order(user_id=admin_user.id, payment_method="pix",
+                  items=[OrderItem(ticket_type="inteira", qty=1, unit_price_cents=1000)])
+    db_session.add(order)
+    db_session.commit()
+    ticket = tickets.mint_tickets(order)[0]
+    today = order.business_date
+
+    workers = [TicketIndex(), TicketIndex()]
+    for worker in workers:
+        worker.load(db_session, today)
+    answers = [worker.validate(ticket, today) for worker in workers]
+    assert [a["status"] for a in answers] == ["ok", "ok"]
+
+    assert workers[0].record_use(db_session, answers[0])["status"] == "ok"
+    late = workers[1].record_use(db_session, answers[1])
+    assert late == {"status": "used", "used_at": answers[0]["used_at"]}
+    assert workers[1].validate(ticket, today)["status"] == "used"
+
+
+def test_gate_requires_login(client: TestClient):
+    response = client.post("/gate/validate", json={"ticket": "x" * 12})
+    assert response.status_code == 401
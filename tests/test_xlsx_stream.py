@@ -0,0 +1,71 @@
+"""
+Streaming XLSX export tests
+"""
+import io
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+from app.models import GroupVisit
+from app.services.xlsx_stream import stream_xlsx, column_letter
+
+
+def _row_count(ws):
+    return sum(1 for _ in ws.iter_rows(values_only=True))
+
+
+def _workbook(chunks):
+    return load_workbook(io.BytesIO(b"".join(chunks)), read_only=True)
+
+
+def test_cell_types_and_escaping():
+    rows = [(date(2026, 5, 18), "Escola <A&B>", 42, Decimal("12.50"), None, True,
+             datetime(2026, 5, 18, 9, 30))]
+    wb = _workbook(stream_xlsx([("Dados", ["Data", "Nome", "N", "Valor", "Vazio", "Ok", "Hora"], rows)]))
+    values = [list(r) for r in wb["Dados"].iter_rows(values_only=True)]
+    assert values[1] == [datetime(2026, 5, 18), "Escola <A&B>", 42, 12.5, None, True,
+                         datetime(2026, 5, 18, 9, 30)]
+
+
+def test_rows_are_consumed_lazily_and_spill_over():
+    """Rows stream in batches and a sheet over the row limit continues in a new one"""
+    consumed = []
+
+    def rows():
+        for n in range(2500):
+            consumed.append(n)
+            yield (n,)
+
+    stream = stream_xlsx([("Bruto", ["n"], rows())], max_rows=1001)
+    first = next(stream)
+    assert first and len(consumed) < 2500
+
+    wb = _workbook([first, *stream])
+    assert wb.sheetnames == ["Bruto", "Bruto (2)", "Bruto (3)"]
+    assert [_row_count(ws) for ws in wb] == [1001, 1001, 501]
+
+
+def test_column_letter():
+    assert [column_letter(n) for n in (1, 26, 27, 703)] == ["A", "Z", "AA", "AAA"]
+
+
+def test_groups_export_has_no_row_cap(client: TestClient, db_session):
+    start = datetime.now() - timedelta(days=5)
+    db_session.bulk_save_objects([
+        GroupVisit(date=start + timedelta(minutes=n), institution=f"Escola, {n}", size=10,
+                   state="PE", city="Recife", scheduled=True, price_total=Decimal("25.00"))
+        for n in range(10_500)
+    ])
+    db_session.commit()
+
+    response = client.get("/reports/groups/export.xlsx")
+    assert response.status_code == 200
+    assert "Relatorio_Grupos.xlsx" in response.headers["content-disposition"]
+
+    wb = _workbook([response.content])
+    raw = wb["Bruto"]
+    assert _row_count(raw) == 10_501
+    assert next(raw.iter_rows(min_row=2, max_row=2, values_only=True))[1] == "Escola, 10499"
+    assert list(wb["TopOrigens"].iter_rows(min_row=2, values_only=True)) == [("PE", "Recife", 10_500, 105_000)]